@@ -8,6 +8,7 @@ from importlib import import_module
 import copy
 import json
 import inspect
+import time
 
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
 from foglamp.common.storage_client.storage_client import StorageClient
@@ -25,6 +26,10 @@ _logger = logger.setup(__name__)
 # MAKE UPPER_CASE
 _valid_type_strings = sorted(['boolean', 'integer', 'string', 'IPv4', 'IPv6', 'X509 certificate', 'password', 'JSON'])
 
+# cached categories are read from storage again after this many seconds,
+# as tasks running in their own processes also create categories in storage
+_CACHE_TTL_SECONDS = 60
+
 
 class ConfigurationManagerSingleton(object):
     """ ConfigurationManagerSingleton
@@ -65,6 +70,9 @@ class ConfigurationManager(ConfigurationManagerSingleton):
 
     _storage = None
     _registered_interests = None
+    _cache = None
+    _cache_hits = 0
+    _cache_misses = 0
 
     def __init__(self, storage=None):
         ConfigurationManagerSingleton.__init__(self)
@@ -74,6 +82,47 @@ class ConfigurationManager(ConfigurationManagerSingleton):
             self._storage = storage
         if self._registered_interests is None:
             self._registered_interests = {}
+        if self._cache is None:
+            self._cache = {}
+
+    def _cache_get(self, category_name):
+        entry = self._cache.get(category_name)
+        if entry is None or time.monotonic() - entry[1] >= _CACHE_TTL_SECONDS:
+            self._cache_misses += 1
+            return None
+        self._cache_hits += 1
+        return entry[0]
+
+    def _cache_put(self, category_name, category_val):
+        self._cache[category_name] = (category_val, time.monotonic())
+
+    async def _read_category_val_cached(self, category_name):
+        # the returned category_val is shared with the cache and must not be changed
+        category_val = self._cache_get(category_name)
+        if category_val is None:
+            category_val = await self._read_category_val(category_name)
+            if category_val is not None:
+                self._cache_put(category_name, category_val)
+        return category_val
+
+    def invalidate_cache(self, category_name=None):
+        """Drops a category, or all categories, from the category cache
+
+        Needed only after a category is changed in storage without going through the ConfigurationManager.
+        """
+        if category_name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(category_name, None)
+
+    def get_cache_stats(self):
+        """Get the category cache counters
+
+        Return Values:
+        a dictionary with the number of cached categories and of cache hits and misses
+        """
+        return {"categories": len(self._cache), "hits": self._cache_hits, "misses": self._cache_misses,
+                "ttl_seconds": _CACHE_TTL_SECONDS}
 
     async def _run_callbacks(self, category_name):
         callbacks = self._registered_interests.get(category_name)
@@ -260,7 +309,7 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         None
         """
         try:
-            return await self._read_category_val(category_name)
+            return copy.deepcopy(await self._read_category_val_cached(category_name))
         except:
             _logger.exception(
                 'Unable to get all category names based on category_name %s', category_name)
@@ -278,7 +327,10 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         None
         """
         try:
-            return await self._read_item_val(category_name, item_name)
+            category_val = await self._read_category_val_cached(category_name)
+            if category_val is None:
+                return None
+            return copy.deepcopy(category_val.get(item_name))
         except:
             _logger.exception(
                 'Unable to get category item based on category_name %s and item_name %s', category_name, item_name)
@@ -296,7 +348,10 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         None
         """
         try:
-            return await self._read_value_val(category_name, item_name)
+            category_val = await self._read_category_val_cached(category_name)
+            if category_val is None or category_val.get(item_name) is None:
+                return None
+            return category_val[item_name].get('value')
         except:
             _logger.exception(
                 'Unable to get the "value" entry based on category_name %s and item_name %s', category_name,
@@ -324,6 +379,7 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         """
         try:
             # get storage_value_entry and compare against new_value_value, update if different
+            # storage is read rather than the cache, which may be behind changes made by other processes
             storage_value_entry = await self._read_value_val(category_name, item_name)
             # check for category_name and item_name combination existence in storage
             if storage_value_entry is None:
@@ -332,6 +388,7 @@ class ConfigurationManager(ConfigurationManagerSingleton):
             if storage_value_entry == new_value_entry:
                 return
             await self._update_value_val(category_name, item_name, new_value_entry)
+            self.invalidate_cache(category_name)
         except:
             _logger.exception(
                 'Unable to set item value entry based on category_name %s and item_name %s and value_item_entry %s',
@@ -409,10 +466,11 @@ class ConfigurationManager(ConfigurationManagerSingleton):
         try:
             # validate new category_val, set "value" from default
             category_val_prepared = await self._validate_category_val(category_value, True)
-            # check if category_name is already in storage
+            # check if category_name is already in storage, merging against storage rather than the cache
             category_val_storage = await self._read_category_val(category_name)
             if category_val_storage is None:
                 await self._create_new_category(category_name, category_val_prepared, category_description)
+                self._cache_put(category_name, category_val_prepared)
             else:
                 # validate category_val from storage, do not set "value" from default, reuse from storage value
                 try:
@@ -428,8 +486,10 @@ class ConfigurationManager(ConfigurationManagerSingleton):
                                                                             keep_original_items)
                     if json.dumps(category_val_prepared, sort_keys=True) == json.dumps(category_val_storage,
                                                                                        sort_keys=True):
+                        self._cache_put(category_name, category_val_storage)
                         return
                 await self._update_category(category_name, category_val_prepared, category_description)
+                self._cache_put(category_name, category_val_prepared)
         except:
             _logger.exception(
                 'Unable to create new category based on category_name %s and category_description %s and category_json_schema %s',
@@ -16,6 +16,9 @@ __copyright__ = "Copyright (c) 2017 OSI Soft, LLC"
 __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
+_MAX_PROGRAMS = 32
+"""Maximum number of compiled filters kept by a JQFilter"""
+
 
 class JQFilter:
     """JQFilter class to use the jq product.
@@ -26,13 +29,26 @@ class JQFilter:
     def __init__(self):
         """Initialise the JQFilter"""
         self._logger = logger.setup("JQFilter")
+        self._programs = {}
+        """Compiled filters by filter string"""
+
+    def _program(self, filter_string):
+        """Returns the compiled filter, compiling it only the first time it is used"""
+        try:
+            return self._programs[filter_string]
+        except KeyError:
+            program = pyjq.compile(filter_string)
+            if len(self._programs) >= _MAX_PROGRAMS:
+                self._programs.clear()
+            self._programs[filter_string] = program
+            return program
 
     def transform(self, reading_block, filter_string):
         """
         Args:
             reading_block: Formatted JSON on which filter needs to be applied.
             filter_string: filter to apply. Filter should be in JQ format.
-        Returns: transformed JSON (if apply_filter is true)
+        Returns: list of the outputs of the filter, as Python objects
         Raises:
             TypeError: If reading_block is not a valid JSON
             ValueError: If filter is not a proper JQ filter
@@ -43,7 +59,7 @@ class JQFilter:
 
         """
         try:
-            return pyjq.all(filter_string, reading_block)
+            return self._program(filter_string).all(reading_block)
         except TypeError as ex:
             self._logger.error("Invalid JSON passed, exception %s", str(ex))
             raise
@@ -221,7 +221,7 @@ class MicroserviceManagementClient(object):
         """
 
         :param category_data: e.g. '{"key": "TEST", "description": "description", "value": {"info": {"description": "Test", "type": "boolean", "default": "true"}}}'
-        :return:
+        :return: the category as created or merged with the stored one, e.g. {"key": "TEST", "description": "description", "value": {"info": {"description": "Test", "type": "boolean", "default": "true", "value": "true"}}}
         """
         url = '/foglamp/service/category'
 
@@ -18,6 +18,9 @@ __version__ = "${VERSION}"
 
 _logger = logger.setup(__name__)
 
+_MAX_KEYS_PER_UPDATE = 100
+""" Maximum number of statistics keys updated by one storage request, which has one condition per key """
+
 
 class Statistics(object):
     """ Statistics interface of the API to gather the available statistics counters,
@@ -98,28 +101,107 @@ class Statistics(object):
                     , key, value_increment, str(ex))
                 raise
 
-    async def register(self, key, description):
-        if key in self._registered_keys:
-            return
-        if len(self._registered_keys) == 0:
+    async def update_bulk(self, sensor_stat_dict, description=None):
+        """ UPDATE the value column of many statistics rows, with one storage request for all the keys that
+        share a value increment. Keys that are not registered yet are registered with the value increment
+        as their value.
+
+        The storage requests are not one transaction: each key is removed from sensor_stat_dict once its
+        increment has been written, so that after an error the dictionary holds the increments still to
+        be written.
+
+        Args:
+            sensor_stat_dict: Dictionary containing the key value of Asset name and value increment
+            description: Description of the keys that are not registered yet, formatted with the key.
+                         Without it every key must be registered.
+
+        Returns:
+            None
+        """
+        keys_by_increment = {}
+        for key, value_increment in list(sensor_stat_dict.items()):
+            if key not in self._registered_keys and description is not None:
+                if self._insert_key(key, description.format(key), value_increment):
+                    del sensor_stat_dict[key]
+                    continue
+            if value_increment:
+                keys_by_increment.setdefault(value_increment, []).append(key)
+            else:
+                del sensor_stat_dict[key]
+
+        for value_increment, keys in keys_by_increment.items():
+            for i in range(0, len(keys), _MAX_KEYS_PER_UPDATE):
+                self._update_keys(keys[i:i + _MAX_KEYS_PER_UPDATE], value_increment, description, sensor_stat_dict)
+
+    def _update_keys(self, keys, value_increment, description, sensor_stat_dict):
+        try:
+            conditions = [["key", "=", key] for key in keys]
+            payload = PayloadBuilder().WHERE(conditions[0])
+            if len(conditions) > 1:
+                payload = payload.OR_WHERE(tuple(conditions[1:]))
+            payload = payload.EXPR(["value", "+", value_increment]).payload()
+            result = self._storage.update_tbl("statistics", payload)
+            if result["response"] != "updated":
+                raise KeyError
+            if result.get("rows_affected", len(keys)) >= len(keys):
+                for key in keys:
+                    del sensor_stat_dict[key]
+                return
+            # Some keys are not in storage although they were registered
             self._load_keys()
+            missing_keys = [key for key in keys if key not in self._registered_keys]
+            for key in keys:
+                if key not in missing_keys:
+                    del sensor_stat_dict[key]
+            if description is None:
+                raise KeyError(missing_keys)
+            for key in missing_keys:
+                if not self._insert_key(key, description.format(key), value_increment):
+                    raise KeyError(key)
+                del sensor_stat_dict[key]
+        except KeyError:
+            _logger.exception('Statistics keys %s have not been registered', keys)
+            raise
+        except Exception as ex:
+            _logger.exception(
+                'Unable to update statistics value based on statistics_keys %s and value_increment %s, error %s'
+                , keys, value_increment, str(ex))
+            raise
+
+    def _insert_key(self, key, description, value):
+        """ Registers a key with an initial value
+
+        Returns:
+            True when the key was inserted, False when it was found to be already registered
+        """
         try:
-            payload = PayloadBuilder().INSERT(key=key, description=description, value=0, previous_value=0).payload()
+            payload = PayloadBuilder().INSERT(key=key, description=description, value=value, previous_value=0).payload()
             self._storage.insert_into_tbl("statistics", payload)
-            self._registered_keys.append(key)
+            self._registered_keys.add(key)
+            return True
         except Exception as ex:
             """ The error may be because the key has been created in another process, reload keys """
             self._load_keys()
             if key not in self._registered_keys:
                 _logger.exception('Unable to create new statistic %s, error %s', key, str(ex))
                 raise
+            return False
+
+    async def register(self, key, description):
+        if key in self._registered_keys:
+            return
+        if len(self._registered_keys) == 0:
+            self._load_keys()
+            if key in self._registered_keys:
+                return
+        self._insert_key(key, description, 0)
 
     def _load_keys(self):
-        self._registered_keys = []
+        self._registered_keys = set()
         try:
             payload = PayloadBuilder().SELECT("key").payload()
             results = self._storage.query_tbl_with_payload('statistics', payload)
             for row in results['rows']:
-                self._registered_keys.append(row['key'])
+                self._registered_keys.add(row['key'])
         except Exception as ex:
             _logger.exception('Failed to retrieve statistics keys, %s', str(ex))
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Keep-alive HTTP connection pool used by the storage layer python client
+"""
+
+__author__ = "Praveen Garg"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+import collections
+import http.client
+import select
+import threading
+import time
+
+from foglamp.common import logger
+
+
+_LOGGER = logger.setup(__name__)
+
+_MAX_IDLE_CONNECTIONS = 10
+"""Maximum number of idle connections kept open per storage service"""
+
+_MAX_IDLE_SECONDS = 30
+"""Idle connections older than this are closed instead of being reused"""
+
+_MAX_CONNECTIONS = 50
+"""Maximum number of connections, idle or in use, per storage service; requests beyond it wait for one"""
+
+# Errors raised when the server has closed a kept-alive connection under us
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                            ConnectionResetError, BrokenPipeError)
+
+# Methods sent again when the response was lost. Storage updates use PUT with expressions that
+# increment values, so PUT is not one of them.
+_RETRYABLE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class HTTPConnectionPool(object):
+    """ A bounded pool of keep-alive HTTP connections to a single host:port
+
+    Pools are shared process wide, one per ``base_url``; use :meth:`for_url` to obtain one.
+    A connection is checked out for the duration of a single request and returned to the pool
+    once its response has been read. Connections idle for longer than ``max_idle_seconds``, or closed
+    by the server, are evicted rather than reused. At most ``max_connections`` are open at a time; a
+    request beyond that waits until a connection is returned.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, base_url, max_idle_connections=_MAX_IDLE_CONNECTIONS, max_idle_seconds=_MAX_IDLE_SECONDS,
+                 max_connections=_MAX_CONNECTIONS):
+        self.base_url = base_url
+        self.max_idle_connections = max_idle_connections
+        self.max_idle_seconds = max_idle_seconds
+        self.max_connections = max_connections
+
+        self._idle = collections.deque()  # (connection, last used time), most recently used on the right
+        self._lock = threading.Lock()
+        self._checkouts = threading.BoundedSemaphore(max_connections)
+        """One slot per connection that is checked out"""
+
+        self.connections_opened = 0
+        """Number of new TCP connections made"""
+
+        self.connections_reused = 0
+        """Number of requests served by an already open connection"""
+
+        self.connections_evicted = 0
+        """Number of idle connections closed because they were too old, unhealthy or surplus"""
+
+    @classmethod
+    def for_url(cls, base_url):
+        """ Returns the shared pool for the given host:port, creating it on first use """
+        pool = cls._pools.get(base_url)
+        if pool is None:
+            with cls._pools_lock:
+                pool = cls._pools.get(base_url)
+                if pool is None:
+                    pool = cls(base_url)
+                    cls._pools[base_url] = pool
+        return pool
+
+    @classmethod
+    def close_all(cls):
+        """ Closes the idle connections of every pool """
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+
+    @classmethod
+    def stats_all(cls):
+        """ Returns the :meth:`stats` of every pool, keyed by host:port """
+        with cls._pools_lock:
+            return {base_url: pool.stats() for base_url, pool in cls._pools.items()}
+
+    def stats(self):
+        """ Returns the number of connections opened, reused and evicted, and of idle connections """
+        return {
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+            "connections_evicted": self.connections_evicted,
+            "idle_connections": len(self._idle)
+        }
+
+    def close(self):
+        """ Closes all idle connections """
+        with self._lock:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                conn.close()
+
+    @staticmethod
+    def _is_healthy(conn):
+        """ A kept-alive connection with nothing in flight must not be readable;
+        if it is, the server has closed it (or sent something unexpected)
+        """
+        if conn.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _acquire(self):
+        """ Checks out a connection, waiting while max_connections are checked out; see :meth:`_release`
+
+        Returns (connection, reused)
+        """
+        self._checkouts.acquire()
+        now = time.time()
+        with self._lock:
+            # Oldest connections are on the left
+            while self._idle and now - self._idle[0][1] > self.max_idle_seconds:
+                conn, _ = self._idle.popleft()
+                conn.close()
+                self.connections_evicted += 1
+
+            while self._idle:
+                conn, _ = self._idle.pop()
+                if self._is_healthy(conn):
+                    self.connections_reused += 1
+                    return conn, True
+                conn.close()
+                self.connections_evicted += 1
+
+            self.connections_opened += 1
+
+        # TODO: need to set http / https based on service protocol
+        return http.client.HTTPConnection(self.base_url), False
+
+    def _release(self, conn, reusable=True):
+        """ Returns a checked out connection to the pool, or closes it when it is not reusable or the pool is full """
+        try:
+            if reusable:
+                with self._lock:
+                    if len(self._idle) < self.max_idle_connections:
+                        self._idle.append((conn, time.time()))
+                        return
+                    self.connections_evicted += 1
+            conn.close()
+        finally:
+            self._checkouts.release()
+
+    def request(self, method, url, body=None):
+        """ Sends a request over a pooled connection and reads the whole response
+
+        :param method: HTTP method
+        :param url: path and query string
+        :param body: request body
+        :return: (response, decoded response body)
+        """
+        conn, reused = self._acquire()
+        try:
+            sent = False
+            try:
+                conn.request(method, url=url, body=body)
+                sent = True
+                r = conn.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                # A request that was sent may have been applied even though its response was lost
+                if not reused or (sent and method not in _RETRYABLE_METHODS):
+                    raise
+                # The server dropped the idle connection; retry once on a fresh one
+                conn.close()
+                with self._lock:
+                    self.connections_evicted += 1
+                    self.connections_opened += 1
+                conn = http.client.HTTPConnection(self.base_url)
+                conn.request(method, url=url, body=body)
+                r = conn.getresponse()
+            res = r.read().decode()
+        except Exception:
+            self._release(conn, reusable=False)
+            raise
+
+        self._release(conn, reusable=not r.will_close)
+
+        return r, res
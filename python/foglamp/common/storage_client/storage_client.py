@@ -15,9 +15,11 @@ __version__ = "${VERSION}"
 from abc import ABC, abstractmethod
 import http.client
 import json
+import aiohttp
 
 from foglamp.common import logger
 from foglamp.common.service_record import ServiceRecord
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 from foglamp.common.storage_client.exceptions import *
 from foglamp.common.storage_client.utils import Utils
 
@@ -69,6 +71,11 @@ class StorageClient(AbstractStorage):
     def base_url(self, url):
         self.__base_url = url
 
+    @property
+    def connection_pool(self):
+        """ The keep-alive connection pool shared by all clients of this storage service """
+        return HTTPConnectionPool.for_url(self.base_url)
+
     @property
     def service(self):
         return self.__service
@@ -147,15 +154,9 @@ class StorageClient(AbstractStorage):
         if not Utils.is_json(data):
             raise TypeError("Provided data to insert must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
-
         post_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        conn.request('POST', url=post_url, body=data)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = self.connection_pool.request('POST', post_url, body=data)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -195,14 +196,9 @@ class StorageClient(AbstractStorage):
         if not Utils.is_json(data):
             raise TypeError("Provided data to update must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         put_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
-        conn.request('PUT', url=put_url, body=data)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = self.connection_pool.request('PUT', put_url, body=data)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -232,17 +228,12 @@ class StorageClient(AbstractStorage):
         if not tbl_name:
             raise ValueError("Table name is missing")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         del_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
         if condition and (not Utils.is_json(condition)):
             raise TypeError("condition payload must be a valid JSON")
 
-        conn.request('DELETE', url=del_url, body=condition)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = self.connection_pool.request('DELETE', del_url, body=condition)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -266,18 +257,12 @@ class StorageClient(AbstractStorage):
         if not tbl_name:
             raise ValueError("Table name is missing")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
-
         get_url = '/storage/table/{tbl_name}'.format(tbl_name=tbl_name)
 
         if query:  # else SELECT * FROM <tbl_name>
             get_url += '?{}'.format(query)
 
-        conn.request('GET', url=get_url)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = self.connection_pool.request('GET', get_url)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -312,14 +297,9 @@ class StorageClient(AbstractStorage):
         if not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
-        conn = http.client.HTTPConnection(self.base_url)
-        # TODO: need to set http / https based on service protocol
         put_url = '/storage/table/{tbl_name}/query'.format(tbl_name=tbl_name)
 
-        conn.request('PUT', url=put_url, body=query_payload)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = self.connection_pool.request('PUT', put_url, body=query_payload)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -367,19 +347,13 @@ class ReadingsStorageClient(StorageClient):
 
         """
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if not readings:
             raise ValueError("Readings payload is missing")
 
         if not Utils.is_json(readings):
             raise TypeError("Readings payload must be a valid JSON")
 
-        conn.request('POST', url='/storage/reading', body=readings)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = HTTPConnectionPool.for_url(cls._base_url).request('POST', '/storage/reading', body=readings)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -401,9 +375,6 @@ class ReadingsStorageClient(StorageClient):
 
         """
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if reading_id is None:
             raise ValueError("first reading id to retrieve the readings block is required")
 
@@ -416,10 +387,7 @@ class ReadingsStorageClient(StorageClient):
             raise
 
         get_url = '/storage/reading?id={}&count={}'.format(reading_id, count)
-        conn.request('GET', url=get_url)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = HTTPConnectionPool.for_url(cls._base_url).request('GET', get_url)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -453,13 +421,7 @@ class ReadingsStorageClient(StorageClient):
         if not Utils.is_json(query_payload):
             raise TypeError("Query payload must be a valid JSON")
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
-        conn.request('PUT', url='/storage/reading/query', body=query_payload)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = HTTPConnectionPool.for_url(cls._base_url).request('PUT', '/storage/reading/query', body=query_payload)
         jdoc = json.loads(res, strict=False)
 
         if r.status in range(400, 600):
@@ -510,9 +472,6 @@ class ReadingsStorageClient(StorageClient):
         except ValueError:
             raise
 
-        conn = http.client.HTTPConnection(cls._base_url)
-        # TODO: need to set http / https based on service protocol
-
         if age:
             put_url = '/storage/reading/purge?age={}&sent={}'.format(_age, _sent_id)
         if size:
@@ -520,10 +479,7 @@ class ReadingsStorageClient(StorageClient):
         if flag:
             put_url += "&flags={}".format(flag.lower())
 
-        conn.request('PUT', url=put_url, body=None)
-        r = conn.getresponse()
-        res = r.read().decode()
-        conn.close()
+        r, res = HTTPConnectionPool.for_url(cls._base_url).request('PUT', put_url, body=None)
         jdoc = json.loads(res, strict=False)
 
         # NOTE: If the data could not be deleted because of a conflict, then the error “409 Conflict” will be returned.
@@ -532,3 +488,93 @@ class ReadingsStorageClient(StorageClient):
             raise StorageServerError(code=r.status, reason=r.reason, error=jdoc)
 
         return jdoc
+
+
+class ReadingsStorageClientAsync(ReadingsStorageClient):
+    """ Readings table operations over a pool of keep-alive connections, for use from within an event loop
+
+    Unlike :class:`ReadingsStorageClient`, requests do not block the event loop and up to ``pool_size``
+    requests may be in flight concurrently, each reusing an idle connection when one is available.
+    """
+
+    def __init__(self, core_mgt_host, core_mgt_port, svc=None, pool_size=5, keepalive_timeout=60):
+        super().__init__(core_mgt_host=core_mgt_host, core_mgt_port=core_mgt_port, svc=svc)
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._session = None
+
+        self.batches_sent = 0
+        """Number of readings payloads sent to storage"""
+
+        self.bytes_sent = 0
+        """Total size of the readings payloads sent to storage"""
+
+        self.last_batch_bytes = 0
+        """Size of the most recent readings payload"""
+
+    def _get_session(self):
+        """ Lazily creates the shared client session, so that it is bound to the running event loop """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """ Closes the pooled connections """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def append(self, readings):
+        """
+        :param readings: JSON payload, see :meth:`ReadingsStorageClient.append`
+        :return:
+        """
+
+        if not readings:
+            raise ValueError("Readings payload is missing")
+
+        if not Utils.is_json(readings):
+            raise TypeError("Readings payload must be a valid JSON")
+
+        return await self._post_readings(readings)
+
+    async def append_encoded(self, readings):
+        """ Appends readings that have already been encoded, one JSON object per reading
+
+        The readings are joined into a single payload as is, without being decoded or validated;
+        each element must be a JSON encoded reading as described in :meth:`ReadingsStorageClient.append`.
+
+        :param readings: list of JSON encoded readings
+        :return:
+
+        :Example:
+            await client.append_encoded(['{"asset_code": "MyAsset", "read_key": "5b3be500-ff95-41ae-b5a4-cc99d08bef40",
+                                           "reading": {"rate": 18.4}, "user_ts": "2017-09-21 15:00:09.025655"}'])
+        """
+
+        if not readings:
+            raise ValueError("Readings payload is missing")
+
+        return await self._post_readings('{"readings":[' + ','.join(readings) + ']}')
+
+    async def _post_readings(self, payload):
+        # TODO: need to set http / https based on service protocol
+        url = 'http://{}/storage/reading'.format(self.base_url)
+
+        data = payload.encode()
+        self.last_batch_bytes = len(data)
+        self.bytes_sent += self.last_batch_bytes
+        self.batches_sent += 1
+
+        async with self._get_session().post(url, data=data) as resp:
+            status_code = resp.status
+            res = await resp.text()
+            jdoc = json.loads(res, strict=False)
+
+            if status_code in range(400, 600):
+                _LOGGER.error("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
+                              '/storage/reading', payload, status_code, resp.reason, jdoc)
+                raise StorageServerError(code=status_code, reason=resp.reason, error=jdoc)
+
+        return jdoc
@@ -63,13 +63,9 @@ async def auth_middleware(app, handler):
         token = request.headers.get('authorization', None)
         if token:
             try:
-                # validate the token and get user id
-                uid = User.Objects.validate_token(token)
-                # extend the token expiry, as token is valid
-                # and no bad token exception raised
-                User.Objects.refresh_token_expiry(token)
-                # set the user to request object
-                request.user = User.Objects.get(uid=uid)
+                # validate the token, extend its expiry and get its user,
+                # from the token cache when the token was validated recently
+                request.user = User.Objects.authenticate(token)
                 # set the token to request
                 request.token = token
             except(User.InvalidToken, User.TokenExpired) as e:
@@ -9,6 +9,7 @@
 """
 
 import asyncio
+import math
 
 from foglamp.common.configuration_manager import ConfigurationManager
 
@@ -50,7 +51,11 @@ def convert_to_type(value):
      Raises:
      """
 
-    value_type = evaluate_type(value)
+    return _convert_as(value, evaluate_type(value))
+
+
+def _convert_as(value, value_type):
+    """Converts value to the type evaluated by evaluate_type"""
 
     if value_type == "string":
         value_converted = value
@@ -104,6 +109,112 @@ def evaluate_type(value):
     return evaluated_type
 
 
+_MAX_EXACT_INTEGER = 2 ** 53
+"""Integers up to this magnitude are unchanged by the conversion to float done by evaluate_type"""
+
+_NOT_CONVERTED = object()
+
+
+class TypeConverter(object):
+    """Converts the values of readings as convert_to_type does, remembering for every asset and field
+    the type evaluated for the last value
+
+    Values having the remembered type are converted directly, checking only what is needed to be sure
+    that evaluate_type would give the same type; the others fall back to evaluate_type and the
+    remembered type is updated.
+    """
+
+    def __init__(self):
+        self._types = {}
+        """ Evaluated type by field, by asset code """
+
+        self.converted = 0
+        """ Values converted using the remembered type """
+
+        self.evaluated = 0
+        """ Values converted evaluating their type """
+
+    def convert_reading(self, asset_code, reading):
+        """Converts the values of a reading in place, for example "180.2" to float 180.2
+
+        Args:
+            asset_code: asset code of the reading
+            reading: dict of the values to convert
+        Returns:
+            reading
+        Raises:
+            the exceptions raised by convert_to_type
+        """
+        try:
+            types = self._types[asset_code]
+        except KeyError:
+            types = self._types[asset_code] = {}
+
+        convert_known = self._convert_known
+        converted_count = 0
+
+        for key, value in reading.items():
+            value_type = types.get(key)
+
+            if value_type is not None:
+                converted = convert_known(value, value_type)
+                if converted is not _NOT_CONVERTED:
+                    converted_count += 1
+                    if converted is not value:
+                        reading[key] = converted
+                    continue
+
+            value_type = evaluate_type(value)
+            types[key] = value_type
+            self.evaluated += 1
+            reading[key] = _convert_as(value, value_type)
+
+        self.converted += converted_count
+        return reading
+
+    @staticmethod
+    def _convert_known(value, value_type):
+        """Converts value if evaluate_type would evaluate it to value_type, otherwise returns _NOT_CONVERTED"""
+
+        value_class = type(value)
+
+        if value_class is str:
+            if value_type == "string":
+                # float() accepts only digits, signs, dots, blanks and the words inf, infinity and nan
+                first = value[:1]
+                if first.isalpha() and first not in "iInN":
+                    return value
+
+            elif value_type == "integer":
+                try:
+                    converted = int(value)
+                except ValueError:
+                    return _NOT_CONVERTED
+                # Rules out "+1", "01", " 1" and "1_0" as evaluate_type compares the strings
+                if -_MAX_EXACT_INTEGER <= converted <= _MAX_EXACT_INTEGER and str(converted) == value:
+                    return converted
+
+            elif value_type == "number":
+                # A string without any of these characters could be evaluated as integer
+                if "." in value or "e" in value or "E" in value:
+                    try:
+                        converted = float(value)
+                    except ValueError:
+                        return _NOT_CONVERTED
+                    if math.isfinite(converted):
+                        return converted
+
+        elif value_class is int:
+            if value_type == "integer" and -_MAX_EXACT_INTEGER <= value <= _MAX_EXACT_INTEGER:
+                return value
+
+        elif value_class is float:
+            if value_type == "number" and math.isfinite(value):
+                return value
+
+        return _NOT_CONVERTED
+
+
 def identify_unique_asset_codes(raw_data):
     """Identify unique asset codes in the data block
 
@@ -115,23 +226,20 @@ def identify_unique_asset_codes(raw_data):
     Raises:
     """
 
-    unique_asset_codes = []
+    # Keyed by asset code, the first row of an asset provides its data; dicts keep the insertion order
+    unique_asset_codes = {}
 
     for row in raw_data:
         asset_code = row['asset_code']
-        asset_data = row['reading']
 
-        # Evaluates if the asset_code is already in the list
-        if not any(item["asset_code"] == asset_code for item in unique_asset_codes):
+        if asset_code not in unique_asset_codes:
 
-            unique_asset_codes.append(
-                {
-                    "asset_code": asset_code,
-                    "asset_data": asset_data
-                }
-            )
+            unique_asset_codes[asset_code] = {
+                "asset_code": asset_code,
+                "asset_data": row['reading']
+            }
 
-    return unique_asset_codes
+    return list(unique_asset_codes.values())
 
 
 def retrieve_configuration(_storage, _category_name, _default, _category_description):
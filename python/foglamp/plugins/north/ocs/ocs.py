@@ -74,6 +74,10 @@ _config = {}
 # Forces the recreation of PIServer objects when the first error occurs
 _recreate_omf_objects = True
 
+# Plugin object used for all the blocks sent with the same plugin handle, see _plugin_object
+_ocs_north = None
+_ocs_north_handle = None
+
 # Messages used for Information, Warning and Error notice
 _MESSAGES_LIST = {
     # Information messages
@@ -148,6 +152,22 @@ _CONFIG_DEFAULT_OMF = {
         "type": "integer",
         "default": "30"
     },
+    "OMFTypesBatchSize": {
+        "description": "Max number of assets whose OMF types, containers and links are created "
+                       "using a single OMF message of each kind",
+        "type": "integer",
+        "default": "50"
+    },
+    "OMFTypesMaxWorkers": {
+        "description": "Max number of batches of OMF types created concurrently",
+        "type": "integer",
+        "default": "4"
+    },
+    "OMFCompression": {
+        "description": "Whether to gzip compress the OMF messages sent to OCS",
+        "type": "boolean",
+        "default": "False"
+    },
     "StaticData": {
         "description": "Static data to include in each sensor reading sent to OMF.",
         "type": "JSON",
@@ -302,6 +322,8 @@ def plugin_init(data):
     global _config_omf_types
     global _logger
     global _recreate_omf_objects
+    global _ocs_north
+    global _ocs_north_handle
 
     try:
         # note : _module_name is used as __name__ refers to the Sending Process
@@ -330,6 +352,9 @@ def plugin_init(data):
     _config['OMFMaxRetry'] = int(data['OMFMaxRetry']['value'])
     _config['OMFRetrySleepTime'] = int(data['OMFRetrySleepTime']['value'])
     _config['OMFHttpTimeout'] = int(data['OMFHttpTimeout']['value'])
+    _config['OMFTypesBatchSize'] = int(data['OMFTypesBatchSize']['value'])
+    _config['OMFTypesMaxWorkers'] = int(data['OMFTypesMaxWorkers']['value'])
+    _config['OMFCompression'] = True if data['OMFCompression']['value'].upper() == 'TRUE' else False
     _config['StaticData'] = ast.literal_eval(data['StaticData']['value'])
 
     _config['formatNumber'] = data['formatNumber']['value']
@@ -364,6 +389,11 @@ def plugin_init(data):
 
     try:
         _recreate_omf_objects = True
+        _ocs_north = None
+        _ocs_north_handle = None
+        # A connection for each of the threads creating the OMF types
+        omf._close_http_session()
+        omf._http_session(_config['OMFTypesMaxWorkers'])
 
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000011"].format(ex))
@@ -375,6 +405,23 @@ def plugin_init(data):
     return _config
 
 
+def _plugin_object(data):
+    """ Returns the plugin object for the plugin handle, it is created for the first block and then reused
+        so that what it memoizes is kept across blocks
+    Args:
+        data: plugin_handle from sending_process
+    Returns:
+        OCSNorthPlugin
+    """
+    global _ocs_north
+    global _ocs_north_handle
+
+    if _ocs_north is None or _ocs_north_handle is not data:
+        _ocs_north = OCSNorthPlugin(data['sending_process_instance'], data, _config_omf_types, _logger)
+        _ocs_north_handle = data
+    return _ocs_north
+
+
 # noinspection PyUnusedLocal
 @_performance_log
 def plugin_send(data, raw_data, stream_id):
@@ -402,7 +449,7 @@ def plugin_send(data, raw_data, stream_id):
     omf._log_debug_level = _log_debug_level
     omf._log_performance = _log_performance
 
-    ocs_north = OCSNorthPlugin(data['sending_process_instance'], data, _config_omf_types, _logger)
+    ocs_north = _plugin_object(data)
 
     try:
         is_data_available, new_position, num_sent = ocs_north.transform_in_memory_data(data_to_send, raw_data)
@@ -437,8 +484,16 @@ def plugin_shutdown(data):
     Returns:
     Raises:
     """
+    global _ocs_north
+    global _ocs_north_handle
+
     try:
         _logger.debug("{0} - plugin_shutdown".format(_MODULE_NAME))
+        if _log_performance:
+            omf._log_message_stats(_logger)
+        omf._close_http_session()
+        _ocs_north = None
+        _ocs_north_handle = None
 
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000013"].format(ex))
@@ -465,10 +520,10 @@ class OCSNorthPlugin(omf.OmfNorthPlugin):
 
         super().__init__(sending_process_instance, config, config_omf_types, _logger)
 
-    def _create_omf_type_automatic(self, asset_info):
-        """ Automatic OMF Type Mapping - Handles the OMF type creation
+    def _generate_omf_type_automatic(self, asset_info):
+        """ Automatic OMF Type Mapping - Generates the OMF type
 
-            Overwrite omf._create_omf_type_automatic function
+            Overwrite omf._generate_omf_type_automatic function
             OCS needs the setting of the 'format' property to handle decimal numbers properly
 
          Args:
@@ -508,7 +563,7 @@ class OCSNorthPlugin(omf.OmfNorthPlugin):
 
             self._logger.debug(
                 "func |{func}| - item_type |{type}| - formatInteger |{int}| - formatNumber |{float}| ".format(
-                            func="_create_omf_type_automatic",
+                            func="_generate_omf_type_automatic",
                             type=item_type,
                             int=self._config['formatInteger'],
                             float=self._config['formatNumber']))
@@ -525,9 +580,7 @@ class OCSNorthPlugin(omf.OmfNorthPlugin):
                 omf_type[typename][1]["properties"][item] = {"type": item_type}
 
         if _log_debug_level == 3:
-            self._logger.debug("_create_omf_type_automatic - sensor_id |{0}| - omf_type |{1}| "
+            self._logger.debug("_generate_omf_type_automatic - sensor_id |{0}| - omf_type |{1}| "
                                .format(sensor_id, str(omf_type)))
 
-        self.send_in_memory_data_to_picromf("Type", omf_type[typename])
-
         return typename, omf_type
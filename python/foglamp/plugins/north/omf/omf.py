@@ -20,6 +20,9 @@ import json
 import requests
 import logging
 import urllib3
+import concurrent.futures
+import gzip
+import threading
 import foglamp.plugins.north.common.common as plugin_common
 import foglamp.plugins.north.common.exceptions as plugin_exceptions
 from foglamp.common import logger
@@ -71,6 +74,23 @@ _config = {}
 # Forces the recreation of PIServer objects when the first error occurs
 _recreate_omf_objects = True
 
+# Plugin object used for all the blocks sent with the same plugin handle, see _plugin_object
+_omf_north = None
+_omf_north_handle = None
+
+# Asset codes whose OMF objects are already created, by (configuration_key, type_id),
+# loaded from the omf_created_objects table once per process
+_omf_types_created = {}
+
+# Keep-alive HTTP session shared by the plugin instances of the process, see _http_session
+_session = None
+
+# Counters of the OMF messages sent, by message type, see _update_message_stats
+_message_stats = {}
+_message_stats_lock = threading.Lock()
+
+_OMF_COMPRESSION_LEVEL = 6
+
 # Messages used for Information, Warning and Error notice
 _MESSAGES_LIST = {
     # Information messages
@@ -112,6 +132,22 @@ _CONFIG_DEFAULT_OMF = {
         "type": "integer",
         "default": "10"
     },
+    "OMFTypesBatchSize": {
+        "description": "Max number of assets whose OMF types, containers and links are created "
+                       "using a single OMF message of each kind",
+        "type": "integer",
+        "default": "50"
+    },
+    "OMFTypesMaxWorkers": {
+        "description": "Max number of batches of OMF types created concurrently",
+        "type": "integer",
+        "default": "4"
+    },
+    "OMFCompression": {
+        "description": "Whether to gzip compress the OMF messages sent to the PI Connector Relay",
+        "type": "boolean",
+        "default": "False"
+    },
     "StaticData": {
         "description": "Static data to include in each sensor reading sent to OMF.",
         "type": "JSON",
@@ -242,6 +278,80 @@ def _performance_log(_function):
     return wrapper
 
 
+def _http_session(pool_maxsize=requests.adapters.DEFAULT_POOLSIZE):
+    """ Returns the HTTP session used to send OMF messages, creating it the first time.
+        The session keeps the connections alive so that the TCP and TLS handshakes are not repeated
+        for every message. The threads creating the OMF types only share its urllib3 connection pools,
+        which keep up to pool_maxsize connections per host so that each thread can reuse one;
+        the threads do not change the session's headers, cookies or adapters.
+    """
+    global _session
+
+    if _session is None:
+        _session = requests.Session()
+        pool_maxsize = max(pool_maxsize, requests.adapters.DEFAULT_POOLSIZE)
+        _session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize))
+        _session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=pool_maxsize))
+    return _session
+
+
+def _close_http_session():
+    """ Closes the HTTP session and its connections, a new one is created if needed """
+    global _session
+
+    if _session is not None:
+        _session.close()
+        _session = None
+
+
+def _update_message_stats(message_type, num_bytes, num_bytes_sent, milliseconds):
+    """ Accumulates the counters of the OMF messages sent and returns the ones of message_type """
+    with _message_stats_lock:
+        stats = _message_stats.setdefault(message_type, {"messages": 0,
+                                                         "bytes": 0,
+                                                         "bytes_sent": 0,
+                                                         "milliseconds": 0})
+        stats["messages"] += 1
+        stats["bytes"] += num_bytes
+        stats["bytes_sent"] += num_bytes_sent
+        stats["milliseconds"] += milliseconds
+        return dict(stats)
+
+
+def _log_message_stats(log):
+    """ Logs the totals of the OMF messages sent, by message type """
+    with _message_stats_lock:
+        for message_type, stats in sorted(_message_stats.items()):
+            log.info("PERFORMANCE - OMF {0} messages |{1:>8,}| - bytes |{2:>12,}| - bytes sent |{3:>12,}| "
+                         "- milliseconds |{4:>8,}|".format(message_type,
+                                                          stats["messages"],
+                                                          stats["bytes"],
+                                                          stats["bytes_sent"],
+                                                          stats["milliseconds"]))
+
+
+def _omf_timestamp(timestamp_raw):
+    """ Converts a date/time retrieved from the Storage layer to the ISO format used by OMF,
+        Z is the zone designator for the zero UTC offset
+    Args:
+        timestamp_raw: date/time as 2018-04-20 09:38:50.163164+00, or already in the ISO format
+    Returns:
+        date/time as 2018-04-20T09:38:50.163164Z
+    Raises:
+        ValueError: the date/time is in neither format
+    """
+    # Fast path for the format produced by the Sending Process, slicing it avoids strptime
+    if len(timestamp_raw) == 29 and timestamp_raw[10] == ' ' and timestamp_raw[19] == '.' \
+            and timestamp_raw.endswith('+00'):
+        return timestamp_raw[:10] + 'T' + timestamp_raw[11:26] + 'Z'
+
+    if len(timestamp_raw) > 19 and timestamp_raw[10] == 'T' and timestamp_raw.endswith('Z'):
+        return timestamp_raw
+
+    step1 = datetime.datetime.strptime(timestamp_raw, '%Y-%m-%d %H:%M:%S.%f+00')
+    return step1.isoformat() + 'Z'
+
+
 def plugin_info():
     return {
         'name': "OMF North",
@@ -310,6 +420,8 @@ def plugin_init(data):
     global _config_omf_types
     global _logger
     global _recreate_omf_objects
+    global _omf_north
+    global _omf_north_handle
 
     try:
         # note : _module_name is used as __name__ refers to the Sending Proces
@@ -333,6 +445,9 @@ def plugin_init(data):
     _config['OMFMaxRetry'] = int(data['OMFMaxRetry']['value'])
     _config['OMFRetrySleepTime'] = int(data['OMFRetrySleepTime']['value'])
     _config['OMFHttpTimeout'] = int(data['OMFHttpTimeout']['value'])
+    _config['OMFTypesBatchSize'] = int(data['OMFTypesBatchSize']['value'])
+    _config['OMFTypesMaxWorkers'] = int(data['OMFTypesMaxWorkers']['value'])
+    _config['OMFCompression'] = True if data['OMFCompression']['value'].upper() == 'TRUE' else False
     _config['StaticData'] = ast.literal_eval(data['StaticData']['value'])
     # TODO: compare instance fetching via inspect vs as param passing
     # import inspect
@@ -358,6 +473,11 @@ def plugin_init(data):
     _logger.debug("{0} - URL {1}".format("plugin_init", _config['URL']))
     try:
         _recreate_omf_objects = True
+        _omf_north = None
+        _omf_north_handle = None
+        # A connection for each of the threads creating the OMF types
+        _close_http_session()
+        _http_session(_config['OMFTypesMaxWorkers'])
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000011"].format(ex))
         raise plugin_exceptions.PluginInitializeFailed(ex)
@@ -367,6 +487,24 @@ def plugin_init(data):
 
     return _config
 
+
+def _plugin_object(data):
+    """ Returns the plugin object for the plugin handle, it is created for the first block and then reused
+        so that what it memoizes is kept across blocks
+    Args:
+        data: plugin_handle from sending_process
+    Returns:
+        OmfNorthPlugin
+    """
+    global _omf_north
+    global _omf_north_handle
+
+    if _omf_north is None or _omf_north_handle is not data:
+        _omf_north = OmfNorthPlugin(data['sending_process_instance'], data, _config_omf_types, _logger)
+        _omf_north_handle = data
+    return _omf_north
+
+
 @_performance_log
 def plugin_send(data, raw_data, stream_id):
     """ Translates and sends to the destination system the data provided by the Sending Process
@@ -388,7 +526,7 @@ def plugin_send(data, raw_data, stream_id):
     data_to_send = []
     type_id = _config_omf_types['type-id']['value']
 
-    omf_north = OmfNorthPlugin(data['sending_process_instance'], data, _config_omf_types, _logger)
+    omf_north = _plugin_object(data)
 
     try:
         is_data_available, new_position, num_sent = omf_north.transform_in_memory_data(data_to_send, raw_data)
@@ -416,8 +554,16 @@ def plugin_shutdown(data):
     Returns:
     Raises:
     """
+    global _omf_north
+    global _omf_north_handle
+
     try:
         _logger.debug("{0} - plugin_shutdown".format(_MODULE_NAME))
+        if _log_performance:
+            _log_message_stats(_logger)
+        _close_http_session()
+        _omf_north = None
+        _omf_north_handle = None
     except Exception as ex:
         _logger.error(plugin_common.MESSAGES_LIST["e000013"].format(ex))
         raise
@@ -439,6 +585,11 @@ class OmfNorthPlugin(object):
         self._config = config
         self._config_omf_types = config_omf_types
         self._logger = _logger
+        self._session = _http_session()
+
+        # Memoized by asset code
+        self._measurement_ids = {}
+        self._typenames = {}
 
     def deleted_omf_types_already_created(self, config_category_name, type_id):
         """ Deletes OMF types/objects tracked as already created, it is used to force the recreation of the types
@@ -454,6 +605,24 @@ class OmfNorthPlugin(object):
             .payload()
 
         self._sending_process_instance._storage.delete_from_tbl("omf_created_objects", payload)
+        _omf_types_created.pop((config_category_name, type_id), None)
+
+    def _omf_types_already_created(self, configuration_key, type_id):
+        """ Returns the asset codes whose OMF objects are already created, retrieving them from the Storage layer
+            only the first time for the process
+         Args:
+             configuration_key - part of the key to identify the type
+             type_id           - part of the key to identify the type
+         Returns:
+            Set of asset codes already defined into the PI Server, updated by _flag_created_omf_type
+         Raises:
+         """
+        key = (configuration_key, type_id)
+        try:
+            return _omf_types_created[key]
+        except KeyError:
+            asset_codes = set(self._retrieve_omf_types_already_created(configuration_key, type_id))
+            return _omf_types_created.setdefault(key, asset_codes)
     
     def _retrieve_omf_types_already_created(self, configuration_key, type_id):
         """ Retrieves the list of OMF types already defined/sent to the PICROMF
@@ -494,6 +663,7 @@ class OmfNorthPlugin(object):
                     type_id=type_id)\
             .payload()
         self._sending_process_instance._storage.insert_into_tbl("omf_created_objects", payload)
+        _omf_types_created.setdefault((configuration_key, type_id), set()).add(asset_code)
     
     def _generate_omf_asset_id(self, asset_code):
         """ Generates an asset id usable by AF/PI Server from an asset code stored into the Storage layer
@@ -514,9 +684,14 @@ class OmfNorthPlugin(object):
             Measurement id associated to the specific asset code
          Raises:
          """
-        asset_id = asset_code.replace(" ", "")
-        type_id = self._config_omf_types['type-id']['value']
-        return type_id + _OMF_PREFIX_MEASUREMENT + asset_id
+        try:
+            return self._measurement_ids[asset_code]
+        except KeyError:
+            asset_id = asset_code.replace(" ", "")
+            type_id = self._config_omf_types['type-id']['value']
+            measurement_id = type_id + _OMF_PREFIX_MEASUREMENT + asset_id
+            self._measurement_ids[asset_code] = measurement_id
+            return measurement_id
      
     def _generate_omf_typename_automatic(self, asset_code):
         """ Generates the typename associated to an asset code for the automated generation of the OMF types
@@ -526,23 +701,15 @@ class OmfNorthPlugin(object):
             typename associated to the specific asset code
          Raises:
          """
-        asset_id = asset_code.replace(" ", "")
-        return asset_id + _OMF_SUFFIX_TYPENAME
-    
-    def _create_omf_objects_automatic(self, asset_info):
-        """ Handles the Automatic OMF Type Mapping
-         Args:
-             asset_info : Asset's information as retrieved from the Storage layer,
-                          having also a sample value for the asset
-         Returns:
-             response_status_code: http response code related to the PICROMF request
-         Raises:
-         """
-        typename, omf_type = self._create_omf_type_automatic(asset_info)
-        self._create_omf_object_links(asset_info["asset_code"], typename, omf_type)
+        try:
+            return self._typenames[asset_code]
+        except KeyError:
+            typename = asset_code.replace(" ", "") + _OMF_SUFFIX_TYPENAME
+            self._typenames[asset_code] = typename
+            return typename
     
-    def _create_omf_type_automatic(self, asset_info):
-        """ Automatic OMF Type Mapping - Handles the OMF type creation
+    def _generate_omf_type_automatic(self, asset_info):
+        """ Automatic OMF Type Mapping - Generates the OMF type
          Args:
              asset_info : Asset's information as retrieved from the Storage layer,
                           having also a sample value for the asset
@@ -577,23 +744,11 @@ class OmfNorthPlugin(object):
             item_type = plugin_common.evaluate_type(asset_data[item])
             omf_type[typename][1]["properties"][item] = {"type": item_type}
         if _log_debug_level == 3:
-            self._logger.debug("_create_omf_type_automatic - sensor_id |{0}| - omf_type |{1}| ".format(sensor_id, str(omf_type)))
-        self.send_in_memory_data_to_picromf("Type", omf_type[typename])
+            self._logger.debug("_generate_omf_type_automatic - sensor_id |{0}| - omf_type |{1}| ".format(sensor_id, str(omf_type)))
         return typename, omf_type
     
-    def _create_omf_objects_configuration_based(self, asset_code, asset_code_omf_type):
-        """ Handles the Configuration Based OMF Type Mapping
-         Args:
-            asset_code
-            asset_code_omf_type : describe the OMF type as a python dict
-         Returns:
-         Raises:
-         """
-        typename, omf_type = self._create_omf_type_configuration_based(asset_code_omf_type)
-        self._create_omf_object_links(asset_code, typename, omf_type)
-    
-    def _create_omf_type_configuration_based(self, asset_code_omf_type):
-        """ Configuration Based OMF Type Mapping - Handles the OMF type creation
+    def _generate_omf_type_configuration_based(self, asset_code_omf_type):
+        """ Configuration Based OMF Type Mapping - Generates the OMF type
          Args:
             asset_code_omf_type : describe the OMF type as a python dict
          Returns:
@@ -612,18 +767,18 @@ class OmfNorthPlugin(object):
         omf_type[typename][1]["properties"] = asset_code_omf_type["dynamic"]
         omf_type[typename][1]["id"] = type_id + "_" + typename + "_measurement"
         if _log_debug_level == 3:
-            self._logger.debug("_create_omf_type_configuration_based - omf_type |{0}| ".format(str(omf_type)))
-        self.send_in_memory_data_to_picromf("Type", omf_type[typename])
+            self._logger.debug("_generate_omf_type_configuration_based - omf_type |{0}| ".format(str(omf_type)))
         return typename, omf_type
     
-    def _create_omf_object_links(self, asset_code, typename, omf_type):
-        """ Handles the creation of the links between the OMF objects :
+    def _generate_omf_object_links(self, asset_code, typename, omf_type):
+        """ Generates the OMF messages for the container of an asset and for the links between the OMF objects :
             sensor, its measurement, sensor type and measurement type
          Args:
             asset_code
             typename : name/id of the type
             omf_type : describe the OMF type as a python dict
          Returns:
+            containers, static_data, link_data : OMF messages as python lists
          Raises:
          """
         sensor_id = self._generate_omf_asset_id(asset_code)
@@ -648,16 +803,13 @@ class OmfNorthPlugin(object):
         link_data[0]["values"][1]['source']['index'] = sensor_id
         link_data[0]["values"][1]['target']['containerid'] = measurement_id
         if _log_debug_level == 3:
-            self._logger.debug("_create_omf_object_links - asset_code |{0}| - containers |{1}| ".format(asset_code,
-                                                                                                   str(containers)))
-            self._logger.debug("_create_omf_object_links - asset_code |{0}| - static_data |{1}| ".format(asset_code,
-                                                                                                    str(static_data)))
-            self._logger.debug("_create_omf_object_links - asset_code |{0}| - link_data |{1}| ".format(asset_code,
-                                                                                                  str(link_data)))
-        self.send_in_memory_data_to_picromf("Container", containers)
-        self.send_in_memory_data_to_picromf("Data", static_data)
-        self.send_in_memory_data_to_picromf("Data", link_data)
-        return
+            self._logger.debug("_generate_omf_object_links - asset_code |{0}| - containers |{1}| ".format(asset_code,
+                                                                                                     str(containers)))
+            self._logger.debug("_generate_omf_object_links - asset_code |{0}| - static_data |{1}| ".format(asset_code,
+                                                                                                      str(static_data)))
+            self._logger.debug("_generate_omf_object_links - asset_code |{0}| - link_data |{1}| ".format(asset_code,
+                                                                                                    str(link_data)))
+        return containers, static_data, link_data
     
     @_performance_log
     def create_omf_objects(self, raw_data, config_category_name, type_id):
@@ -672,28 +824,71 @@ class OmfNorthPlugin(object):
         Raises:
         """
         asset_codes_to_evaluate = plugin_common.identify_unique_asset_codes(raw_data)
-        asset_codes_already_created = self._retrieve_omf_types_already_created(config_category_name, type_id)
-        for item in asset_codes_to_evaluate:
+        asset_codes_already_created = self._omf_types_already_created(config_category_name, type_id)
+
+        # Evaluates which are new OMF types
+        new_assets = [item for item in asset_codes_to_evaluate
+                      if item["asset_code"] not in asset_codes_already_created]
+        if not new_assets:
+            return
+
+        batch_size = max(1, self._config['OMFTypesBatchSize'])
+        batches = [new_assets[i:i + batch_size] for i in range(0, len(new_assets), batch_size)]
+        max_workers = min(len(batches), max(1, self._config['OMFTypesMaxWorkers']))
+
+        if max_workers == 1:
+            for batch in batches:
+                self._create_omf_objects_batch(batch, config_category_name, type_id)
+            return
+
+        # The batches are independent, the first error is raised once all of them are completed
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._create_omf_objects_batch, batch, config_category_name, type_id)
+                       for batch in batches]
+        for future in futures:
+            future.result()
+
+    def _create_omf_objects_batch(self, assets_info, config_category_name, type_id):
+        """ Creates the OMF types, containers and links of a batch of new assets,
+            sending a single OMF message of each kind for the whole batch
+        Args:
+            assets_info :         assets' information as generated by identify_unique_asset_codes
+            config_category_name: used to identify OMF objects already created
+            type_id:              used to identify OMF objects already created
+        Returns:
+        Raises:
+        """
+        types = []
+        containers = []
+        static_data = []
+        link_data = []
+        for item in assets_info:
             asset_code = item["asset_code"]
-            # Evaluates if it is a new OMF type
-            if not any(tmp_item == asset_code for tmp_item in asset_codes_already_created):
-                asset_code_omf_type = ""
-                try:
-                    asset_code_omf_type = copy.deepcopy(self._config_omf_types[asset_code]["value"])
-                except KeyError:
-                    configuration_based = False
-                else:
-                    configuration_based = True
-                if configuration_based:
-                    self._logger.debug("creates type - configuration based - asset |{0}| ".format(asset_code))
-                    self._create_omf_objects_configuration_based(asset_code, asset_code_omf_type)
-                else:
-                    # handling - Automatic OMF Type Mapping
-                    self._logger.debug("creates type - automatic handling - asset |{0}| ".format(asset_code))
-                    self._create_omf_objects_automatic(item)
-                self._flag_created_omf_type(config_category_name, type_id, asset_code)
+            try:
+                # Only read to generate the OMF type, it does not need to be copied
+                asset_code_omf_type = self._config_omf_types[asset_code]["value"]
+            except KeyError:
+                # handling - Automatic OMF Type Mapping
+                self._logger.debug("creates type - automatic handling - asset |{0}| ".format(asset_code))
+                typename, omf_type = self._generate_omf_type_automatic(item)
             else:
-                self._logger.debug("asset already created - asset |{0}| ".format(asset_code))
+                self._logger.debug("creates type - configuration based - asset |{0}| ".format(asset_code))
+                typename, omf_type = self._generate_omf_type_configuration_based(asset_code_omf_type)
+
+            types.extend(omf_type[typename])
+            asset_containers, asset_static_data, asset_link_data = \
+                self._generate_omf_object_links(asset_code, typename, omf_type)
+            containers.extend(asset_containers)
+            static_data.extend(asset_static_data)
+            link_data.extend(asset_link_data)
+
+        self.send_in_memory_data_to_picromf("Type", types)
+        self.send_in_memory_data_to_picromf("Container", containers)
+        self.send_in_memory_data_to_picromf("Data", static_data)
+        self.send_in_memory_data_to_picromf("Data", link_data)
+
+        for item in assets_info:
+            self._flag_created_omf_type(config_category_name, type_id, item["asset_code"])
     
     @_performance_log
     def send_in_memory_data_to_picromf(self, message_type, omf_data):
@@ -717,20 +912,30 @@ class OmfNorthPlugin(object):
                       'messageformat': 'JSON',
                       'omfversion': '1.0'}
         omf_data_json = json.dumps(omf_data)
+        omf_data_bytes = omf_data_json.encode()
+        num_bytes = len(omf_data_bytes)
+        num_bytes_sent = num_bytes
 
-        self._logger.debug("OMF message length |{0}| ".format(len(omf_data_json)))
+        self._logger.debug("OMF message length |{0}| ".format(num_bytes))
 
         if _log_debug_level == 3:
             self._logger.debug("OMF message : |{0}| |{1}| " .format(message_type, omf_data_json))
 
+        if self._config['OMFCompression']:
+            msg_header['compression'] = 'gzip'
+            omf_data_json = gzip.compress(omf_data_bytes, compresslevel=_OMF_COMPRESSION_LEVEL)
+            num_bytes_sent = len(omf_data_json)
+
+        # The time of the message includes its retries
+        start = time.time()
         while num_retry <= self._config['OMFMaxRetry']:
             _error = False
             try:
-                response = requests.post(self._config['URL'],
-                                         headers=msg_header,
-                                         data=omf_data_json,
-                                         verify=False,
-                                         timeout=self._config['OMFHttpTimeout'])
+                response = self._session.post(self._config['URL'],
+                                              headers=msg_header,
+                                              data=omf_data_json,
+                                              verify=False,
+                                              timeout=self._config['OMFHttpTimeout'])
             except Exception as e:
                 _error = Exception(plugin_common.MESSAGES_LIST["e000024"].format(e))
                 _message = plugin_common.MESSAGES_LIST["e000024"].format(e)
@@ -752,12 +957,27 @@ class OmfNorthPlugin(object):
         if _error:
             self._logger.warning(_message)
             raise _error
+
+        milliseconds = int((time.time() - start) * 1000)
+        stats = _update_message_stats(message_type, num_bytes, num_bytes_sent, milliseconds)
+        if _log_performance:
+            self._logger.info("PERFORMANCE - OMF {0} message - bytes |{1:>10,}| - bytes sent |{2:>10,}| "
+                              "- milliseconds |{3:>8,}| - total milliseconds |{4:>10,}|".format(message_type,
+                                                                                            num_bytes,
+                                                                                            num_bytes_sent,
+                                                                                            milliseconds,
+                                                                                            stats["milliseconds"]))
     
     @_performance_log
     def transform_in_memory_data(self, data_to_send, raw_data):
-        """ Transforms the in memory data into a new structure that could be converted into JSON for the PICROMF
+        """ Transforms the in memory data into a new structure that could be converted into JSON for the PICROMF,
+            the values of the readings of an asset are grouped into a single container entry,
+            in the order they have in raw_data
         Args:
+            data_to_send: data block to send - extended by reference
+            raw_data:     data block as retrieved from the Storage layer
         Returns:
+            data_available, new_position, num_sent
         Raises:
         """
 
@@ -767,15 +987,26 @@ class OmfNorthPlugin(object):
         num_sent = 0
         # internal statistic - rows that generate errors in the preparation process, before sending them to OMF
         num_unsent = 0
+        # OMF container ID and values, by asset code
+        containers = {}
         try:
             for row in raw_data:
                 row_id = row['id']
                 asset_code = row['asset_code']
-                # Identification of the object/sensor
-                measurement_id = self._generate_omf_measurement(asset_code)
-                
+
+                try:
+                    values = containers[asset_code]
+                except KeyError:
+                    # Identification of the object/sensor
+                    measurement_id = self._generate_omf_measurement(asset_code)
+                    values = []
+                    containers[asset_code] = values
+                    data_to_send.append({"containerid": measurement_id, "values": values})
+
                 try:
-                    self._transform_in_memory_row(data_to_send, row, measurement_id)
+                    new_value = self._transform_in_memory_value(row, asset_code)
+                    if new_value is not None:
+                        values.append(new_value)
                     # Used for the statistics update
                     num_sent += 1
                     # Latest position reached
@@ -784,59 +1015,43 @@ class OmfNorthPlugin(object):
                 except Exception as e:
                     num_unsent += 1
                     self._logger.warning(plugin_common.MESSAGES_LIST["e000023"].format(e))
+
+            # Drops the assets having no values at all
+            if not all(containers.values()):
+                data_to_send[:] = [item for item in data_to_send if item["values"]]
         except Exception:
             self._logger.error(plugin_common.MESSAGES_LIST["e000021"])
             raise
         return data_available, new_position, num_sent
-    
-    def _transform_in_memory_row(self, data_to_send, row, target_stream_id):
-        """ Extends the in memory structure using data retrieved from the Storage Layer
+
+    def _transform_in_memory_value(self, row, target_stream_id):
+        """ Generates the OMF value of a row retrieved from the Storage Layer
         Args:
-            data_to_send:      data block to send - updated/used by reference
-            row:               information retrieved from the Storage Layer that it is used to extend data_to_send
-            target_stream_id:  OMF container ID
+            row:               information retrieved from the Storage Layer
+            target_stream_id:  OMF container ID or asset code, used for logging
         Returns:
+            the OMF value, None if the row has no data
         Raises:
         """
-        data_available = False
         try:
             row_id = row['id']
             asset_code = row['asset_code']
-            timestamp_raw = row['user_ts']
-
-            # Converts Date/time to a proper ISO format - Z is the zone designator for the zero UTC offset
-            step1 = datetime.datetime.strptime(timestamp_raw, '%Y-%m-%d %H:%M:%S.%f+00')
-            timestamp = step1.isoformat() + 'Z'
+            timestamp = _omf_timestamp(row['user_ts'])
 
             sensor_data = row['reading']
             if _log_debug_level == 3:
                 self._logger.debug("stream ID : |{0}| sensor ID : |{1}| row ID : |{2}|  "
-                              .format(target_stream_id, asset_code, str(row_id)))
-            # Prepares new data for the PICROMF
-            new_data = [
-                {
-                    "containerid": target_stream_id,
-                    "values": [
-                        {
-                            "Time": timestamp
-                        }
-                    ]
-                }
-            ]
-            # Evaluates which data is available
-            for data_key in sensor_data:
-                try:
-                    new_data[0]["values"][0][data_key] = sensor_data[data_key]
-                    data_available = True
-                except KeyError:
-                    pass
-            if data_available:
-                # note : append produces a not properly constructed OMF message
-                data_to_send.extend(new_data)
-                if _log_debug_level == 3:
-                    self._logger.debug("in memory info |{0}| ".format(new_data))
-            else:
+                                   .format(target_stream_id, asset_code, str(row_id)))
+            if not sensor_data:
                 self._logger.warning(plugin_common.MESSAGES_LIST["e000020"])
+                return None
+
+            # Prepares new data for the PICROMF
+            new_value = {"Time": timestamp}
+            new_value.update(sensor_data)
+            if _log_debug_level == 3:
+                self._logger.debug("in memory info |{0}| ".format(new_value))
+            return new_value
         except Exception:
             self._logger.error(plugin_common.MESSAGES_LIST["e000022"])
             raise
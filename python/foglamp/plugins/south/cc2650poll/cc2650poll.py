@@ -51,6 +51,17 @@ _DEFAULT_CONFIG = {
         'description': 'Management host',
         'type': 'string',
         'default': '127.0.0.1',
+    },
+    'devices': {
+        'description': 'Further SensorTags to poll, as a JSON list of the items that differ for each, '
+                       'e.g. [{"bluetoothAddress": "B0:91:22:EA:79:05"}]',
+        'type': 'JSON',
+        'default': '[]'
+    },
+    'pollWorkers': {
+        'description': 'The number of SensorTags polled at the same time',
+        'type': 'integer',
+        'default': '4'
     }
 }
 
@@ -101,10 +112,11 @@ def plugin_init(config):
                 handle = tag.get_char_handle(sensortag_characteristics[char][_type]['uuid'])
                 sensortag_characteristics[char][_type]['handle'] = handle
 
-        # Get Battery handle
-        handle = tag.get_char_handle(battery['data']['uuid'])
-        battery['data']['handle'] = handle
-        sensortag_characteristics['battery'] = battery
+        # Get Battery handle; each SensorTag has its own copy, as the handle may differ
+        sensortag_battery = copy.deepcopy(battery)
+        handle = tag.get_char_handle(sensortag_battery['data']['uuid'])
+        sensortag_battery['data']['handle'] = handle
+        sensortag_characteristics['battery'] = sensortag_battery
 
         data['characteristics'] = sensortag_characteristics
         data['tag'] = tag
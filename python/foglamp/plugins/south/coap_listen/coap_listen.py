@@ -196,6 +196,11 @@ class CoAPIngest(aiocoap.resource.Resource):
                             }
                         }
                     }
+
+                or to an array of such readings, which are added to Ingest as one batch. A
+                device that buffered readings can send them all in one message; one too large
+                for a single datagram is sent with block-wise transfer (RFC 7959 Block1 option),
+                which aiocoap reassembles before this handler is called.
         """
         # aiocoap handlers must be defensive about exceptions. If an exception
         # is raised out of a handler, it is permanently disabled by aiocoap.
@@ -208,6 +213,7 @@ class CoAPIngest(aiocoap.resource.Resource):
         code = aiocoap.numbers.codes.Code.VALID
         # TODO: Decide upon the correct format of message
         message = ''
+        batch = None
         try:
             if not Ingest.is_available():
                 message = '{"busy": true}'
@@ -218,6 +224,11 @@ class CoAPIngest(aiocoap.resource.Resource):
             except Exception:
                 raise ValueError('Payload must be a dictionary')
 
+            if isinstance(payload, list):
+                batch = CoAPIngest._batch_readings(payload)
+                await Ingest.add_readings_batch(batch)
+                return aiocoap.Message(payload=message.encode('utf-8'), code=code)
+
             asset = payload['asset']
             timestamp = payload['timestamp']
             key = payload['key']
@@ -236,7 +247,9 @@ class CoAPIngest(aiocoap.resource.Resource):
             await Ingest.add_readings(asset=asset, timestamp=timestamp, key=key, readings=readings)
 
         except (KeyError, ValueError, TypeError) as e:
-            Ingest.increment_discarded_readings()
+            if batch is None:
+                # Ingest has counted the readings of a batch as discarded
+                Ingest.increment_discarded_readings()
             _LOGGER.exception("%d: %s", aiocoap.numbers.codes.Code.BAD_REQUEST, str(e))
             raise aiocoap.error.BadRequest(str(e))
         except Exception as ex:
@@ -245,3 +258,16 @@ class CoAPIngest(aiocoap.resource.Resource):
             raise aiocoap.error.ConstructionRenderableError(str(ex))
 
         return aiocoap.Message(payload=message.encode('utf-8'), code=code)
+
+    @staticmethod
+    def _batch_readings(payload):
+        """Returns the readings of a batch payload in the format of Ingest.add_readings_batch
+
+        The deprecated sensor_values key is accepted in place of readings, as for a single reading.
+        """
+        batch = []
+        for reading in payload:
+            if isinstance(reading, dict) and 'readings' not in reading and 'sensor_values' in reading:
+                reading = dict(reading, readings=reading['sensor_values'])
+            batch.append(reading)
+        return batch
@@ -7,6 +7,7 @@
 """HTTP Listener handler for sensor readings"""
 import asyncio
 import copy
+import json
 import sys
 
 from aiohttp import web
@@ -23,6 +24,18 @@ __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__, level=20)
 
+_STREAM_BATCH_SIZE = 1000
+"""Most readings of a stream added to Ingest at a time"""
+
+_STREAM_MAX_LINE_BYTES = 1024 * 1024
+"""Longest reading accepted in a stream"""
+
+_BUSY_WAIT_SECONDS = 0.1
+"""Interval at which a stream checks whether Ingest has room again"""
+
+_BUSY_TIMEOUT_SECONDS = 60
+"""A stream that can not add readings to Ingest for this long is answered with 503"""
+
 _CONFIG_CATEGORY_NAME = 'HTTP_SOUTH'
 _CONFIG_CATEGORY_DESCRIPTION = 'South Plugin HTTP Listener'
 _DEFAULT_CONFIG = {
@@ -88,6 +101,7 @@ def plugin_start(data):
 
         app = web.Application(middlewares=[middleware.error_middleware])
         app.router.add_route('POST', '/{}'.format(uri), HttpSouthIngest.render_post)
+        app.router.add_route('POST', '/{}/stream'.format(uri), HttpSouthIngest.render_post_stream)
         handler = app.make_handler()
         server_coro = loop.create_server(handler, host, port)
         future = asyncio.ensure_future(server_coro)
@@ -195,8 +209,11 @@ class HttpSouthIngest(object):
                         "readings": {"humidity": 0.0, "temperature": -40.0}
                         }
                     }
+
+                or to a list of such readings, which are added as one batch.
         Example:
             curl -X POST http://localhost:6683/sensor-reading -d '{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "pump1", "key": "80a43623-ebe5-40d6-8d80-3f892da9b3b4", "readings": {"humidity": 0.0, "temperature": -40.0}}'
+            curl -X POST http://localhost:6683/sensor-reading -d '[{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "pump1", "key": "80a43623-ebe5-40d6-8d80-3f892da9b3b4", "readings": {"humidity": 0.0, "temperature": -40.0}}, {"timestamp": "2017-01-02T01:02:04.23232Z-05:00", "asset": "pump1", "key": "80a43623-ebe5-40d6-8d80-3f892da9b3b5", "readings": {"humidity": 0.5, "temperature": -39.0}}]'
         """
         # TODO: The payload is documented at
         # https://docs.google.com/document/d/1rJXlOqCGomPKEKx2ReoofZTXQt9dtDiW_BHU7FYsj-k/edit#
@@ -214,6 +231,11 @@ class HttpSouthIngest(object):
             except Exception:
                 raise ValueError('Payload must be a dictionary')
 
+            if isinstance(payload, list):
+                # A batch of readings, each in the same format as a single reading payload
+                await Ingest.add_readings_batch(payload)
+                return web.json_response(message)
+
             asset = payload['asset']
             timestamp = payload['timestamp']
             key = payload['key']
@@ -240,3 +262,115 @@ class HttpSouthIngest(object):
             raise web.HTTPInternalServerError(reason=str(ex))
 
         return web.json_response(message)
+
+    @staticmethod
+    def _stream_record(line):
+        """Decodes a line of a readings stream into a record for Ingest.add_readings_batch
+
+        Raises:
+            KeyError, ValueError, TypeError: The line is not a reading in the format accepted by render_post
+        """
+        payload = json.loads(line)
+        if not isinstance(payload, dict):
+            raise TypeError('each reading must be a dictionary')
+
+        # readings or sensor_values are optional
+        try:
+            readings = payload['readings']
+        except KeyError:
+            readings = payload['sensor_values']  # sensor_values is deprecated
+
+        if not isinstance(readings, dict):
+            raise ValueError('readings must be a dictionary')
+
+        return {'asset': payload['asset'], 'timestamp': payload['timestamp'], 'key': payload['key'],
+                'readings': readings}
+
+    @staticmethod
+    async def _wait_until_available():
+        """Waits for Ingest to have room for readings
+
+        Meanwhile the request body is not read, so once aiohttp's buffer is full the client is
+        held back by TCP flow control.
+        """
+        waited = 0
+        while not Ingest.is_available():
+            if waited >= _BUSY_TIMEOUT_SECONDS:
+                raise web.HTTPServiceUnavailable(reason={'busy': True})
+            await asyncio.sleep(_BUSY_WAIT_SECONDS)
+            waited += _BUSY_WAIT_SECONDS
+
+    @staticmethod
+    async def render_post_stream(request):
+        """Store a stream of sensor readings to FogLAMP
+
+        Args:
+            request:
+                The payload is newline delimited JSON, one reading per line in the format accepted
+                by :meth:`render_post`. It may be gzip or deflate encoded, with a Content-Encoding
+                header, and sent chunked.
+
+                Readings are parsed as the payload arrives and added to Ingest a chunk at a time.
+                A line that is not a valid reading is discarded without failing the request; a
+                chunk that Ingest rejects is discarded as a whole. The response has the number of
+                readings added and discarded.
+        Example:
+            curl -X POST http://localhost:6683/sensor-reading/stream --data-binary @readings.ndjson
+            gzip -c readings.ndjson | curl -X POST -H 'Content-Encoding: gzip' http://localhost:6683/sensor-reading/stream --data-binary @-
+        """
+        added = 0
+        discarded = 0
+        first_error = None
+        pending = b''
+        try:
+            while True:
+                await HttpSouthIngest._wait_until_available()
+
+                # aiohttp has already decoded a gzip or deflate encoded payload
+                chunk = await request.content.readany()
+                if chunk:
+                    lines = (pending + chunk).split(b'\n')
+                    pending = lines.pop()
+                    if len(pending) > _STREAM_MAX_LINE_BYTES:
+                        raise ValueError('A reading is longer than {} bytes'.format(_STREAM_MAX_LINE_BYTES))
+                else:
+                    lines = [pending]
+
+                records = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(HttpSouthIngest._stream_record(line))
+                    except (KeyError, ValueError, TypeError) as e:
+                        Ingest.increment_discarded_readings()
+                        discarded += 1
+                        first_error = first_error or e
+
+                for i in range(0, len(records), _STREAM_BATCH_SIZE):
+                    batch = records[i:i + _STREAM_BATCH_SIZE]
+                    try:
+                        # Waits for room when the buffer is full
+                        await Ingest.add_readings_batch(batch)
+                        added += len(batch)
+                    except (KeyError, ValueError, TypeError) as e:
+                        # Counted as discarded by Ingest
+                        discarded += len(batch)
+                        first_error = first_error or e
+
+                if not chunk:
+                    break
+        except web.HTTPException:
+            raise
+        except ValueError as e:
+            _LOGGER.exception("%d: %s", web.HTTPBadRequest.status_code, str(e))
+            raise web.HTTPBadRequest(reason=str(e))
+        except Exception as ex:
+            _LOGGER.exception("%d: %s", web.HTTPInternalServerError.status_code, str(ex))
+            raise web.HTTPInternalServerError(reason=str(ex))
+
+        if discarded:
+            _LOGGER.warning('%d readings of a stream were discarded, the first because of: %s', discarded,
+                            repr(first_error))
+
+        return web.json_response({'result': 'success', 'readings': added, 'discarded': discarded})
@@ -79,6 +79,7 @@ def plugin_poll(handle):
         handle: handle returned by the plugin initialisation call
     Returns:
         returns a sensor reading in a JSON document, as a Python dict, if it is available
+        or a list of such readings, which are added to FogLAMP as one batch
         None - If no reading is available
     Raises:
         DataRetrievalError
@@ -65,8 +65,7 @@ class FoglampMicroservice(FoglampProcess):
                 "value": config,
                 "keep_original_items": True
             })
-            self._core_microservice_management_client.create_configuration_category(config_payload)
-            config = self._core_microservice_management_client.get_configuration_category(category_name=category)
+            config = self._core_microservice_management_client.create_configuration_category(config_payload)['value']
             host = config['management_host']['value']
             # -----
 
@@ -82,6 +81,7 @@ class FoglampMicroservice(FoglampProcess):
         # create web server application
         self._microservice_management_app = web.Application(middlewares=[middleware.error_middleware])
         # register supported urls
+        self._add_microservice_management_routes(self._microservice_management_app)
         routes.setup(self._microservice_management_app, self)
         # create http protocol factory for handling requests
         self._microservice_management_handler = self._microservice_management_app.make_handler()
@@ -104,6 +104,10 @@ class FoglampMicroservice(FoglampProcess):
             }
         return service_registration_payload
 
+    def _add_microservice_management_routes(self, app):
+        """ Registers urls specific to this type of microservice, in addition to the common ones """
+        pass
+
     @abstractmethod
     async def shutdown(self, request):
         pass
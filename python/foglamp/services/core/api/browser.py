@@ -31,8 +31,15 @@ Supports a number of REST API:
 
   Note seconds, minutes and hours can not be combined in a URL. If they are then only seconds
   will have an effect.
+
+  The counts returned by /foglamp/asset are kept in memory and brought up to date by counting only
+  the readings added since the last request, unless readings have been purged since. Summaries and
+  series are cached for a few seconds per URL.
 """
 
+import collections
+import time
+
 from aiohttp import web
 
 from foglamp.common.storage_client.payload_builder import PayloadBuilder
@@ -48,6 +55,22 @@ __version__ = "${VERSION}"
 __DEFAULT_LIMIT = 20
 __DEFAULT_OFFSET = 0
 __TIMESTAMP_FMT = 'YYYY-MM-DD HH24:MI:SS.MS'
+__ASSET_COUNTS_TTL_SECONDS = 5
+__ASSET_COUNTS_RECOUNT_SECONDS = 300
+__QUERY_CACHE_TTL_SECONDS = 5
+__QUERY_CACHE_SIZE = 100
+
+_asset_counts = {
+    'counts': None,  # asset_code -> number of readings
+    'last_id': 0,  # highest reading id counted
+    'purged': None,  # the PURGED statistic when the readings were last counted
+    'refreshed_at': 0,
+    'recounted_at': 0
+}
+"""Readings count per asset, refreshed from the readings added since the last refresh"""
+
+_query_cache = collections.OrderedDict()
+"""Least recently used summary and series responses, by URL: (time cached, response)"""
 
 
 def setup(app):
@@ -97,29 +120,99 @@ async def asset_counts(request):
     """ Browse all the assets for which we have recorded readings and
     return a readings count.
 
+    The counts are served from memory for a few seconds. After that only the readings added since
+    the last refresh are counted and added to them; all readings are counted again when readings
+    have been purged since, and every few minutes, so that readings committed out of id order are
+    not missed for long.
+
     Returns:
            json result on basis of SELECT asset_code, count(*) FROM readings GROUP BY asset_code;
 
     :Example:
             curl -X GET http://localhost:8081/foglamp/asset
     """
-    payload = PayloadBuilder().AGGREGATE(["count", "*"]).ALIAS("aggregate", ("*", "count", "count"))\
-        .GROUP_BY("asset_code").payload()
-
-    results = {}
     try:
         _storage = connect.get_storage()
-        results = _storage.query_tbl_with_payload('readings', payload)
-        response = results['rows']
-        asset_json = [{"count": r['count'], "assetCode": r['asset_code']} for r in response]
-    except KeyError:
-        raise web.HTTPBadRequest(reason=results['message'])
+        counts = _refresh_asset_counts(_storage)
+        asset_json = [{"count": count, "assetCode": asset_code} for asset_code, count in counts.items()]
+    except KeyError as ex:
+        raise web.HTTPBadRequest(reason=str(ex.args[0]))
     except Exception as ex:
         raise web.HTTPException(reason=str(ex))
 
     return web.json_response(asset_json)
 
 
+def _query_rows(_storage, table, payload):
+    results = _storage.query_tbl_with_payload(table, payload)
+    try:
+        return results['rows']
+    except KeyError:
+        raise KeyError(results['message'])
+
+
+def _refresh_asset_counts(_storage):
+    """ Returns the readings count per asset, counting the readings added since the last refresh
+
+    Raises:
+        KeyError: with the message of a storage error
+    """
+    now = time.time()
+    state = _asset_counts
+    if state['counts'] is not None and now - state['refreshed_at'] < __ASSET_COUNTS_TTL_SECONDS:
+        return state['counts']
+
+    # Read before the readings are counted, so that a purge under way is noticed at the next refresh
+    rows = _query_rows(_storage, 'statistics', PayloadBuilder().SELECT("value").WHERE(["key", "=", "PURGED"]).payload())
+    purged = rows[0]['value'] if rows else 0
+
+    recount = state['counts'] is None or purged != state['purged'] or \
+        now - state['recounted_at'] >= __ASSET_COUNTS_RECOUNT_SECONDS
+
+    _aggregate = PayloadBuilder().AGGREGATE(["count", "*"], ["max", "id"])\
+        .ALIAS("aggregate", ("*", "count", "count"), ("id", "max", "last_id")).chain_payload()
+    if not recount:
+        _aggregate = PayloadBuilder(_aggregate).WHERE(["id", ">", state['last_id']]).chain_payload()
+    payload = PayloadBuilder(_aggregate).GROUP_BY("asset_code").payload()
+    rows = _query_rows(_storage, 'readings', payload)
+
+    if recount:
+        counts = {}
+        last_id = 0
+        state['recounted_at'] = now
+    else:
+        counts = dict(state['counts'])
+        last_id = state['last_id']
+
+    for r in rows:
+        counts[r['asset_code']] = counts.get(r['asset_code'], 0) + int(r['count'])
+        last_id = max(last_id, int(r['last_id']))
+
+    state.update(counts=counts, last_id=last_id, purged=purged, refreshed_at=now)
+    return counts
+
+
+def _cached_query(request, payload):
+    """ Returns the rows of a readings query, from the cache when the same URL was queried a few seconds ago """
+    key = str(request.rel_url)
+    now = time.time()
+    try:
+        cached_at, rows = _query_cache[key]
+        if now - cached_at < __QUERY_CACHE_TTL_SECONDS:
+            _query_cache.move_to_end(key)
+            return rows
+    except KeyError:
+        pass
+
+    _storage = connect.get_storage()
+    rows = _query_rows(_storage, 'readings', payload)
+    _query_cache[key] = (now, rows)
+    _query_cache.move_to_end(key)
+    while len(_query_cache) > __QUERY_CACHE_SIZE:
+        _query_cache.popitem(last=False)
+    return rows
+
+
 async def asset(request):
     """ Browse a particular asset for which we have recorded readings and
     return a readings with timestamps for the asset. The number of readings
@@ -247,14 +340,11 @@ async def asset_summary(request):
     _and_where = where_clause(request, _where)
     payload = PayloadBuilder(_and_where).payload()
 
-    results = {}
     try:
-        _storage = connect.get_storage()
-        results = _storage.query_tbl_with_payload('readings', payload)
         # for aggregates, so there can only ever be one row
-        response = results['rows'][0]
-    except KeyError:
-        raise web.HTTPBadRequest(reason=results['message'])
+        response = _cached_query(request, payload)[0]
+    except KeyError as ex:
+        raise web.HTTPBadRequest(reason=str(ex.args[0]))
     except Exception as ex:
         raise web.HTTPException(reason=str(ex))
 
@@ -335,13 +425,10 @@ async def asset_averages(request):
     _limit_skip_payload = prepare_limit_skip_payload(request, _group)
     payload = PayloadBuilder(_limit_skip_payload).ORDER_BY(["timestamp", "desc"]).payload()
 
-    results = {}
     try:
-        _storage = connect.get_storage()
-        results = _storage.query_tbl_with_payload('readings', payload)
-        response = results['rows']
-    except KeyError:
-        raise web.HTTPBadRequest(reason=results['message'])
+        response = _cached_query(request, payload)
+    except KeyError as ex:
+        raise web.HTTPBadRequest(reason=str(ex.args[0]))
     except Exception as ex:
         raise web.HTTPException(reason=str(ex))
 
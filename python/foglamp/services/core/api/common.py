@@ -13,6 +13,7 @@ from foglamp.services.core import server
 from foglamp.services.core.api.statistics import get_statistics
 from foglamp.services.core import connect
 from foglamp.common.configuration_manager import ConfigurationManager
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 
 __author__ = "Amarendra K. Sinha, Ashish Jabble"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -27,6 +28,7 @@ _help = """
     -------------------------------------------------------------------------------
     | GET             | /foglamp/ping                                             |
     | PUT             | /foglamp/shutdown                                         |
+    | GET             | /foglamp/cache/storage                                    |
     -------------------------------------------------------------------------------
 """
 
@@ -107,3 +109,17 @@ def do_shutdown(request):
     except RuntimeError as e:
         _logger.exception("Error while stopping FogLAMP server: {}".format(str(e)))
         raise
+
+
+async def get_storage_connection_stats(request):
+    """
+    Args:
+        request:
+
+    Returns:
+            the number of storage connections opened, reused, evicted and idle, for each storage service
+
+    :Example:
+            curl -X GET http://localhost:8081/foglamp/cache/storage
+    """
+    return web.json_response(HTTPConnectionPool.stats_all())
@@ -21,6 +21,7 @@ _help = """
     | GET             | /foglamp/category/{category_name}                         |
     | GET POST PUT    | /foglamp/category/{category_name}/{config_item}           |
     | DELETE          | /foglamp/category/{category_name}/{config_item}/value     |
+    | GET             | /foglamp/cache/category                                   |
     -------------------------------------------------------------------------------
 """
 
@@ -235,6 +236,7 @@ async def add_configuration_item(request):
         payload = PayloadBuilder().SET(value=merge_cat_val).WHERE(["key", "=", category_name]).payload()
         result = storage_client.update_tbl("configuration", payload)
         response = result['response']
+        cf_mgr.invalidate_cache(category_name)
 
         # logged audit new config item for category
         audit = AuditLogger(storage_client)
@@ -286,3 +288,18 @@ async def delete_configuration_item_value(request):
         raise web.HTTPNotFound(reason="No detail found for the category_name: {} and config_item: {}".format(category_name, config_item))
 
     return web.json_response(result)
+
+
+async def get_category_cache_stats(request):
+    """
+    Args:
+         request:
+
+    Returns:
+            the number of categories in the configuration manager cache and its hit and miss counts
+
+    :Example:
+            curl -X GET http://localhost:8081/foglamp/cache/category
+    """
+    cf_mgr = ConfigurationManager(connect.get_storage())
+    return web.json_response(cf_mgr.get_cache_stats())
@@ -22,6 +22,31 @@ __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__)
 
+_notified_categories = {}
+""" (category_name, microservice_uuid) -> category value last delivered to the microservice """
+
+
+def _change_payload(category_name, category_value, previous_value):
+    """ Builds the change notification for a category
+
+    Once a category value has been delivered to a microservice, later notifications only carry the items that
+    were added or changed since, and the names of the items that were removed, so that the microservice can
+    update its own copy of the category. Otherwise the notification carries all items.
+    """
+    if previous_value is None or category_value is None:
+        return {"category": category_name, "items": category_value}
+
+    changed_items = {k: v for k, v in category_value.items() if previous_value.get(k) != v}
+    removed_items = sorted(k for k in previous_value if k not in category_value)
+    return {"category": category_name, "items": changed_items, "removed": removed_items, "delta": True}
+
+
+def forget(category_name, microservice_uuid):
+    """ Drops the category value last delivered to a microservice whose interest in the category is unregistered,
+    so that it is sent all items if it registers its interest again
+    """
+    _notified_categories.pop((category_name, microservice_uuid), None)
+
 
 async def run(category_name):
     """ Callback run by configuration category to notify changes to interested microservices
@@ -42,7 +67,6 @@ async def run(category_name):
 
     # get configuration of category_name
     category_value = await cfg_mgr.get_category_all_items(category_name)
-    payload = {"category" : category_name, "items" : category_value}
     headers = {'content-type': 'application/json'}
 
     # for each microservice interested in category_name, notify change
@@ -54,11 +78,16 @@ async def run(category_name):
             _LOGGER.exception("Unable to notify microservice with uuid %s as it is not found in the service registry", i._microservice_uuid)
             continue
         url = "{}://{}:{}/foglamp/change".format(service_record._protocol, service_record._address, service_record._management_port)
+        # The microservice is sent all items again unless this notification is delivered
+        notified_key = (category_name, i._microservice_uuid)
+        payload = _change_payload(category_name, category_value, _notified_categories.pop(notified_key, None))
         async with aiohttp.ClientSession() as session:
             try:
                 async with session.post(url, data=json.dumps(payload, sort_keys=True), headers=headers) as resp:
                     result = await resp.text()
                     status_code = resp.status
+                    if status_code in range(200, 300) and category_value is not None:
+                        _notified_categories[notified_key] = category_value
                     if status_code in range(400, 500):
                         _LOGGER.error("Bad request error code: %d, reason: %s", status_code, resp.reason)
                     if status_code in range(500, 600):
@@ -131,6 +131,9 @@ class InterestRegistry(InterestRegistrySingleton):
             self._registered_interests.remove(registered_interests[0])
         except interest_registry_exceptions.DoesNotExist:
             raise
+        # change_callback imports this module
+        from foglamp.services.core.interest_registry import change_callback
+        change_callback.forget(interest_record._category_name, interest_record._microservice_uuid)
         # remove entry from configuration manager if no registered interests exist for this category_name
         try: 
             registered_interests = self.get(category_name=interest_record._category_name)
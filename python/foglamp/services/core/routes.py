@@ -26,6 +26,7 @@ __version__ = "${VERSION}"
 def setup(app):
     app.router.add_route('GET', '/foglamp/ping', api_common.ping)
     app.router.add_route('PUT', '/foglamp/shutdown', api_common.shutdown)
+    app.router.add_route('GET', '/foglamp/cache/storage', api_common.get_storage_connection_stats)
 
     # user
     app.router.add_route('GET', '/foglamp/user', auth.get_user)
@@ -55,6 +56,7 @@ def setup(app):
     app.router.add_route('PUT', '/foglamp/category/{category_name}/{config_item}', api_configuration.set_configuration_item)
     app.router.add_route('POST', '/foglamp/category/{category_name}/{config_item}', api_configuration.add_configuration_item)
     app.router.add_route('DELETE', '/foglamp/category/{category_name}/{config_item}/value', api_configuration.delete_configuration_item_value)
+    app.router.add_route('GET', '/foglamp/cache/category', api_configuration.get_category_cache_stats)
 
     # Scheduler
     # Scheduled_processes - As per doc
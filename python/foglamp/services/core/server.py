@@ -25,6 +25,7 @@ from foglamp.common.configuration_manager import ConfigurationManager
 from foglamp.common.web import middleware
 from foglamp.common.storage_client.exceptions import *
 from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 
 from foglamp.services.core import routes as admin_routes
 from foglamp.services.core.api import configuration as conf_api
@@ -607,6 +608,7 @@ class Server:
 
             # stop storage
             await cls.stop_storage()
+            HTTPConnectionPool.close_all()
 
             # stop core management api
             # loop.stop does it all
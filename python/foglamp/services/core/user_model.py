@@ -8,8 +8,10 @@
 """ FogLAMP user entity class with CRUD operations to Storage layer
 
 """
+import collections
 import uuid
 import hashlib
+import time
 
 from datetime import datetime, timedelta
 import jwt
@@ -30,6 +32,9 @@ JWT_ALGORITHM = 'HS256'
 JWT_EXP_DELTA_SECONDS = 30*60  # 30 minutes
 ERROR_MSG = 'Something went wrong'
 USED_PASSWORD_HISTORY_COUNT = 3
+TOKEN_CACHE_TTL_SECONDS = 30  # a cached token is validated against storage again after this
+TOKEN_CACHE_MAX_SIZE = 1000
+TOKEN_REFRESH_INTERVAL_SECONDS = 60  # token expiry is extended in storage at most this often
 
 
 class User:
@@ -72,6 +77,12 @@ class User:
 
     class Objects:
 
+        _tokens = collections.OrderedDict()
+        """ token -> [user, validated at, expiry refreshed at], least recently used first """
+
+        token_cache_hits = 0
+        token_cache_misses = 0
+
         @classmethod
         def get_roles(cls):
             storage_client = connect.get_storage()
@@ -238,6 +249,46 @@ class User:
                 raise User.DoesNotExist(msg)
             return users[0]
 
+        @classmethod
+        def authenticate(cls, token):
+            """ validate the token, extend its expiry and return its user
+
+            Tokens validated within the last TOKEN_CACHE_TTL_SECONDS are served from the token cache
+            without storage access, and the token expiry is extended in storage at most once every
+            TOKEN_REFRESH_INTERVAL_SECONDS rather than on every request. The cache entries of a
+            token are dropped when the token is deleted.
+
+            :param token:
+            :return: user dict
+            """
+            now = time.monotonic()
+            entry = cls._tokens.get(token)
+            if entry is not None and now - entry[1] < TOKEN_CACHE_TTL_SECONDS:
+                cls.token_cache_hits += 1
+                cls._tokens.move_to_end(token)
+            else:
+                cls.token_cache_misses += 1
+                uid = cls.validate_token(token)
+                entry = [cls.get(uid=uid), now, entry[2] if entry is not None else None]
+                cls._tokens[token] = entry
+                cls._tokens.move_to_end(token)
+                while len(cls._tokens) > TOKEN_CACHE_MAX_SIZE:
+                    cls._tokens.popitem(last=False)
+
+            if entry[2] is None or now - entry[2] >= TOKEN_REFRESH_INTERVAL_SECONDS:
+                cls.refresh_token_expiry(token)
+                entry[2] = now
+            return entry[0]
+
+        @classmethod
+        def _forget_tokens(cls, user_id=None):
+            if user_id is None:
+                cls._tokens.clear()
+                return
+
+            for token in [t for t, e in cls._tokens.items() if str(e[0]['id']) == str(user_id)]:
+                del cls._tokens[token]
+
         @classmethod
         def refresh_token_expiry(cls, token):
             storage_client = connect.get_storage()
@@ -349,6 +400,7 @@ class User:
 
         @classmethod
         def delete_user_tokens(cls, user_id):
+            cls._forget_tokens(user_id)
             storage_client = connect.get_storage()
             payload = PayloadBuilder().WHERE(['user_id', '=', user_id]).payload()
             try:
@@ -362,6 +414,7 @@ class User:
 
         @classmethod
         def delete_token(cls, token):
+            cls._tokens.pop(token, None)
             storage_client = connect.get_storage()
             payload = PayloadBuilder().WHERE(['token', '=', token]).payload()
             try:
@@ -375,6 +428,7 @@ class User:
 
         @classmethod
         def delete_all_user_tokens(cls):
+            cls._forget_tokens()
             storage_client = connect.get_storage()
             storage_client.delete_from_tbl("user_logins")
 
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Adaptive sizing of the batches of readings that Ingest sends to storage"""
+
+import collections
+import math
+import time
+from typing import List
+
+__author__ = "Terris Linenbach"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_MIN_TIMEOUT_SECONDS = 0.01
+"""The flush timeout is never tuned below this"""
+
+_WINDOW_SIZE = 100
+"""Number of recent inserts the latency percentiles and arrival rate are computed from"""
+
+_TUNE_EVERY = 10
+"""Number of inserts between two tunings"""
+
+_HISTORY_SIZE = 100
+"""Number of changes of the batch size or flush timeout that are remembered"""
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, int(math.ceil(percent / 100 * len(ordered))) - 1)]
+
+
+class BatchTuner(object):
+    """Chooses the readings insert batch size and flush timeout from observed latency
+
+    The latency of a reading is the time from it being added to a readings list until the insert
+    containing it completes. The flush timeout is the part of the latency target left after the
+    99th percentile insert duration. It is halved whenever the 99th percentile latency exceeds the
+    target and grows back a tenth at a time while it does not. The batch size is the number of
+    readings expected to arrive within the flush timeout at the observed arrival rate, so that
+    batches are sent full rather than on timeout.
+    """
+
+    def __init__(self, target_latency_seconds: float, max_batch_size: int, max_timeout_seconds: float):
+        """
+        Args:
+            target_latency_seconds: The 99th percentile latency to stay under
+            max_batch_size: The batch size is never tuned above this
+            max_timeout_seconds: The flush timeout is never tuned above this
+        """
+        self.target_latency_seconds = target_latency_seconds
+        self.max_batch_size = max_batch_size
+        self.max_timeout_seconds = max_timeout_seconds
+
+        self.batch_size = max_batch_size
+        """The current batch size"""
+
+        self.timeout_seconds = max(_MIN_TIMEOUT_SECONDS, min(max_timeout_seconds, target_latency_seconds))
+        """The current flush timeout"""
+
+        self.p99_latency_seconds = None
+        self.p99_insert_seconds = None
+        self.arrival_rate = None
+        """Readings per second inserted over the window"""
+
+        self._batches = collections.deque(maxlen=_WINDOW_SIZE)  # (completion time, size, latency, duration)
+        self._batches_since_tuning = 0
+        self._history = collections.deque(maxlen=_HISTORY_SIZE)
+
+    def record(self, batch_size: int, latency_seconds: float, insert_seconds: float) -> bool:
+        """Records a completed insert, tuning every few inserts
+
+        Args:
+            batch_size: Number of readings inserted
+            latency_seconds: Time from the oldest reading in the batch being added until the insert completed
+            insert_seconds: Duration of the insert
+
+        Returns:
+            True when the batch size or flush timeout changed
+        """
+        self._batches.append((time.time(), batch_size, latency_seconds, insert_seconds))
+        self._batches_since_tuning += 1
+        if self._batches_since_tuning < _TUNE_EVERY:
+            return False
+
+        self._batches_since_tuning = 0
+        return self._tune()
+
+    def _tune(self) -> bool:
+        batches = self._batches
+        self.p99_latency_seconds = _percentile([b[2] for b in batches], 99)
+        self.p99_insert_seconds = _percentile([b[3] for b in batches], 99)
+
+        span = batches[-1][0] - batches[0][0]
+        if span > 0:
+            # The first batch completed at the start of the span
+            self.arrival_rate = (sum(b[1] for b in batches) - batches[0][1]) / span
+
+        budget = max(_MIN_TIMEOUT_SECONDS,
+                     min(self.max_timeout_seconds, self.target_latency_seconds - self.p99_insert_seconds))
+
+        if self.p99_latency_seconds > self.target_latency_seconds:
+            timeout = self.timeout_seconds / 2
+        else:
+            timeout = self.timeout_seconds + budget / 10
+        timeout = max(_MIN_TIMEOUT_SECONDS, min(budget, timeout))
+
+        batch_size = self.batch_size
+        if self.arrival_rate is not None:
+            batch_size = max(1, min(self.max_batch_size, int(self.arrival_rate * timeout)))
+
+        changed = batch_size != self.batch_size or timeout != self.timeout_seconds
+        self.batch_size = batch_size
+        self.timeout_seconds = timeout
+
+        if changed:
+            self._history.append({
+                "time": time.time(),
+                "batch_size": batch_size,
+                "flush_timeout_ms": round(timeout * 1000, 1),
+                "p99_latency_ms": round(self.p99_latency_seconds * 1000, 1),
+                "arrival_rate": None if self.arrival_rate is None else round(self.arrival_rate, 1)
+            })
+
+        return changed
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "target_p99_latency_ms": ms(self.target_latency_seconds),
+            "batch_size": self.batch_size,
+            "flush_timeout_ms": ms(self.timeout_seconds),
+            "p99_latency_ms": ms(self.p99_latency_seconds),
+            "p99_insert_ms": ms(self.p99_insert_seconds),
+            "arrival_rate": None if self.arrival_rate is None else round(self.arrival_rate, 1),
+            "history": list(self._history)
+        }
@@ -8,14 +8,18 @@
 
 import asyncio
 import datetime
+import os
 import time
 import uuid
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
 import json
 from foglamp.common import logger
 from foglamp.common.statistics import Statistics
-from foglamp.common.storage_client.storage_client import ReadingsStorageClient, StorageClient
+from foglamp.common.storage_client.storage_client import ReadingsStorageClientAsync, StorageClient
 from foglamp.common.storage_client.exceptions import StorageServerError
+from foglamp.services.south.batch_tuner import BatchTuner
+from foglamp.services.south.readings_queue import ReadingsQueue
+from foglamp.services.south.spill_journal import SpillJournal
 
 __author__ = "Terris Linenbach"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -23,7 +27,13 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 _LOGGER = logger.setup(__name__)  # type: logging.Logger
+_FOGLAMP_DATA = os.getenv("FOGLAMP_DATA", default=None)
+_FOGLAMP_ROOT = os.getenv("FOGLAMP_ROOT", default='/usr/local/foglamp')
 _MAX_ATTEMPTS = 2
+_MAX_CACHED_ASSETS = 10000
+
+_READING_TEMPLATE = '{"asset_code": %s, "read_key": "%s", "reading": %s, "user_ts": %s}'
+"""A reading as encoded by json.dumps, used to encode readings without building a dict for each one"""
 
 # _LOGGER = logger.setup(__name__, level=logging.DEBUG)  # type: logging.Logger
 # _LOGGER = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
@@ -33,7 +43,8 @@ class Ingest(object):
     """Adds sensor readings to FogLAMP
 
     Also tracks readings-related statistics.
-    Readings are added to a configurable list. Configurable batches of inserts are sent to storage
+    Readings are added to a bounded queue. Concurrent insert tasks take configurable batches from it
+    and send them to storage
     """
 
     # Class attributes
@@ -42,7 +53,7 @@ class Ingest(object):
     _core_management_port = 0
     _parent_service = None
 
-    readings_storage = None  # type: Readings
+    readings_storage = None  # type: ReadingsStorageClientAsync
     storage = None  # type: Storage
 
     _readings_stats = 0  # type: int
@@ -54,6 +65,9 @@ class Ingest(object):
     _sensor_stats = {}  # type: dict
     """Number of sensor readings accepted before statistics were written to storage"""
 
+    _asset_keys = {}  # type: Dict[str, Tuple[str, str]]
+    """Per asset code, the statistics key and the JSON encoded asset code"""
+
     _write_statistics_task = None  # type: asyncio.Task
     """asyncio task for :meth:`_write_statistics`"""
 
@@ -66,32 +80,38 @@ class Ingest(object):
     _started = False
     """True when the server has been started"""
 
-    _readings_lists = None  # type: List
-    """A list of readings lists. Each list contains the inputs to :meth:`add_readings`."""
-
-    _current_readings_list_index = 0
-    """Which readings list to insert into next"""
+    _readings_queue = None  # type: ReadingsQueue
+    """Readings passed to :meth:`add_readings`, encoded as JSON, waiting to be inserted"""
 
     _insert_readings_tasks = None  # type: List[asyncio.Task]
     """asyncio tasks for :meth:`_insert_readings`"""
 
-    _readings_list_batch_size_reached = None  # type: List[asyncio.Event]
-    """Fired when a readings list has reached _readings_insert_batch_size entries"""
+    _last_insert_time = 0  # type: int
+    """epoch time of last insert"""
+
+    _batch_tuner = None  # type: BatchTuner
+    """Chooses the batch size and flush timeout when adaptive batching is enabled"""
 
-    _readings_list_not_empty = None  # type: List[asyncio.Event]
-    """Fired when a readings list transitions from empty to not empty"""
+    _spill_journal = None  # type: SpillJournal
+    """Disk-backed journal of readings that did not fit in the buffer or could not be inserted"""
 
-    _readings_lists_not_full = None  # type: asyncio.Event
-    """Fired when items are removed from any readings list"""
+    _spill_journal_not_empty = None  # type: asyncio.Event
+    """Fired when readings are written to the spill journal"""
 
-    _insert_readings_wait_tasks = None  # type: List[asyncio.Task]
-    """asyncio tasks blocking :meth:`_insert_readings` that can be canceled"""
+    _drain_spill_journal_task = None  # type: asyncio.Task
+    """asyncio task for :meth:`_drain_spill_journal`"""
 
-    _last_insert_time = 0  # type: int
-    """epoch time of last insert"""
+    _drain_spill_journal_wait_task = None  # type: asyncio.Task
+    """asyncio task blocking :meth:`_drain_spill_journal` that can be canceled"""
 
-    _readings_list_size = 0  # type: int
-    """Maximum number of readings items in each buffer"""
+    _spilled_readings_stats = 0  # type: int
+    """Number of readings written to the spill journal since startup"""
+
+    _drained_readings_stats = 0  # type: int
+    """Number of spilled readings inserted into storage since startup"""
+
+    _spill_drain_rate = 0.0  # type: float
+    """Readings per second inserted by the most recent drain of the spill journal"""
 
     # Configuration (begin)
     _write_statistics_frequency_seconds = 5
@@ -104,10 +124,17 @@ class Ingest(object):
     """Maximum number of concurrent processes that send batches of readings to storage"""
 
     _readings_insert_batch_size = 100
-    """Maximum number of readings in a batch of inserts"""
+    """Maximum number of readings in a batch of inserts. Tuned while adaptive batching is enabled."""
 
     _readings_insert_batch_timeout_seconds = 1
-    """Number of seconds to wait for a readings list to reach the minimum batch size"""
+    """Number of seconds to wait for a readings list to reach the minimum batch size. Tuned, to
+    fractions of a second, while adaptive batching is enabled."""
+
+    _adaptive_readings_insert_batching = True
+    """Whether the batch size and timeout are tuned to meet _readings_insert_target_latency_ms"""
+
+    _readings_insert_target_latency_ms = 1000
+    """The 99th percentile of milliseconds from a reading being added until it is in storage to aim for"""
 
     _max_readings_insert_batch_connection_idle_seconds = 60
     """Close connections used to insert readings when idle for this number of seconds"""
@@ -115,6 +142,12 @@ class Ingest(object):
     _max_readings_insert_batch_reconnect_wait_seconds = 10
     """The maximum number of seconds to wait before reconnecting to storage when inserting readings"""
 
+    _spill_enabled = False
+    """Whether readings are spilled to a disk journal when the buffer is full or inserts fail"""
+
+    _spill_max_size_mb = 100
+    """Maximum size of the spill journal in megabytes"""
+
     # Configuration (end)
 
     @classmethod
@@ -165,6 +198,29 @@ class Ingest(object):
                 "type": "integer",
                 "default": str(cls._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_readings_insert_batching": {
+                "description": "Whether the batch size and timeout are tuned, up to their configured "
+                               "values, to meet the target readings insert latency",
+                "type": "boolean",
+                "default": str(cls._adaptive_readings_insert_batching)
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "The 99th percentile of milliseconds from a reading being received "
+                               "until it is inserted into storage to aim for when adaptive batching is enabled",
+                "type": "integer",
+                "default": str(cls._readings_insert_target_latency_ms)
+            },
+            "spill_enabled": {
+                "description": "Whether readings are written to a disk journal when the readings "
+                               "buffer is full or inserts fail, and inserted when storage recovers",
+                "type": "boolean",
+                "default": str(cls._spill_enabled)
+            },
+            "spill_max_size_mb": {
+                "description": "The maximum size of the spill journal in megabytes",
+                "type": "integer",
+                "default": str(cls._spill_max_size_mb)
+            },
         }
 
         # Create configuration category and any new keys within it
@@ -174,10 +230,9 @@ class Ingest(object):
             "value": default_config,
             "keep_original_items": False
         })
-        cls._parent_service._core_microservice_management_client.create_configuration_category(config_payload)
-
-        # Read configuration
-        config = cls._parent_service._core_microservice_management_client.get_configuration_category(category_name=category)
+        # Read configuration, as returned by the create request
+        config = cls._parent_service._core_microservice_management_client.create_configuration_category(
+            config_payload)['value']
 
         cls._write_statistics_frequency_seconds = int(config['write_statistics_frequency_seconds']
                                                       ['value'])
@@ -193,6 +248,23 @@ class Ingest(object):
             ['value'])
         cls._max_readings_insert_batch_reconnect_wait_seconds = int(
             config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
+        cls._adaptive_readings_insert_batching = \
+            config['adaptive_readings_insert_batching']['value'].lower() == 'true'
+        cls._readings_insert_target_latency_ms = int(config['readings_insert_target_latency_ms']['value'])
+        cls._spill_enabled = config['spill_enabled']['value'].lower() == 'true'
+        cls._spill_max_size_mb = int(config['spill_max_size_mb']['value'])
+
+    @classmethod
+    def _open_spill_journal(cls):
+        """Opens the spill journal of this South service, creating it if needed"""
+        if _FOGLAMP_DATA:
+            spill_dir = os.path.expanduser(_FOGLAMP_DATA + '/buffer')
+        else:
+            spill_dir = os.path.expanduser(_FOGLAMP_ROOT + '/data/buffer')
+
+        os.makedirs(spill_dir, exist_ok=True)
+        path = os.path.join(spill_dir, '{}.spill'.format(cls._parent_service._name))
+        return SpillJournal(path, cls._spill_max_size_mb * 1024 * 1024)
 
     @classmethod
     async def start(cls, core_mgt_host, core_mgt_port, parent):
@@ -204,43 +276,56 @@ class Ingest(object):
         cls._core_management_port = core_mgt_port
         cls._parent_service = parent
 
-        cls.readings_storage = ReadingsStorageClient(cls._core_management_host, cls._core_management_port)
         cls.storage = StorageClient(cls._core_management_host, cls._core_management_port)
 
         await cls._read_config()
 
-        cls._readings_list_size = int(cls._readings_buffer_size / (
-            cls._max_concurrent_readings_inserts))
+        cls._spill_journal = None
+        if cls._spill_enabled:
+            try:
+                cls._spill_journal = cls._open_spill_journal()
+            except Exception:
+                _LOGGER.exception('Unable to open the spill journal; readings will not be spilled')
+
+        # One pooled connection per concurrent insert task, plus one to drain the spill journal
+        cls.readings_storage = ReadingsStorageClientAsync(
+            cls._core_management_host, cls._core_management_port,
+            pool_size=cls._max_concurrent_readings_inserts + (1 if cls._spill_journal else 0),
+            keepalive_timeout=cls._max_readings_insert_batch_connection_idle_seconds)
 
-        # Is the buffer size as configured big enough to support all of
-        # the buffers filled to the batch size? If not, increase
-        # the buffer size.
-        if cls._readings_list_size < cls._readings_insert_batch_size:
-            cls._readings_list_size = cls._readings_insert_batch_size
+        buffer_size = cls._readings_buffer_size
+
+        # Is the buffer size as configured big enough for every insert task
+        # to have a full batch in flight? If not, increase the buffer size.
+        if buffer_size < cls._readings_insert_batch_size * cls._max_concurrent_readings_inserts:
+            buffer_size = cls._readings_insert_batch_size * cls._max_concurrent_readings_inserts
 
             _LOGGER.warning('Readings buffer size as configured (%s) is too small; increasing '
-                            'to %s', cls._readings_buffer_size,
-                            cls._readings_list_size * cls._max_concurrent_readings_inserts)
+                            'to %s', cls._readings_buffer_size, buffer_size)
+
+        cls._batch_tuner = None
+        if cls._adaptive_readings_insert_batching:
+            # The configured batch size and timeout are the upper bounds
+            cls._batch_tuner = BatchTuner(cls._readings_insert_target_latency_ms / 1000,
+                                          cls._readings_insert_batch_size,
+                                          cls._readings_insert_batch_timeout_seconds)
+            cls._readings_insert_batch_size = cls._batch_tuner.batch_size
+            cls._readings_insert_batch_timeout_seconds = cls._batch_tuner.timeout_seconds
 
         # Start asyncio tasks
         cls._write_statistics_task = asyncio.ensure_future(cls._write_statistics())
 
         cls._last_insert_time = 0
 
-        cls._insert_readings_tasks = []
-        cls._insert_readings_wait_tasks = []
-        cls._readings_list_batch_size_reached = []
-        cls._readings_list_not_empty = []
-        cls._readings_lists = []
+        cls._readings_queue = ReadingsQueue(buffer_size)
 
+        cls._insert_readings_tasks = []
         for _ in range(cls._max_concurrent_readings_inserts):
-            cls._readings_lists.append([])
-            cls._insert_readings_wait_tasks.append(None)
             cls._insert_readings_tasks.append(asyncio.ensure_future(cls._insert_readings(_)))
-            cls._readings_list_batch_size_reached.append(asyncio.Event())
-            cls._readings_list_not_empty.append(asyncio.Event())
 
-        cls._readings_lists_not_full = asyncio.Event()
+        if cls._spill_journal is not None:
+            cls._spill_journal_not_empty = asyncio.Event()
+            cls._drain_spill_journal_task = asyncio.ensure_future(cls._drain_spill_journal())
 
         cls._stop = False
         cls._started = True
@@ -256,9 +341,8 @@ class Ingest(object):
 
         cls._stop = True
 
-        for task in cls._insert_readings_wait_tasks:
-            if task is not None:
-                task.cancel()
+        # Wakes the insert tasks, which insert what is left in the queue and then terminate
+        cls._readings_queue.close()
 
         for task in cls._insert_readings_tasks:
             try:
@@ -266,12 +350,29 @@ class Ingest(object):
             except Exception:
                 _LOGGER.exception('An exception was raised by Ingest._insert_readings')
 
-        cls._insert_readings_wait_tasks = None
         cls._insert_readings_tasks = None
-        cls._readings_lists = None
-        cls._readings_list_batch_size_reached = None
-        cls._readings_list_not_empty = None
-        cls._readings_lists_not_full = None
+        cls._readings_queue = None
+
+        # Stop draining; readings still in the spill journal are inserted after the next start
+        if cls._drain_spill_journal_task is not None:
+            if cls._drain_spill_journal_wait_task is not None:
+                cls._drain_spill_journal_wait_task.cancel()
+
+            try:
+                await cls._drain_spill_journal_task
+            except Exception:
+                _LOGGER.exception('An exception was raised by Ingest._drain_spill_journal')
+            cls._drain_spill_journal_task = None
+
+        if cls._spill_journal is not None:
+            cls._spill_journal.close()
+            cls._spill_journal = None
+            cls._spill_journal_not_empty = None
+
+        try:
+            await cls.readings_storage.close()
+        except Exception:
+            _LOGGER.exception('An exception was raised while closing readings storage connections')
 
         # Write statistics
         if cls._write_statistics_sleep_task is not None:
@@ -292,96 +393,33 @@ class Ingest(object):
         cls._discarded_readings_stats += 1
 
     @classmethod
-    async def _insert_readings(cls, list_index):
+    async def _insert_readings(cls, task_index):
         """Inserts rows into the readings table
 
-        Use ReadingsStorageClient().append(json_payload_of_readings)
+        Use ReadingsStorageClientAsync().append_encoded(list_of_json_encoded_readings)
         """
         _LOGGER.info('Insert readings loop started')
 
-        readings_list = cls._readings_lists[list_index]
-        min_readings_reached = cls._readings_list_batch_size_reached[list_index]
-        list_not_empty = cls._readings_list_not_empty[list_index]
-        lists_not_full = cls._readings_lists_not_full
+        readings_queue = cls._readings_queue
 
         while True:
-            # Wait for enough items in the list to fill a batch
-            # for some minimum amount of time
-            while not cls._stop:
-                if len(readings_list) >= cls._readings_insert_batch_size:
-                    break
-
-                min_readings_reached.clear()
-                waiter = asyncio.ensure_future(min_readings_reached.wait())
-                cls._insert_readings_wait_tasks[list_index] = waiter
-
-                # _LOGGER.debug('Waiting for entire batch: Queue index: %s Size: %s',
-                #               list_index, len(list))
-
-                try:
-                    await asyncio.wait_for(waiter, cls._readings_insert_batch_timeout_seconds)
-                    # _LOGGER.debug('Released: Queue index: %s Size: %s',
-                    #               list_index, len(list))
-                except asyncio.CancelledError:
-                    # _LOGGER.debug('Cancelled: Queue index: %s Size: %s',
-                    #               list_index, len(list))
-                    break
-                except asyncio.TimeoutError:
-                    # _LOGGER.debug('Timed out: Queue index: %s Size: %s',
-                    #               list_index, len(list))
-                    break
-                finally:
-                    cls._insert_readings_wait_tasks[list_index] = None
-
-            if not len(readings_list):
-                if cls._stop:
-                    break  # Terminate this method
-
-                # Wait for one item in the list
-                list_not_empty.clear()
-                waiter = asyncio.ensure_future(list_not_empty.wait())
-                cls._insert_readings_wait_tasks[list_index] = waiter
-
-                # _LOGGER.debug('Waiting for first item: Queue index: %s', list_index)
-
-                try:
-                    await asyncio.wait_for(
-                        waiter,
-                        cls._max_readings_insert_batch_connection_idle_seconds)
-                except asyncio.CancelledError:
-                    # Don't assume the list is empty
-
-                    # _LOGGER.debug('Cancelled: Queue index: %s Size: %s',
-                    #               list_index, len(list))
-                    continue
-                except asyncio.TimeoutError:
-                    # _LOGGER.debug('Closing idle connection: Queue index: %s',
-                    #               list_index)
-                    continue
-                finally:
-                    cls._insert_readings_wait_tasks[list_index] = None
-
-            # If batch size still not reached but another list has inserted
-            # recently, wait some more
-            if (not cls._stop) and (len(readings_list) < cls._readings_insert_batch_size) and ((
-                    time.time() - cls._last_insert_time) < cls._readings_insert_batch_timeout_seconds):
-                continue
+            # Wait for a full batch, or for the oldest reading to have waited long enough
+            batch, age = await readings_queue.get_batch(cls._readings_insert_batch_size,
+                                                        cls._readings_insert_batch_timeout_seconds)
+            if not batch:
+                break  # Stopped and nothing left to insert
 
+            batch_size = len(batch)
             attempt = 0
-            cls._last_insert_time = time.time()
+            insert_start = cls._last_insert_time = time.time()
 
             # Perform insert. Retry when fails.
             while True:
-                # _LOGGER.debug('Begin insert: Queue index: %s Batch size: %s', list_index,
-                #               len(list))
+                # _LOGGER.debug('Begin insert: Task index: %s Batch size: %s', task_index, batch_size)
 
                 try:
-                    payload = dict()
-                    payload['readings'] = readings_list
-
                     try:
-                        cls.readings_storage.append(json.dumps(payload))
-                        batch_size = len(readings_list)
+                        await cls.readings_storage.append_encoded(batch)
                         cls._readings_stats += batch_size
                     except StorageServerError as ex:
                         err_response = ex.error
@@ -393,30 +431,30 @@ class Ingest(object):
                         else:
                             # not retryable
                             _LOGGER.error("%s, %s", err_response["source"], err_response["message"])
-                            batch_size = len(readings_list)
                             cls._discarded_readings_stats += batch_size
 
-                    # _LOGGER.debug('End insert: Queue index: %s Batch size: %s',
-                    #               list_index, batch_size)
+                    # _LOGGER.debug('End insert: Task index: %s Batch size: %s', task_index, batch_size)
                     break
                 except Exception as ex:
                     attempt += 1
 
                     # TODO logging each time is overkill
-                    _LOGGER.exception('Insert failed on attempt #%s, list index: %s | %s',
-                                      attempt, list_index, str(ex))
+                    _LOGGER.exception('Insert failed on attempt #%s, task index: %s | %s',
+                                      attempt, task_index, str(ex))
 
                     if cls._stop or attempt >= _MAX_ATTEMPTS:
-                        # Stopping. Discard the entire list upon failure.
-                        batch_size = len(readings_list)
-                        cls._discarded_readings_stats += batch_size
-                        _LOGGER.warning('Insert failed: Queue index: %s Batch size: %s', list_index, batch_size)
-                    break
+                        # Spill the batch, or whatever fits, when enabled. Discard the rest.
+                        spilled = cls._spill(batch)
+                        cls._discarded_readings_stats += batch_size - spilled
+                        _LOGGER.warning('Insert failed: Task index: %s Batch size: %s Spilled: %s', task_index,
+                                        batch_size, spilled)
+                        break
 
-            del readings_list[:batch_size]
+            readings_queue.release(batch_size)
 
-            if not lists_not_full.is_set():
-                lists_not_full.set()
+            if cls._batch_tuner is not None:
+                insert_seconds = time.time() - insert_start
+                cls._tune_batching(batch_size, age + insert_seconds, insert_seconds)
 
         _LOGGER.info('Insert readings loop stopped')
 
@@ -449,59 +487,221 @@ class Ingest(object):
                 cls._write_statistics_sleep_task = None
 
             readings = cls._readings_stats
+            discarded_readings = cls._discarded_readings_stats
+            sensor_stats = cls._sensor_stats
             cls._readings_stats = 0
+            cls._discarded_readings_stats = 0
+            cls._sensor_stats = {}
 
+            # Sensor statistics keys are registered the first time the sensor comes into existence
+            stats_dict = dict(sensor_stats)
+            stats_dict['READINGS'] = stats_dict.get('READINGS', 0) + readings
+            stats_dict['DISCARDED'] = stats_dict.get('DISCARDED', 0) + discarded_readings
             try:
-                await stats.update('READINGS', readings)
+                await stats.update_bulk(stats_dict, 'The number of readings received by FogLAMP since '
+                                                    'startup for sensor {}')
             except Exception as ex:
-                cls._readings_stats += readings
-                _LOGGER.exception('An error occurred while writing readings statistics, %s', str(ex))
+                # update_bulk leaves the increments it did not write, which are counted again
+                for key, value in stats_dict.items():
+                    if key == 'READINGS':
+                        cls._readings_stats += value
+                    elif key == 'DISCARDED':
+                        cls._discarded_readings_stats += value
+                    else:
+                        cls._sensor_stats[key] = cls._sensor_stats.get(key, 0) + value
+                _LOGGER.exception('An error occurred while writing readings statistics, Error: %s', str(ex))
 
-            readings = cls._discarded_readings_stats
-            cls._discarded_readings_stats = 0
+        _LOGGER.info('South statistics writer stopped')
 
-            try:
-                await stats.update('DISCARDED', readings)
-            except Exception as ex:
-                cls._discarded_readings_stats += readings
-                _LOGGER.exception('An error occurred while writing discarded statistics, Error: %s', str(ex))
+    @classmethod
+    def _tune_batching(cls, batch_size, latency_seconds, insert_seconds):
+        """Feeds a completed insert to the batch tuner and applies its choices"""
+        tuner = cls._batch_tuner
+        if tuner.record(batch_size, latency_seconds, insert_seconds):
+            cls._readings_insert_batch_size = tuner.batch_size
+            cls._readings_insert_batch_timeout_seconds = tuner.timeout_seconds
+            _LOGGER.info('Readings insert batch size: %s, timeout: %.3fs, p99 latency: %.3fs',
+                         tuner.batch_size, tuner.timeout_seconds, tuner.p99_latency_seconds)
+
+    @classmethod
+    def get_batching(cls) -> dict:
+        """Returns the readings insert batch size and timeout in use, how they were tuned, the
+        readings spilled to and drained from the spill journal and the payloads sent to storage"""
+        if cls._batch_tuner is not None:
+            return dict(cls._batch_tuner.stats(), adaptive=True, spill=cls._spill_stats(),
+                        storage=cls._storage_stats())
+
+        return {
+            "adaptive": False,
+            "batch_size": cls._readings_insert_batch_size,
+            "flush_timeout_ms": cls._readings_insert_batch_timeout_seconds * 1000,
+            "spill": cls._spill_stats(),
+            "storage": cls._storage_stats()
+        }
+
+    @classmethod
+    def _storage_stats(cls) -> dict:
+        storage = cls.readings_storage
+        if storage is None:
+            return {"batches_sent": 0, "bytes_sent": 0, "last_batch_bytes": 0}
+        return {
+            "batches_sent": storage.batches_sent,
+            "bytes_sent": storage.bytes_sent,
+            "last_batch_bytes": storage.last_batch_bytes
+        }
+
+    @classmethod
+    def _spill_stats(cls) -> dict:
+        journal = cls._spill_journal
+        return {
+            "enabled": journal is not None,
+            "pending_readings": len(journal) if journal is not None else 0,
+            "free_bytes": journal.free_bytes if journal is not None else 0,
+            "spilled_readings": cls._spilled_readings_stats,
+            "drained_readings": cls._drained_readings_stats,
+            "drain_rate": cls._spill_drain_rate
+        }
+
+    @classmethod
+    def _spill(cls, readings: List[str]) -> int:
+        """Writes readings to the spill journal, when enabled, until it is full
+
+        Returns:
+            The number of readings written
+        """
+        if cls._spill_journal is None:
+            return 0
+
+        spilled = cls._spill_journal.append(readings)
+        if spilled:
+            cls._spilled_readings_stats += spilled
+            cls._spill_journal_not_empty.set()
+        return spilled
+
+    @classmethod
+    async def _drain_spill_journal(cls):
+        """Inserts the readings in the spill journal into storage, oldest first, whenever it is not empty"""
+        _LOGGER.info('Spill journal drain started')
+
+        journal = cls._spill_journal
+
+        while not cls._stop:
+            if not len(journal):
+                cls._spill_journal_not_empty.clear()
+                cls._drain_spill_journal_wait_task = asyncio.ensure_future(cls._spill_journal_not_empty.wait())
+            else:
+                drain_start = time.time()
+                drained = 0
+
+                while len(journal) and not cls._stop:
+                    batch = journal.peek(cls._readings_insert_batch_size)
+                    try:
+                        await cls.readings_storage.append_encoded(batch)
+                        cls._readings_stats += len(batch)
+                        drained += len(batch)
+                    except StorageServerError as ex:
+                        if ex.error.get("retryable", True):
+                            _LOGGER.warning('Unable to insert spilled readings | %s', str(ex))
+                            break
+                        _LOGGER.error('Discarding %s spilled readings | %s', len(batch), str(ex))
+                        cls._discarded_readings_stats += len(batch)
+                    except Exception as ex:
+                        _LOGGER.warning('Unable to insert spilled readings | %s', str(ex))
+                        break
+                    journal.commit()
+
+                if drained:
+                    elapsed = time.time() - drain_start
+                    cls._drained_readings_stats += drained
+                    cls._spill_drain_rate = drained / elapsed if elapsed else float(drained)
+                    _LOGGER.info('Inserted %s spilled readings at %.0f readings/s, %s remaining',
+                                 drained, cls._spill_drain_rate, len(journal))
+
+                if not len(journal) or cls._stop:
+                    continue
+
+                # Storage is not accepting readings. Wait before trying again.
+                cls._drain_spill_journal_wait_task = asyncio.ensure_future(
+                    asyncio.sleep(cls._max_readings_insert_batch_reconnect_wait_seconds))
 
-            """ Register the statistics keys as this may be the first time the key has come into existence """
-            for key in cls._sensor_stats:
-                description = 'The number of readings received by FogLAMP since startup for sensor {}'.format(key)
-                await stats.register(key, description)
             try:
-                await stats.add_update(cls._sensor_stats)
-                cls._sensor_stats = {}
-            except Exception as ex:
-                _LOGGER.exception('An error occurred while writing sensor statistics, Error: %s', str(ex))
+                await cls._drain_spill_journal_wait_task
+            except asyncio.CancelledError:
+                pass
+            finally:
+                cls._drain_spill_journal_wait_task = None
 
-        _LOGGER.info('South statistics writer stopped')
+        _LOGGER.info('Spill journal drain stopped')
 
     @classmethod
     def is_available(cls) -> bool:
-        """Indicates whether all lists are currently full
+        """Indicates whether the readings buffer is currently full
 
         Returns:
-            False - All of the lists are full
+            False - The buffer is full, and the spill journal is disabled or full
             True - Otherwise
         """
         if cls._stop:
             return False
 
-        list_index = cls._current_readings_list_index
-        if len(cls._readings_lists[list_index]) < cls._readings_list_size:
+        if not cls._readings_queue.full():
             return True
 
-        if cls._max_concurrent_readings_inserts > 1:
-            for list_index in range(cls._max_concurrent_readings_inserts):
-                if len(cls._readings_lists[list_index]) < cls._readings_list_size:
-                    cls._current_readings_list_index = list_index
-                    return True
+        if cls._spill_journal is not None and cls._spill_journal.free_bytes > 0:
+            return True
 
         _LOGGER.warning('The ingest service is unavailable')
         return False
 
+    @classmethod
+    def _encode_reading(cls, asset, timestamp, key, readings):
+        """Validates an asset readings record and encodes it as JSON
+
+        Returns:
+            A tuple of the statistics key for the asset and the JSON encoded reading
+
+        Raises:
+            ValueError, TypeError:
+                An invalid value was provided, or the reading can not be encoded as JSON
+        """
+        if asset is None:
+            raise ValueError('asset can not be None')
+
+        if not isinstance(asset, str):
+            raise TypeError('asset must be a string')
+
+        if timestamp is None:
+            raise ValueError('timestamp can not be None')
+
+        # if not isinstance(timestamp, datetime.datetime):
+        #     # validate
+        #     timestamp = dateutil.parser.parse(timestamp)
+
+        if key is not None and not isinstance(key, uuid.UUID):
+            # Validate
+            if not isinstance(key, str):
+                raise TypeError('key must be a uuid.UUID or a string')
+            # If key is not a string, uuid.UUID throws an Exception that appears to
+            # be a TypeError but can not be caught as a TypeError
+            key = uuid.UUID(key)
+
+        if readings is None:
+            readings = dict()
+        elif not isinstance(readings, dict):
+            # Postgres allows values like 5 be converted to JSON
+            # Downstream processors can not handle this
+            raise TypeError('readings must be a dictionary')
+
+        try:
+            stats_key, encoded_asset = cls._asset_keys[asset]
+        except KeyError:
+            if len(cls._asset_keys) >= _MAX_CACHED_ASSETS:
+                cls._asset_keys.clear()
+            stats_key, encoded_asset = cls._asset_keys[asset] = (asset.upper(), json.dumps(asset))
+
+        # Encode once, here, so that batches are sent to storage without being re-serialized
+        return stats_key, _READING_TEMPLATE % (encoded_asset, key, json.dumps(readings), json.dumps(timestamp))
+
     @classmethod
     async def add_readings(cls, asset: str, timestamp: Union[str, datetime.datetime],
                            key: Union[str, uuid.UUID] = None, readings: dict = None) -> None:
@@ -523,7 +723,7 @@ class Ingest(object):
                 The server is stopping or has been stopped
 
             ValueError, TypeError:
-                An invalid value was provided
+                An invalid value was provided, or the reading can not be encoded as JSON
         """
         if cls._stop:
             _LOGGER.warning('The South server is stopping')
@@ -534,33 +734,7 @@ class Ingest(object):
             # cls._logger = logger.setup(__name__, destination=logger.CONSOLE, level=logging.DEBUG)
 
         try:
-            if asset is None:
-                raise ValueError('asset can not be None')
-
-            if not isinstance(asset, str):
-                raise TypeError('asset must be a string')
-
-            if timestamp is None:
-                raise ValueError('timestamp can not be None')
-
-            # if not isinstance(timestamp, datetime.datetime):
-            #     # validate
-            #     timestamp = dateutil.parser.parse(timestamp)
-
-            if key is not None and not isinstance(key, uuid.UUID):
-                # Validate
-                if not isinstance(key, str):
-                    raise TypeError('key must be a uuid.UUID or a string')
-                # If key is not a string, uuid.UUID throws an Exception that appears to
-                # be a TypeError but can not be caught as a TypeError
-                key = uuid.UUID(key)
-
-            if readings is None:
-                readings = dict()
-            elif not isinstance(readings, dict):
-                # Postgres allows values like 5 be converted to JSON
-                # Downstream processors can not handle this
-                raise TypeError('readings must be a dictionary')
+            stats_key, read = cls._encode_reading(asset, timestamp, key, readings)
         except Exception:
             cls.increment_discarded_readings()
             raise
@@ -568,48 +742,70 @@ class Ingest(object):
         # Comment out to test IntegrityError
         # key = '123e4567-e89b-12d3-a456-426655440000'
 
-        # Wait for an empty slot in the list
-        while not cls.is_available():
-            cls._readings_lists_not_full.clear()
-            await cls._readings_lists_not_full.wait()
-            if cls._stop:
+        # Spill rather than wait when the buffer is full
+        readings_queue = cls._readings_queue
+        if not readings_queue.full() or not cls._spill([read]):
+            if not await readings_queue.put(read):
                 raise RuntimeError('The South server is stopping')
 
         # Increment the count of received readings to be used for statistics update
-        if asset.upper() in cls._sensor_stats:
-            cls._sensor_stats[asset.upper()] += 1
-        else:
-            cls._sensor_stats[asset.upper()] = 1
+        cls._sensor_stats[stats_key] = cls._sensor_stats.get(stats_key, 0) + 1
 
-        list_index = cls._current_readings_list_index
-        readings_list = cls._readings_lists[list_index]
+    @classmethod
+    async def add_readings_batch(cls, readings: List[dict]) -> None:
+        """Adds a list of asset readings records to FogLAMP
 
-        read = dict()
-        read['asset_code'] = asset
-        read['read_key'] = str(key)
-        read['reading'] = readings
-        read['user_ts'] = timestamp
+        The whole list is validated before any of it is added: if one record is invalid, none are added.
 
-        readings_list.append(read)
+        Args:
+            readings:
+                A list of dictionaries with the keys ``asset``, ``timestamp``, ``key`` and ``readings``,
+                as accepted by :meth:`add_readings`. ``key`` and ``readings`` are optional.
 
-        list_size = len(readings_list)
+        Raises:
+            If this method raises an Exception, the discarded readings counter is
+            incremented by the number of records in the list.
 
-        # _LOGGER.debug('Add readings list index: %s size: %s', cls._current_readings_list_index,
-        #               list_size)
+            RuntimeError:
+                The server is stopping or has been stopped
 
-        if list_size == 1:
-            cls._readings_list_not_empty[list_index].set()
+            ValueError, TypeError, KeyError:
+                An invalid record was provided, or a record can not be encoded as JSON
+        """
+        if cls._stop:
+            _LOGGER.warning('The South server is stopping')
+            return
 
-        if list_size == cls._readings_insert_batch_size:
-            cls._readings_list_batch_size_reached[list_index].set()
-            # _LOGGER.debug('Set event list index: %s size: %s',
-            #               cls._current_readings_list_index, len(list))
+        if not cls._started:
+            raise RuntimeError('The South server was not started')
 
-        # When the current list is full, move on to the next list
-        if cls._max_concurrent_readings_inserts > 1 and (
-                    list_size >= cls._readings_insert_batch_size):
-            # Start at the beginning to reduce the number of connections
-            for list_index in range(cls._max_concurrent_readings_inserts):
-                if len(cls._readings_lists[list_index]) < cls._readings_insert_batch_size:
-                    cls._current_readings_list_index = list_index
-                    break
+        try:
+            if not isinstance(readings, list):
+                raise TypeError('readings must be a list')
+
+            stats_keys = []
+            reads = []
+            for reading in readings:
+                if not isinstance(reading, dict):
+                    raise TypeError('each reading must be a dictionary')
+                stats_key, read = cls._encode_reading(reading['asset'], reading['timestamp'], reading.get('key'),
+                                                      reading.get('readings'))
+                stats_keys.append(stats_key)
+                reads.append(read)
+        except Exception:
+            cls._discarded_readings_stats += len(readings) if isinstance(readings, list) else 1
+            raise
+
+        # Spill rather than wait when the buffer is full
+        readings_queue = cls._readings_queue
+        added = readings_queue.put_nowait(reads)
+        if added < len(reads):
+            added += cls._spill(reads[added:])
+        if added < len(reads):
+            added += await readings_queue.put_many(reads[added:])
+
+        for stats_key in stats_keys[:added]:
+            cls._sensor_stats[stats_key] = cls._sensor_stats.get(stats_key, 0) + 1
+
+        if added < len(reads):
+            raise RuntimeError('The South server is stopping')
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Bounded queue of encoded readings shared by the Ingest insert tasks"""
+
+import asyncio
+import collections
+from typing import List, Tuple
+
+__author__ = "Terris Linenbach"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_SEGMENT_SECONDS = 0.01
+"""Readings added within this many seconds of each other share an enqueue time"""
+
+
+class ReadingsQueue(object):
+    """A bounded FIFO with batch dequeue, for many producers and many consumers
+
+    Consumers take readings a batch at a time with :meth:`get_batch`. Readings taken count against
+    the bound until they are given back with :meth:`release`, so the bound covers readings being
+    inserted as well as readings waiting. Producers that find the queue full wait in :meth:`put` or
+    :meth:`put_many`.
+
+    Waiting uses plain futures woken directly by the other side, and timer handles for timeouts,
+    so no task is created per wait. Enqueue times are kept for runs of readings rather than for
+    each one, which is enough to report the age of the oldest reading in a batch.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Args:
+            maxsize: The maximum number of readings queued or taken but not released
+        """
+        self.maxsize = maxsize
+
+        self._items = collections.deque()  # type: collections.deque
+        self._in_flight = 0
+        self._segments = collections.deque()  # [enqueue time, count], oldest on the left
+        self._getters = []  # type: List[Tuple[int, asyncio.Future]]
+        self._getters_wake_size = 0
+        self._putters = collections.deque()  # type: collections.deque
+        self._closed = False
+        self._loop = None
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def full(self) -> bool:
+        return len(self._items) + self._in_flight >= self.maxsize
+
+    def _get_loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    def _added(self, count):
+        now = self._get_loop().time()
+        segments = self._segments
+        if segments and now - segments[-1][0] < _SEGMENT_SECONDS:
+            segments[-1][1] += count
+        else:
+            segments.append([now, count])
+
+        if self._getters and len(self._items) >= self._getters_wake_size:
+            self._wake_getters()
+
+    def _wake_getters(self):
+        size = len(self._items)
+        waiting = []
+        for wake_size, future in self._getters:
+            if size >= wake_size or self._closed:
+                self._wake(future)
+            elif not future.done():
+                waiting.append((wake_size, future))
+
+        self._getters = waiting
+        self._getters_wake_size = min(w[0] for w in waiting) if waiting else 0
+
+    def _wake_putters(self):
+        while self._putters:
+            self._wake(self._putters.popleft())
+
+    def put_nowait(self, items: List[str]) -> int:
+        """Adds as many of the readings, in order, as there is room for
+
+        Returns:
+            The number of readings added
+        """
+        if self._closed:
+            return 0
+
+        count = min(len(items), self.maxsize - len(self._items) - self._in_flight)
+        if count <= 0:
+            return 0
+
+        if count == len(items):
+            self._items.extend(items)
+        else:
+            self._items.extend(items[:count])
+        self._added(count)
+        return count
+
+    async def put(self, item: str) -> bool:
+        """Adds a reading, waiting for room if the queue is full
+
+        Returns:
+            False when the queue was closed before the reading could be added
+        """
+        while self.full():
+            if self._closed:
+                return False
+            future = self._get_loop().create_future()
+            self._putters.append(future)
+            await future
+
+        if self._closed:
+            return False
+
+        self._items.append(item)
+        self._added(1)
+        return True
+
+    async def put_many(self, items: List[str]) -> int:
+        """Adds the readings in order, waiting for room as often as needed
+
+        Returns:
+            The number of readings added, which is less than len(items) only when the queue was closed
+        """
+        added = self.put_nowait(items)
+        while added < len(items) and not self._closed:
+            future = self._get_loop().create_future()
+            self._putters.append(future)
+            await future
+            added += self.put_nowait(items[added:])
+        return added
+
+    async def _wait(self, wake_size, deadline=None):
+        loop = self._get_loop()
+        future = loop.create_future()
+        getter = (wake_size, future)
+        self._getters.append(getter)
+        if not self._getters_wake_size or wake_size < self._getters_wake_size:
+            self._getters_wake_size = wake_size
+
+        timer = None if deadline is None else loop.call_at(deadline, self._wake, future)
+        try:
+            await future
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if getter in self._getters:
+                # Timed out or canceled rather than woken by _wake_getters
+                self._getters.remove(getter)
+
+    async def get_batch(self, batch_size: int, timeout: float) -> Tuple[List[str], float]:
+        """Takes up to batch_size readings once there are batch_size of them, or once the oldest has
+        waited timeout seconds, or once the queue is closed
+
+        The readings taken count against the bound of the queue until :meth:`release` is called.
+
+        Returns:
+            (readings, seconds the oldest of them was queued). The list is empty only once the queue
+            is closed and empty.
+        """
+        loop = self._get_loop()
+
+        while True:
+            while not self._items:
+                if self._closed:
+                    return [], 0
+                await self._wait(1)
+
+            while len(self._items) < batch_size and not self._closed:
+                deadline = self._segments[0][0] + timeout
+                if loop.time() >= deadline:
+                    break
+                await self._wait(batch_size, deadline)
+                if not self._items:
+                    break  # Other consumers took them
+
+            if self._items:
+                break
+
+        items = self._items
+        count = min(batch_size, len(items))
+        if count == len(items):
+            batch = list(items)
+            items.clear()
+        else:
+            batch = [items.popleft() for _ in range(count)]
+
+        segments = self._segments
+        age = loop.time() - segments[0][0]
+        remaining = count
+        while remaining:
+            if segments[0][1] > remaining:
+                segments[0][1] -= remaining
+                break
+            remaining -= segments.popleft()[1]
+
+        self._in_flight += count
+        return batch, age
+
+    def release(self, count: int) -> None:
+        """Gives back room taken by :meth:`get_batch` once the readings have been dealt with"""
+        self._in_flight -= count
+        if self._putters:
+            self._wake_putters()
+
+    def close(self) -> None:
+        """Wakes every waiter. Nothing can be added from now on; what is left can still be taken."""
+        self._closed = True
+        self._wake_getters()
+        self._wake_putters()
@@ -6,10 +6,15 @@
 
 """FogLAMP South Microservice"""
 
+import collections
+import copy
 import json
 import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
 from foglamp.services.south import exceptions
 from foglamp.common import logger
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 from foglamp.services.south.ingest import Ingest
 from foglamp.services.common.microservice import FoglampMicroservice
 from aiohttp import web
@@ -23,6 +28,10 @@ _LOGGER = logger.setup(__name__)
 _MAX_RETRY_POLL = 3
 _TIME_TO_WAIT_BEFORE_RETRY = 2
 _CLEAR_PENDING_TASKS_TIMEOUT = 5
+_POLL_LATENCY_WINDOW = 100
+"""Number of recent polls the poll latency percentiles are computed from"""
+_DEFAULT_POLL_WORKERS = 4
+"""Number of devices polled at the same time, unless the plugin configuration has a pollWorkers item"""
 
 class Server(FoglampMicroservice):
     """" Implements the South Microservice """
@@ -64,12 +73,30 @@ class Server(FoglampMicroservice):
     """The plugin's info'"""
 
     _plugin_handle = None
-    """The value that is returned by the plugin_init"""
+    """The value that is returned by the plugin_init, for the first device when there are several"""
+
+    _plugin_handles = None
+    """The values returned by plugin_init, one for each device a poll plugin polls"""
+
+    _config = None
+    """The plugin's configuration category, kept up to date from change notifications"""
 
     _type = "Southbound"
 
     _task_main = None
 
+    _poll_executor = None
+    """Threads the blocking plugin_poll calls run in, so that they never hold up the event loop"""
+
+    _poll_workers = 1
+    """Number of threads of the poll executor"""
+
+    _poll_stats = None
+    """Counts of polls and overruns for the poll plugin"""
+
+    _poll_latencies = None
+    """Durations in seconds of the most recent polls"""
+
     def __init__(self):
         super().__init__(self._DEFAULT_CONFIG)
 
@@ -86,8 +113,8 @@ class Server(FoglampMicroservice):
                 "value": config,
                 "keep_original_items": True
             })
-            self._core_microservice_management_client.create_configuration_category(config_payload)
-            config = self._core_microservice_management_client.get_configuration_category(category_name=category)
+            # the created category is returned, merged with the stored one
+            config = self._core_microservice_management_client.create_configuration_category(config_payload)['value']
 
             try:
                 plugin_module_name = config['plugin']['value']
@@ -117,8 +144,8 @@ class Server(FoglampMicroservice):
                 "value": default_config,
                 "keep_original_items": False
             })
-            self._core_microservice_management_client.create_configuration_category(config_payload)
-            config = self._core_microservice_management_client.get_configuration_category(category_name=category)
+            config = self._core_microservice_management_client.create_configuration_category(config_payload)['value']
+            self._config = config
 
             # Register interest with category and microservice_id
             result = self._core_microservice_management_client.register_interest(category, self._microservice_id)
@@ -133,7 +160,7 @@ class Server(FoglampMicroservice):
                 _LOGGER.error(message)
                 raise exceptions.InvalidPluginTypeError()
 
-            self._plugin_handle = self._plugin.plugin_init(config)
+            await self._init_devices(self._device_configs(config))
 
             await Ingest.start(self._core_management_host, self._core_management_port, self)
 
@@ -159,38 +186,140 @@ class Server(FoglampMicroservice):
         _LOGGER.info('Started South Plugin: {}'.format(self._name))
         self._plugin.plugin_start(self._plugin_handle)
 
+    def _device_configs(self, config) -> list:
+        """Returns the configuration of each device the plugin is to be initialised for
+
+        A poll plugin whose configuration has a devices item polls, besides the device the category
+        configures, one device for each entry of that JSON list. An entry holds the values of the
+        items that differ from the category, such as {"bluetoothAddress": "B0:91:22:EA:79:05"}.
+        """
+        configs = [config]
+        if self._plugin_info['mode'] != 'poll' or 'devices' not in config:
+            return configs
+
+        devices = config['devices']['value']
+        if isinstance(devices, str):
+            devices = json.loads(devices) if devices.strip() else []
+        for device in devices:
+            device_config = copy.deepcopy(config)
+            for item_name, value in device.items():
+                # KeyError for an item the plugin does not have
+                device_config[item_name]['value'] = value if isinstance(value, str) else json.dumps(value)
+            configs.append(device_config)
+
+        try:
+            workers = int(config['pollWorkers']['value'])
+        except KeyError:
+            workers = _DEFAULT_POLL_WORKERS
+        self._poll_workers = max(1, min(workers, len(configs)))
+        return configs
+
+    async def _call_for_devices(self, func, *device_args) -> list:
+        """Calls a plugin entry point for each device and returns the results in device order
+
+        The entry points of poll plugins connect to their device and may block, so they are called in
+        threads, all devices at once. Those of async plugins use the event loop and are called on it.
+        """
+        calls = list(zip(*device_args))
+        if self._plugin_info['mode'] != 'poll':
+            return [func(*args) for args in calls]
+        loop = asyncio.get_event_loop()
+        return list(await asyncio.gather(*[loop.run_in_executor(None, func, *args) for args in calls]))
+
+    async def _init_devices(self, device_configs) -> None:
+        """Calls plugin_init for each device"""
+        self._plugin_handles = await self._call_for_devices(self._plugin.plugin_init, device_configs)
+        self._plugin_handle = self._plugin_handles[0]
+
     async def _exec_plugin_poll(self) -> None:
         """Executes poll type plugin
+
+        Each device is polled in its own coroutine; the devices share the threads of the poll
+        executor and the Ingest buffers.
         """
         _LOGGER.info('Started South Plugin: {}'.format(self._name))
+        if self._poll_executor is None:
+            self._poll_executor = ThreadPoolExecutor(max_workers=self._poll_workers)
+        if self._poll_stats is None:
+            self._poll_stats = {"polls": 0, "overruns": 0, "skipped_polls": 0}
+            self._poll_latencies = collections.deque(maxlen=_POLL_LATENCY_WINDOW)
+
+        if len(self._plugin_handles) == 1:
+            await self._poll_device(0, self._name)
+        else:
+            await asyncio.gather(*[self._poll_device(index, '{} device {}'.format(self._name, index))
+                                   for index in range(len(self._plugin_handles))])
+
+    async def _poll_device(self, index, name) -> None:
+        """Polls the device of the plugin handle at index
+
+        plugin_poll is called in a thread of the poll executor at a fixed rate of one poll every
+        pollInterval milliseconds, measured from the start of one poll to the start of the next. A
+        poll that takes longer than the interval is an overrun; the polls it made late are skipped
+        rather than run back to back.
+        """
+        loop = asyncio.get_event_loop()
         try_count = 1
+        deadline = loop.time()
         while self._plugin and try_count <= _MAX_RETRY_POLL:
             try:
-                data = self._plugin.plugin_poll(self._plugin_handle)
+                # The handle is looked up each time as reconfiguration replaces it
+                handle = self._plugin_handles[index]
+                started = loop.time()
+                data = await loop.run_in_executor(self._poll_executor, self._plugin.plugin_poll, handle)
+                self._poll_latencies.append(loop.time() - started)
+                self._poll_stats["polls"] += 1
+
                 if len(data) > 0:
                     if isinstance(data, list):
-                        for reading in data:
-                            asyncio.ensure_future(Ingest.add_readings(asset=reading['asset'],
-                                                                        timestamp=reading['timestamp'],
-                                                                        key=reading['key'],
-                                                                        readings=reading['readings']))
+                        asyncio.ensure_future(Ingest.add_readings_batch(data))
                     elif isinstance(data, dict):
                         asyncio.ensure_future(Ingest.add_readings(asset=data['asset'],
                                                                   timestamp=data['timestamp'],
                                                                   key=data['key'],
                                                                   readings=data['readings']))
                 # pollInterval is expressed in milliseconds
-                sleep_seconds = int(self._plugin_handle['pollInterval']['value']) / 1000.0
-                await asyncio.sleep(sleep_seconds)
+                interval = int(handle['pollInterval']['value']) / 1000.0
+                deadline += interval
+                now = loop.time()
+                if now > deadline:
+                    missed = math.ceil((now - deadline) / interval) if interval > 0 else 0
+                    self._poll_stats["overruns"] += 1
+                    self._poll_stats["skipped_polls"] += missed
+                    _LOGGER.warning('Poll of South plugin %s took %.3f seconds, longer than its poll interval of '
+                                    '%.3f seconds; %s polls skipped', name, now - started, interval, missed)
+                    deadline += missed * interval
+                await asyncio.sleep(deadline - now)
                 # If successful, then set retry count back to 1, meaning that only in case of 3 successive failures, exit.
                 try_count = 1
             except KeyError as ex:
-                _LOGGER.exception('Keyerror plugin {} : {}'.format(self._name, str(ex)))
+                _LOGGER.exception('Keyerror plugin {} : {}'.format(name, str(ex)))
             except (Exception, RuntimeError, exceptions.DataRetrievalError) as ex:
                 try_count += 1
-                _LOGGER.exception('Failed to poll for plugin {}, retry count: {}'.format(self._name, try_count))
+                _LOGGER.exception('Failed to poll for plugin {}, retry count: {}'.format(name, try_count))
                 await asyncio.sleep(_TIME_TO_WAIT_BEFORE_RETRY)
-        _LOGGER.exception('Max retries exhausted in starting South plugin: {}'.format(self._name))
+                # The schedule starts over after a failed poll
+                deadline = loop.time()
+        _LOGGER.exception('Max retries exhausted in starting South plugin: {}'.format(name))
+
+    def get_poll_stats(self) -> dict:
+        """Returns the poll counts and latencies of the poll plugin"""
+        stats = dict(self._poll_stats or {"polls": 0, "overruns": 0, "skipped_polls": 0})
+        stats["devices"] = len(self._plugin_handles or [])
+        stats["poll_workers"] = self._poll_workers
+        latencies = sorted(self._poll_latencies or [])
+
+        def ms(seconds):
+            return round(seconds * 1000, 1)
+
+        if latencies:
+            stats["last_poll_ms"] = ms(self._poll_latencies[-1])
+            stats["p50_poll_ms"] = ms(latencies[max(0, int(math.ceil(0.5 * len(latencies))) - 1)])
+            stats["p99_poll_ms"] = ms(latencies[max(0, int(math.ceil(0.99 * len(latencies))) - 1)])
+            stats["max_poll_ms"] = ms(latencies[-1])
+        else:
+            stats["last_poll_ms"] = stats["p50_poll_ms"] = stats["p99_poll_ms"] = stats["max_poll_ms"] = None
+        return stats
 
     def run(self):
         """Starts the South Microservice
@@ -200,17 +329,37 @@ class Server(FoglampMicroservice):
         # This activates event loop and starts fetching events to the microservice server instance
         loop.run_forever()
 
+    async def _stop_polling(self) -> None:
+        """Cancels polling and waits for the polls under way in the poll executor to return
+
+        A poll can not be interrupted, so the handles it uses must not be reconfigured or shut down,
+        nor Ingest stopped, until it has returned. The poll coroutines are canceled first, so the
+        readings of those polls are not added.
+        """
+        if self._task_main is not None:
+            self._task_main.cancel()
+
+        executor = self._poll_executor
+        if executor is not None:
+            self._poll_executor = None
+            await asyncio.get_event_loop().run_in_executor(None, executor.shutdown, True)
+
     async def _stop(self, loop):
+        await self._stop_polling()
+
         if self._plugin is not None:
             try:
-                self._plugin.plugin_shutdown(self._plugin_handle)
-            except Exception as ex:
-                _LOGGER.exception("Unable to stop plugin '%s' | reason: %s", self._name, str(ex))
-                #  must not prevent FogLAMP shutting down cleanly via the API call.
-                # raise ex
+                for handle in self._plugin_handles or [self._plugin_handle]:
+                    try:
+                        self._plugin.plugin_shutdown(handle)
+                    except Exception as ex:
+                        _LOGGER.exception("Unable to stop plugin '%s' | reason: %s", self._name, str(ex))
+                        #  must not prevent FogLAMP shutting down cleanly via the API call.
+                        # raise ex
             finally:
                 self._plugin = None
                 self._plugin_handle = None
+                self._plugin_handles = None
 
         try:
             await Ingest.stop()
@@ -219,6 +368,8 @@ class Server(FoglampMicroservice):
             _LOGGER.exception('Unable to stop the Ingest server. %s', str(ex))
             raise ex
 
+        HTTPConnectionPool.close_all()
+
         try:
             self._task_main.cancel()
             # Cancel all pending asyncio tasks after a timeout occurs
@@ -234,6 +385,27 @@ class Server(FoglampMicroservice):
         _LOGGER.info('Stopping South service event loop, for plugin {}.'.format(self._name))
         loop.stop()
 
+    def _add_microservice_management_routes(self, app):
+        app.router.add_route('GET', '/foglamp/south/ingest/batching', self.get_ingest_batching)
+        app.router.add_route('GET', '/foglamp/south/poll', self.get_poll)
+
+    async def get_ingest_batching(self, request):
+        """Returns the readings insert batch size and timeout Ingest is using, their tuning history, the
+        readings spilled to and drained from the spill journal and the payloads sent to storage
+
+        :Example:
+            curl -X GET http://localhost:<management_port>/foglamp/south/ingest/batching
+        """
+        return web.json_response(Ingest.get_batching())
+
+    async def get_poll(self, request):
+        """Returns the number of polls of the poll plugin, how many overran the poll interval and how long they took
+
+        :Example:
+            curl -X GET http://localhost:<management_port>/foglamp/south/poll
+        """
+        return web.json_response(self.get_poll_stats())
+
     async def shutdown(self, request):
         """implementation of abstract method form foglamp.common.microservice.
         """
@@ -254,15 +426,17 @@ class Server(FoglampMicroservice):
         _LOGGER.info('Configuration has changed for South plugin {}'.format(self._name))
 
         try:
-            # retrieve new configuration
-            new_config = self._core_microservice_management_client.get_configuration_category(category_name=self._name)
+            new_config = await self._changed_config(request)
+
+            polling = self._plugin_info['mode'] == 'poll'
+            if polling:
+                # plugin_reconfigure may reconnect the devices being polled
+                await self._stop_polling()
 
-            # plugin_reconfigure and assign new handle
-            new_handle = self._plugin.plugin_reconfigure(self._plugin_handle, new_config)
-            self._plugin_handle = new_handle
+            restart = await self._reconfigure_devices(self._device_configs(new_config))
 
             _LOGGER.info('Reconfiguration done for South plugin {}'.format(self._name))
-            if new_handle['restart'] == 'yes':
+            if restart:
                 self._task_main.cancel()
                 # Executes the requested plugin type with new config
                 if self._plugin_info['mode'] == 'async':
@@ -270,6 +444,9 @@ class Server(FoglampMicroservice):
                 elif self._plugin_info['mode'] == 'poll':
                     self._task_main = asyncio.ensure_future(self._exec_plugin_poll())
                 await asyncio.sleep(_TIME_TO_WAIT_BEFORE_RETRY)
+            elif polling:
+                # Polling resumes with the reconfigured handles
+                self._task_main = asyncio.ensure_future(self._exec_plugin_poll())
         except asyncio.CancelledError:
             pass
         except exceptions.DataRetrievalError:
@@ -277,3 +454,44 @@ class Server(FoglampMicroservice):
             raise web.HTTPInternalServerError('Data retreival error in plugin {} during reconfigure'.format(self._name))
 
         return web.json_response({"south": "change"})
+
+    async def _reconfigure_devices(self, device_configs) -> bool:
+        """Hands each device its new configuration, or starts the devices over when devices were added or removed
+
+        Polling must have been stopped, see _stop_polling.
+
+        Returns:
+            True when the plugin needs to be restarted
+        """
+        handles = self._plugin_handles or [self._plugin_handle]
+        if len(device_configs) == len(handles):
+            # plugin_reconfigure and assign new handles
+            new_handles = await self._call_for_devices(self._plugin.plugin_reconfigure, handles, device_configs)
+            self._plugin_handles = new_handles
+            self._plugin_handle = new_handles[0]
+            return any(new_handle['restart'] == 'yes' for new_handle in new_handles)
+
+        await self._call_for_devices(self._plugin.plugin_shutdown, handles)
+        await self._init_devices(device_configs)
+        return True
+
+    async def _changed_config(self, request):
+        """Applies the change notified by the core to the local copy of the configuration
+
+        The whole category is retrieved from the core only when the notification does not carry it.
+        """
+        payload = await request.json() if request is not None and request.body_exists else {}
+        items = payload.get('items') if payload.get('category') == self._name else None
+
+        if items is None or (payload.get('delta') and self._config is None):
+            new_config = self._core_microservice_management_client.get_configuration_category(category_name=self._name)
+        elif payload.get('delta'):
+            new_config = dict(self._config)
+            new_config.update(items)
+            for item_name in payload.get('removed', []):
+                new_config.pop(item_name, None)
+        else:
+            new_config = items
+
+        self._config = new_config
+        return new_config
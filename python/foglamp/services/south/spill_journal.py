@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+"""Disk-backed spill journal for readings that can not be held in memory or inserted into storage"""
+
+import mmap
+import os
+import struct
+from typing import List
+
+from foglamp.common import logger
+
+__author__ = "Terris Linenbach"
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+_LOGGER = logger.setup(__name__)
+
+_HEADER = struct.Struct('<QQQ')
+"""Read offset, write offset and number of pending readings"""
+
+
+class SpillJournal(object):
+    """An append-only, memory-mapped journal of JSON encoded readings
+
+    The journal is a file of a fixed maximum size holding one encoded reading per line after a small
+    header. Readings are appended at the write offset and consumed from the read offset; when every
+    reading has been consumed both offsets return to the start of the file, and once more than half
+    of the file has been consumed the readings still pending are moved back to its start. Because
+    the file is mapped shared, its contents survive a restart of the South service.
+    """
+
+    def __init__(self, path: str, max_size: int):
+        """
+        Args:
+            path: The journal file, which is created if it does not exist
+            max_size: The maximum size of the journal file in bytes
+        """
+        self._path = path
+        self._file = open(path, 'a+b')
+
+        read_offset = write_offset = _HEADER.size
+        count = 0
+
+        file_size = os.fstat(self._file.fileno()).st_size
+        if file_size >= _HEADER.size:
+            self._file.seek(0)
+            read_offset, write_offset, count = _HEADER.unpack(self._file.read(_HEADER.size))
+            if not _HEADER.size <= read_offset <= write_offset <= file_size:
+                _LOGGER.warning('Spill journal %s is corrupt; its contents are discarded', path)
+                read_offset = write_offset = _HEADER.size
+                count = 0
+
+        # Never shrink the journal below the readings it still holds
+        self._size = max(max_size, write_offset)
+        self._file.truncate(self._size)
+        self._mmap = mmap.mmap(self._file.fileno(), self._size)
+
+        self._read_offset = read_offset
+        self._write_offset = write_offset
+        self._count = count
+        self._peek_offset = read_offset
+        self._peek_count = 0
+        self._write_header()
+
+        if count:
+            _LOGGER.info('Spill journal %s holds %s readings', path, count)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def free_bytes(self) -> int:
+        return self._size - self._write_offset
+
+    def _write_header(self):
+        _HEADER.pack_into(self._mmap, 0, self._read_offset, self._write_offset, self._count)
+
+    def append(self, readings: List[str]) -> int:
+        """Appends JSON encoded readings, in order, until the journal is full
+
+        Returns:
+            The number of readings appended
+        """
+        written = 0
+        offset = self._write_offset
+        for read in readings:
+            data = read.encode() + b'\n'
+            end = offset + len(data)
+            if end > self._size:
+                break
+            self._mmap[offset:end] = data
+            offset = end
+            written += 1
+
+        if written:
+            self._write_offset = offset
+            self._count += written
+            self._write_header()
+
+        return written
+
+    def peek(self, max_count: int) -> List[str]:
+        """Returns up to max_count of the oldest readings without consuming them; see :meth:`commit`"""
+        readings = []
+        offset = self._read_offset
+        while len(readings) < max_count and offset < self._write_offset:
+            end = self._mmap.find(b'\n', offset, self._write_offset)
+            readings.append(self._mmap[offset:end].decode())
+            offset = end + 1
+
+        self._peek_offset = offset
+        self._peek_count = len(readings)
+        return readings
+
+    def commit(self) -> None:
+        """Consumes the readings returned by the last call to :meth:`peek`"""
+        self._read_offset = self._peek_offset
+        self._count -= self._peek_count
+        self._peek_count = 0
+
+        if self._read_offset >= self._write_offset:
+            self._read_offset = self._write_offset = self._peek_offset = _HEADER.size
+            self._count = 0
+        elif self._read_offset > self._size // 2:
+            self._compact()
+
+        self._write_header()
+
+    def _compact(self) -> None:
+        """Moves the pending readings to the start of the journal to reclaim the space consumed before them
+
+        Only done when the pending readings fit in the consumed space, so that they are not overwritten
+        before the header points at their new location.
+        """
+        pending = self._write_offset - self._read_offset
+        if pending > self._read_offset - _HEADER.size:
+            return
+        self._mmap.move(_HEADER.size, self._read_offset, pending)
+        self._read_offset = self._peek_offset = _HEADER.size
+        self._write_offset = _HEADER.size + pending
+
+    def close(self) -> None:
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.close()
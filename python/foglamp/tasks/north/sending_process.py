@@ -23,7 +23,8 @@ import importlib
 import logging
 import datetime
 import signal
-import json
+import collections
+import concurrent.futures
 
 import foglamp.plugins.north.common.common as plugin_common
 
@@ -115,6 +116,14 @@ class InvalidCommandLineParameters(RuntimeError):
     """ Invalid command line parameters, the stream id is the only required """
     pass
 
+
+_DataBlock = collections.namedtuple('_DataBlock', ['position', 'data', 'last_object_id'])
+""" A block of data prepared for sending:
+    position       - last object id already handled when the block was fetched
+    data           - the data to send, an empty list if there was nothing new
+    last_object_id - the id of the last row of the block, position if the block is empty
+"""
+
 def apply_date_format(in_data):
     """ This routine adds the default UTC zone format to the input date time string
     If a timezone (strting with + or -) is found, all the following chars
@@ -295,6 +304,24 @@ class SendingProcess:
             "type": "integer",
             "default": "5"
         },
+        "pipelineDepth": {
+            "description": "The number of blocks fetched and prepared while the current block "
+                           "is being sent, 0 to fetch each block only after the previous one was sent.",
+            "type": "integer",
+            "default": "1"
+        },
+        "checkpointInterval": {
+            "description": "A period of time, expressed in seconds, after which the reached position, "
+                           "the statistics and the audit log are updated for the data sent meanwhile.",
+            "type": "integer",
+            "default": "10"
+        },
+        "checkpointMaxRows": {
+            "description": "The number of rows that can be sent before the reached position, "
+                           "the statistics and the audit log are updated, 0 to update them after every block.",
+            "type": "integer",
+            "default": "5000"
+        },
         "north": {
             "description": "The name of the north to use to translate the readings "
                            "into the output format and send them",
@@ -329,6 +356,9 @@ class SendingProcess:
             'source': self._CONFIG_DEFAULT['source']['default'],
             'blockSize': int(self._CONFIG_DEFAULT['blockSize']['default']),
             'sleepInterval': int(self._CONFIG_DEFAULT['sleepInterval']['default']),
+            'pipelineDepth': int(self._CONFIG_DEFAULT['pipelineDepth']['default']),
+            'checkpointInterval': int(self._CONFIG_DEFAULT['checkpointInterval']['default']),
+            'checkpointMaxRows': int(self._CONFIG_DEFAULT['checkpointMaxRows']['default']),
             'north': self._CONFIG_DEFAULT['north']['default'],
         }
         self._config_from_manager = ""
@@ -352,6 +382,18 @@ class SendingProcess:
         """" Interfaces to the FogLAMP Storage Layer """
         self._audit = None
         """" Used to log operations in the Storage Layer """
+        self._type_converter = plugin_common.TypeConverter()
+        """ Converts the values of the readings, remembering the types of the fields of every asset """
+        self._jqfilter = None
+        """ Applies the filter rule, it keeps the rule compiled """
+
+        self._last_object_id = None
+        """ Reached position, read from the streams table once and then kept in memory """
+        self._checkpoint_last_object_id = None
+        """ Reached position as last written to the streams table """
+        self._checkpoint_rows = 0
+        """ Rows sent since the last checkpoint """
+        self._checkpoint_time = time.time()
 
         self.input_stream_id = None
         self._log_performance = None
@@ -483,8 +525,7 @@ class SendingProcess:
             raise
         return converted_data
 
-    @staticmethod
-    def _transform_in_memory_data_readings(raw_data):
+    def _transform_in_memory_data_readings(self, raw_data):
         """ Transforms readings data retrieved form the DB layer to the proper format
         Args:
             raw_data: list of dicts to convert having the structure
@@ -498,15 +539,13 @@ class SendingProcess:
         Raises:
         """
         converted_data = []
+        convert_reading = self._type_converter.convert_reading
 
         try:
             for row in raw_data:
 
                 # Converts values to the proper types, for example "180.2" to float 180.2
-                payload = row['reading']
-                for key in list(payload.keys()):
-                    value = payload[key]
-                    payload[key] = plugin_common.convert_to_type(value)
+                payload = convert_reading(row['asset_code'], row['reading'])
 
                 # Adds timezone UTC
                 timestamp = apply_date_format(row['user_ts'])
@@ -680,70 +719,208 @@ class SendingProcess:
         data_sent = False
         SendingProcess._logger.debug("{0} - ".format("_send_data_block"))
         try:
-            last_object_id = self._last_object_id_read(stream_id)
+            last_object_id = self._reached_position(stream_id)
             data_to_send = self._load_data_into_memory(last_object_id)
             if data_to_send:
-                if self._config_from_manager['applyFilter']["value"].upper() == "TRUE":
-                    jqfilter = JQFilter()
-
-                    # Steps needed to proper format the data generated by the JQFilter to the one expected by the SP
-                    data_to_send_2 = jqfilter.transform(data_to_send, self._config_from_manager['filterRule']["value"])
-                    data_to_send_3 = json.dumps(data_to_send_2)
-                    del data_to_send_2
-
-                    data_to_send_4 = eval(data_to_send_3)
-                    del data_to_send_3
-
-                    data_to_send = data_to_send_4[0]
-                    del data_to_send_4
+                data_to_send = self._apply_filter(data_to_send)
 
                 data_sent, new_last_object_id, num_sent = self._plugin.plugin_send(self._plugin_handle, data_to_send, stream_id)
                 if data_sent:
-                    # Updates reached position, statistics and logs the operation within the Storage Layer
-                    self._last_object_id_update(new_last_object_id, stream_id)
-                    self._update_statistics(num_sent, stream_id)
-                    loop = asyncio.get_event_loop()
-                    loop.run_until_complete(self._audit.information(self._AUDIT_CODE, {"sentRows": num_sent}))
+                    self._data_block_sent(new_last_object_id, num_sent, stream_id)
         except Exception:
             _message = _MESSAGES_LIST["e000006"]
             SendingProcess._logger.error(_message)
             raise
         return data_sent
 
-    def send_data(self, stream_id):
-        """ Handles the sending of the data to the destination using the configured plugin
-            for a defined amount of time
+    def _apply_filter(self, data_to_send):
+        """ Applies the JQ filter rule to a block of data, if the filter is enabled """
+        if self._config_from_manager['applyFilter']["value"].upper() == "TRUE":
+            if self._jqfilter is None:
+                self._jqfilter = JQFilter()
+
+            # The outputs of the filter are new objects, the first one is the data block to send
+            data_to_send = self._jqfilter.transform(data_to_send, self._config_from_manager['filterRule']["value"])[0]
+
+        return data_to_send
+
+    def _reached_position(self, stream_id):
+        """ Returns the last object id already sent, reading it from the streams table only the first time """
+        if self._last_object_id is None:
+            self._last_object_id = self._last_object_id_read(stream_id)
+            self._checkpoint_last_object_id = self._last_object_id
+            self._checkpoint_time = time.time()
+        return self._last_object_id
+
+    def _data_block_sent(self, new_last_object_id, num_sent, stream_id):
+        """ Records a block as sent, updating the Storage Layer only when a checkpoint is due """
+        self._last_object_id = new_last_object_id
+        self._checkpoint_rows += num_sent
+
+        if self._checkpoint_rows >= self._config['checkpointMaxRows'] or \
+                time.time() - self._checkpoint_time >= self._config['checkpointInterval']:
+            self._checkpoint(stream_id)
+
+    def _checkpoint(self, stream_id):
+        """ Updates reached position, statistics and logs the operation within the Storage Layer,
+        for all the blocks sent since the previous checkpoint
+        """
+        self._checkpoint_time = time.time()
+
+        if self._last_object_id != self._checkpoint_last_object_id:
+            self._last_object_id_update(self._last_object_id, stream_id)
+            self._checkpoint_last_object_id = self._last_object_id
+
+        num_sent = self._checkpoint_rows
+        if num_sent:
+            self._update_statistics(num_sent, stream_id)
+            self._checkpoint_rows = 0
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(self._audit.information(self._AUDIT_CODE, {"sentRows": num_sent}))
+
+    def _prepare_data_block(self, previous_block, position):
+        """ Fetches and prepares the block of data following previous_block, or following position
+        when there is no previous block. Runs in the pipeline thread.
         Args:
+            previous_block: future of the previous _DataBlock, or None
+            position: last object id already handled, used when previous_block is None
         Returns:
+            _DataBlock
         Raises:
+            any exception raised preparing this block or the previous one
         """
-        SendingProcess._logger.debug("{0} - ".format("send_data"))
-        try:
-            start_time = time.time()
-            elapsed_seconds = 0
+        if previous_block is not None:
+            position = previous_block.result().last_object_id
+
+        data_to_send = self._load_data_into_memory(position)
+        if not data_to_send:
+            return _DataBlock(position, [], position)
+
+        # The position is taken before filtering, the filter may change the ids
+        last_object_id = data_to_send[-1]['id']
+        return _DataBlock(position, self._apply_filter(data_to_send), last_object_id)
+
+    def _send_data_pipelined(self, stream_id):
+        """ Handles the sending of the data for a defined amount of time, fetching and preparing up to
+        pipelineDepth blocks in a separate thread while the current block is being sent.
 
+        A prepared block starts where the previous one ends. The reached position is updated in order,
+        only after a block was sent; if a block is sent only in part, fails or is empty, the blocks
+        prepared after it are discarded and preparation restarts from the position reached.
+        Args:
+            stream_id: managed stream id
+        """
+        SendingProcess._logger.debug("{0} - ".format("_send_data_pipelined"))
+        depth = self._config['pipelineDepth']
+        start_time = time.time()
+        elapsed_seconds = 0
+        pending = collections.deque()
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
             while elapsed_seconds < self._config['duration']:
                 # Terminates the execution in case a signal has been received
                 if SendingProcess._stop_execution:
                     SendingProcess._logger.info("{func} - signal received, stops the execution".format(
-                            func="send_data"))
+                            func="_send_data_pipelined"))
                     break
 
+                data_sent = False
                 try:
-                    data_sent = self._send_data_block(stream_id)
+                    position = self._reached_position(stream_id)
+
+                    # The block to send next, plus up to depth blocks ahead of it
+                    while len(pending) <= depth:
+                        previous_block = pending[-1] if pending else None
+                        pending.append(executor.submit(self._prepare_data_block, previous_block, position))
+
+                    block = pending.popleft().result()
+                    if block.data:
+                        data_sent, new_last_object_id, num_sent = self._plugin.plugin_send(self._plugin_handle,
+                                                                                           block.data, stream_id)
+                        if data_sent:
+                            self._data_block_sent(new_last_object_id, num_sent, stream_id)
+                            if new_last_object_id != block.last_object_id:
+                                # Partially sent, the prepared blocks start at the wrong position
+                                self._discard_data_blocks(pending)
+
+                    if not data_sent:
+                        # Nothing more to send for now, records what was sent before waiting
+                        self._checkpoint(stream_id)
                 except Exception as e:
-                    data_sent = False
                     _message = _MESSAGES_LIST["e000021"].format(e)
                     SendingProcess._logger.error(_message)
 
                 if not data_sent:
-                    SendingProcess._logger.debug("{0} - sleeping".format("send_data"))
+                    self._discard_data_blocks(pending)
+                    SendingProcess._logger.debug("{0} - sleeping".format("_send_data_pipelined"))
                     time.sleep(self._config['sleepInterval'])
 
                 elapsed_seconds = time.time() - start_time
                 SendingProcess._logger.debug("{0} - elapsed_seconds {1}".format(
-                                                            "send_data",
+                                                            "_send_data_pipelined",
                                                             elapsed_seconds))
+        finally:
+            self._discard_data_blocks(pending)
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _discard_data_blocks(pending):
+        """ Discards the blocks being prepared, they are fetched again starting from the reached position """
+        while pending:
+            pending.pop().cancel()
+
+    def _send_data_sequential(self, stream_id):
+        """ Handles the sending of the data for a defined amount of time, one block after the other
+        Args:
+            stream_id: managed stream id
+        """
+        start_time = time.time()
+        elapsed_seconds = 0
+
+        while elapsed_seconds < self._config['duration']:
+            # Terminates the execution in case a signal has been received
+            if SendingProcess._stop_execution:
+                SendingProcess._logger.info("{func} - signal received, stops the execution".format(
+                        func="send_data"))
+                break
+
+            try:
+                data_sent = self._send_data_block(stream_id)
+                if not data_sent:
+                    # Nothing more to send for now, records what was sent before waiting
+                    self._checkpoint(stream_id)
+            except Exception as e:
+                data_sent = False
+                _message = _MESSAGES_LIST["e000021"].format(e)
+                SendingProcess._logger.error(_message)
+
+            if not data_sent:
+                SendingProcess._logger.debug("{0} - sleeping".format("send_data"))
+                time.sleep(self._config['sleepInterval'])
+
+            elapsed_seconds = time.time() - start_time
+            SendingProcess._logger.debug("{0} - elapsed_seconds {1}".format(
+                                                        "send_data",
+                                                        elapsed_seconds))
+
+    def send_data(self, stream_id):
+        """ Handles the sending of the data to the destination using the configured plugin
+            for a defined amount of time
+        Args:
+        Returns:
+        Raises:
+        """
+        SendingProcess._logger.debug("{0} - ".format("send_data"))
+        try:
+            try:
+                if self._config['pipelineDepth'] > 0:
+                    self._send_data_pipelined(stream_id)
+                else:
+                    self._send_data_sequential(stream_id)
+            finally:
+                # Records the blocks sent since the last checkpoint
+                self._checkpoint(stream_id)
         except Exception:
             _message = _MESSAGES_LIST["e000021"].format("")
             SendingProcess._logger.error(_message)
@@ -758,7 +935,9 @@ class SendingProcess:
         try:
             key = 'SENT_' + str(stream_id)
             _stats = Statistics(self._storage)
-            self._event_loop.run_until_complete(_stats.update(key, num_sent))
+            # The key of a stream other than the ones created at installation is registered on first use
+            self._event_loop.run_until_complete(
+                _stats.update_bulk({key: num_sent}, 'The number of readings sent for stream {}'.format(stream_id)))
         except Exception:
             _message = _MESSAGES_LIST["e000010"]
             SendingProcess._logger.error(_message)
@@ -820,6 +999,9 @@ class SendingProcess:
             self._config['source'] = _config_from_manager['source']['value']
             self._config['blockSize'] = int(_config_from_manager['blockSize']['value'])
             self._config['sleepInterval'] = int(_config_from_manager['sleepInterval']['value'])
+            self._config['pipelineDepth'] = int(_config_from_manager['pipelineDepth']['value'])
+            self._config['checkpointInterval'] = int(_config_from_manager['checkpointInterval']['value'])
+            self._config['checkpointMaxRows'] = int(_config_from_manager['checkpointMaxRows']['value'])
             self._config['north'] = _config_from_manager['plugin']['value']
             _config_from_manager['_CONFIG_CATEGORY_NAME'] = config_category_name
             self._config_from_manager = _config_from_manager
@@ -72,8 +72,7 @@ class Purge(FoglampProcess):
 
     def write_statistics(self, total_purged, unsent_purged):
         stats = Statistics(self._storage)
-        self.loop.run_until_complete(stats.update('PURGED', total_purged))
-        self.loop.run_until_complete(stats.update('UNSNPURGED', unsent_purged))
+        self.loop.run_until_complete(stats.update_bulk({'PURGED': total_purged, 'UNSNPURGED': unsent_purged}))
 
     def set_configuration(self):
         """" set the default configuration for purge
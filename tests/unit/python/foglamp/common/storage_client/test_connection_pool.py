@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test foglamp/common/storage_client/connection_pool.py """
+
+import http.client
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+from aiohttp.test_utils import unused_port
+
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
+
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+HOST = '127.0.0.1'
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def _reply(self):
+        self.requests.append(self.command)
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode() if length else None
+        res = json.dumps({"method": self.command, "path": self.path, "body": body}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(res)))
+        self.end_headers()
+        self.wfile.write(res)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    KeepAliveHandler.requests = []
+    srvr = HTTPServer((HOST, unused_port()), KeepAliveHandler)
+    thread = threading.Thread(target=srvr.serve_forever, daemon=True)
+    thread.start()
+    yield srvr
+    srvr.shutdown()
+    srvr.server_close()
+
+
+def base_url(srvr):
+    return '{}:{}'.format(HOST, srvr.server_address[1])
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("common", "storage_client")
+class TestHTTPConnectionPool:
+
+    def test_for_url_is_shared(self):
+        pool = HTTPConnectionPool.for_url('127.0.0.1:1')
+        assert pool is HTTPConnectionPool.for_url('127.0.0.1:1')
+        assert pool is not HTTPConnectionPool.for_url('127.0.0.1:2')
+
+    def test_request_reuses_connection(self, server):
+        pool = HTTPConnectionPool(base_url(server))
+
+        r, res = pool.request('PUT', '/storage/table/foo/query', body='{"a": 1}')
+        assert 200 == r.status
+        assert {"method": "PUT", "path": "/storage/table/foo/query", "body": '{"a": 1}'} == json.loads(res)
+
+        for _ in range(3):
+            r, res = pool.request('GET', '/storage/table/foo')
+            assert 200 == r.status
+
+        assert 1 == pool.connections_opened
+        assert 3 == pool.connections_reused
+        assert {"connections_opened": 1, "connections_reused": 3, "connections_evicted": 0,
+                "idle_connections": 1} == pool.stats()
+        pool.close()
+        assert 0 == pool.stats()["idle_connections"]
+
+    def test_stats_all_and_close_all(self, server):
+        url = base_url(server)
+        pool = HTTPConnectionPool.for_url(url)
+        pool.request('GET', '/')
+        assert 1 == HTTPConnectionPool.stats_all()[url]["idle_connections"]
+        HTTPConnectionPool.close_all()
+        assert {"connections_opened": 1, "connections_reused": 0, "connections_evicted": 0,
+                "idle_connections": 0} == HTTPConnectionPool.stats_all()[url]
+
+    def test_idle_connection_evicted(self, server):
+        pool = HTTPConnectionPool(base_url(server), max_idle_seconds=10)
+        pool.request('GET', '/')
+        with patch('foglamp.common.storage_client.connection_pool.time.time', return_value=2e10):
+            pool.request('GET', '/')
+        assert 2 == pool.connections_opened
+        assert 0 == pool.connections_reused
+        assert 1 == pool.connections_evicted
+        pool.close()
+
+    def test_stale_connection_is_replaced(self, server):
+        pool = HTTPConnectionPool(base_url(server))
+        pool.request('GET', '/')
+
+        # Server drops the kept-alive connection
+        with patch.object(HTTPConnectionPool, '_is_healthy', return_value=True):
+            pool._idle[0][0].sock.shutdown(socket.SHUT_RDWR)
+            r, res = pool.request('POST', '/storage/reading', body='{}')
+        assert 200 == r.status
+        assert 2 == pool.connections_opened
+        assert 1 == pool.connections_evicted
+        pool.close()
+
+    def test_idle_connections_are_bounded(self, server):
+        pool = HTTPConnectionPool(base_url(server), max_idle_connections=1)
+        conn1, _ = pool._acquire()
+        conn2, _ = pool._acquire()
+        pool._release(conn1)
+        pool._release(conn2)
+        assert 1 == pool.stats()["idle_connections"]
+        assert 1 == pool.connections_evicted
+        pool.close()
+
+    @pytest.mark.parametrize("method, retried", [('GET', True), ('POST', False), ('PUT', False)])
+    def test_lost_response_is_retried_for_retryable_methods(self, server, method, retried):
+        pool = HTTPConnectionPool(base_url(server))
+        pool.request('GET', '/')
+        getresponse = http.client.HTTPConnection.getresponse
+        lost = []
+
+        def lose_first_response(conn):
+            if not lost:
+                lost.append(conn)
+                raise http.client.RemoteDisconnected
+            return getresponse(conn)
+
+        with patch.object(http.client.HTTPConnection, 'getresponse', lose_first_response):
+            if retried:
+                r, res = pool.request(method, '/storage/table/foo', body='{}')
+                assert 200 == r.status
+            else:
+                with pytest.raises(http.client.RemoteDisconnected):
+                    pool.request(method, '/storage/table/foo', body='{}')
+        # The request reached the server, and was sent again only when retryable
+        assert ['GET', method] + ([method] if retried else []) == KeepAliveHandler.requests
+        pool.close()
+
+    def test_connections_are_bounded(self, server):
+        pool = HTTPConnectionPool(base_url(server), max_connections=1)
+        pool.request('GET', '/')
+        conn, _ = pool._acquire()
+        done = threading.Event()
+
+        def request():
+            pool.request('GET', '/')
+            done.set()
+
+        threading.Thread(target=request, daemon=True).start()
+        # The request waits for the connection checked out
+        assert not done.wait(.2)
+        pool._release(conn)
+        assert done.wait(5)
+        assert 1 == pool.connections_opened
+        assert 2 == pool.connections_reused
+        pool.close()
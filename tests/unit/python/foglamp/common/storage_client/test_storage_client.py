@@ -15,7 +15,8 @@ from aiohttp.test_utils import unused_port
 from functools import partial
 
 from foglamp.common.service_record import ServiceRecord
-from foglamp.common.storage_client.storage_client import _LOGGER, StorageClient, ReadingsStorageClient
+from foglamp.common.storage_client.storage_client import _LOGGER, StorageClient, ReadingsStorageClient, \
+    ReadingsStorageClientAsync
 from foglamp.common.storage_client.exceptions import *
 
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
@@ -615,6 +616,89 @@ class TestReadingsStorageClient:
 
         await fake_storage_srvr.stop()
 
+    @pytest.mark.asyncio
+    async def test_append_async(self, event_loop):
+        # 'POST', '/storage/reading', readings
+
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+
+        rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord, pool_size=2)
+        assert "{}:{}".format(HOST, PORT) == rsc.base_url
+
+        with pytest.raises(Exception) as excinfo:
+            await rsc.append(None)
+        assert excinfo.type is ValueError
+        assert "Readings payload is missing" in str(excinfo.value)
+
+        with pytest.raises(Exception) as excinfo:
+            await rsc.append("blah")
+        assert excinfo.type is TypeError
+        assert "Readings payload must be a valid JSON" in str(excinfo.value)
+
+        with pytest.raises(Exception) as excinfo:
+            with patch.object(_LOGGER, "error") as log_e:
+                await rsc.append(json.dumps({"Xreadings": []}))
+            log_e.assert_called_once_with("POST url %s with payload: %s, Error code: %d, reason: %s, details: %s",
+                                          '/storage/reading', '{"Xreadings": []}', 400, 'bad data', {"key": "value"})
+        assert excinfo.type is StorageServerError
+
+        # Concurrent appends share the pooled session
+        readings = json.dumps({"readings": []})
+        responses = await asyncio.gather(*[rsc.append(readings) for _ in range(5)])
+        for response in responses:
+            assert {'readings': []} == response['appended']
+        session = rsc._session
+        assert session is not None
+        assert session is rsc._get_session()
+
+        await rsc.close()
+        assert rsc._session is None
+        assert session.closed
+
+        await fake_storage_srvr.stop()
+
+    @pytest.mark.asyncio
+    async def test_append_encoded(self, event_loop):
+        # 'POST', '/storage/reading', readings
+
+        fake_storage_srvr = FakeFoglampStorageSrvr(loop=event_loop)
+        await fake_storage_srvr.start()
+
+        mockServiceRecord = MagicMock(ServiceRecord)
+        mockServiceRecord._address = HOST
+        mockServiceRecord._type = "Storage"
+        mockServiceRecord._port = PORT
+        mockServiceRecord._management_port = 2000
+
+        rsc = ReadingsStorageClientAsync(1, 2, mockServiceRecord)
+
+        with pytest.raises(Exception) as excinfo:
+            await rsc.append_encoded([])
+        assert excinfo.type is ValueError
+        assert "Readings payload is missing" in str(excinfo.value)
+
+        readings = [json.dumps({"asset_code": "MyAsset", "read_key": "5b3be500-ff95-41ae-b5a4-cc99d08bef40",
+                                "reading": {"rate": 18.4}, "user_ts": "2017-09-21 15:00:09.025655"}),
+                    json.dumps({"asset_code": "MyAsset", "read_key": "5b3be500-ff95-41ae-b5a4-cc99d18bef40",
+                                "reading": {"rate": 45.1}, "user_ts": "2017-09-21 15:03:09.025655"})]
+        response = await rsc.append_encoded(readings)
+        assert [json.loads(r) for r in readings] == response['appended']['readings']
+
+        expected_bytes = len('{"readings":[' + ','.join(readings) + ']}')
+        assert 1 == rsc.batches_sent
+        assert expected_bytes == rsc.last_batch_bytes
+        assert expected_bytes == rsc.bytes_sent
+
+        await rsc.close()
+        await fake_storage_srvr.stop()
+
     @pytest.mark.asyncio
     async def test_fetch(self, event_loop):
         # GET, '/storage/reading?id={}&count={}'
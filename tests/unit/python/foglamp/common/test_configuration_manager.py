@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import copy
 import json
 from unittest.mock import MagicMock, patch, call
 import pytest
@@ -832,9 +833,9 @@ class TestConfigurationManager:
         item_name = 'item_name'
         storage_client_mock = MagicMock(spec=StorageClient)
         c_mgr = ConfigurationManager(storage_client_mock)
-        with patch.object(ConfigurationManager, '_read_item_val', return_value=async_mock('bla')) as readpatch:
+        with patch.object(ConfigurationManager, '_read_category_val', return_value=async_mock({item_name: 'bla'})) as readpatch:
             ret_val = await c_mgr.get_category_item(category_name, item_name)
-        readpatch.assert_called_once_with(category_name, item_name)
+        readpatch.assert_called_once_with(category_name)
         assert ret_val == 'bla'
 
     @pytest.mark.asyncio
@@ -847,10 +848,10 @@ class TestConfigurationManager:
         item_name = 'item_name'
         storage_client_mock = MagicMock(spec=StorageClient)
         c_mgr = ConfigurationManager(storage_client_mock)
-        with patch.object(ConfigurationManager, '_read_item_val', side_effect=Exception()) as readpatch:
+        with patch.object(ConfigurationManager, '_read_category_val', side_effect=Exception()) as readpatch:
             with pytest.raises(Exception) as excinfo:
                 ret_val = await c_mgr.get_category_item(category_name, item_name)
-        readpatch.assert_called_once_with(category_name, item_name)
+        readpatch.assert_called_once_with(category_name)
 
     @pytest.mark.asyncio
     async def test_get_category_item_value_entry_good(self, reset_singleton):
@@ -862,9 +863,9 @@ class TestConfigurationManager:
         item_name = 'item_name'
         storage_client_mock = MagicMock(spec=StorageClient)
         c_mgr = ConfigurationManager(storage_client_mock)
-        with patch.object(ConfigurationManager, '_read_value_val', return_value=async_mock('bla')) as readpatch:
+        with patch.object(ConfigurationManager, '_read_category_val', return_value=async_mock({item_name: {'value': 'bla'}})) as readpatch:
             ret_val = await c_mgr.get_category_item_value_entry(category_name, item_name)
-        readpatch.assert_called_once_with(category_name, item_name)
+        readpatch.assert_called_once_with(category_name)
         assert ret_val == 'bla'
 
     @pytest.mark.asyncio
@@ -877,10 +878,124 @@ class TestConfigurationManager:
         item_name = 'item_name'
         storage_client_mock = MagicMock(spec=StorageClient)
         c_mgr = ConfigurationManager(storage_client_mock)
-        with patch.object(ConfigurationManager, '_read_value_val', side_effect=Exception()) as readpatch:
+        with patch.object(ConfigurationManager, '_read_category_val', side_effect=Exception()) as readpatch:
             with pytest.raises(Exception) as excinfo:
                 ret_val = await c_mgr.get_category_item_value_entry(category_name, item_name)
-        readpatch.assert_called_once_with(category_name, item_name)
+        readpatch.assert_called_once_with(category_name)
+
+    @pytest.mark.asyncio
+    async def test_category_cache(self, reset_singleton):
+        category_name = 'catname'
+        category_val = {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a', 'value': 'b'}}
+        storage_client_mock = MagicMock(spec=StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                          return_value={'rows': [{'value': category_val}]}) as query_patch:
+            assert category_val == await c_mgr.get_category_all_items(category_name)
+            assert category_val['item_name'] == await c_mgr.get_category_item(category_name, 'item_name')
+            assert 'b' == await c_mgr.get_category_item_value_entry(category_name, 'item_name')
+            assert await c_mgr.get_category_item(category_name, 'unknown') is None
+
+            # callers get copies of the cached category
+            (await c_mgr.get_category_all_items(category_name))['item_name']['value'] = 'c'
+            assert 'b' == await c_mgr.get_category_item_value_entry(category_name, 'item_name')
+        query_patch.assert_called_once_with('configuration', '{"return": ["value"], "where": {"column": "key", "condition": "=", "value": "catname"}}')
+        assert {"categories": 1, "hits": 5, "misses": 1, "ttl_seconds": 60} == c_mgr.get_cache_stats()
+
+    @pytest.mark.asyncio
+    async def test_category_cache_expires(self, reset_singleton):
+        category_name = 'catname'
+        storage_client_mock = MagicMock(spec=StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                          return_value={'rows': [{'value': {}}]}) as query_patch:
+            with patch('foglamp.common.configuration_manager.time.monotonic', return_value=1000):
+                await c_mgr.get_category_all_items(category_name)
+            with patch('foglamp.common.configuration_manager.time.monotonic', return_value=1059):
+                await c_mgr.get_category_all_items(category_name)
+            assert 1 == query_patch.call_count
+            with patch('foglamp.common.configuration_manager.time.monotonic', return_value=1060):
+                await c_mgr.get_category_all_items(category_name)
+            assert 2 == query_patch.call_count
+            c_mgr.invalidate_cache(category_name)
+            await c_mgr.get_category_all_items(category_name)
+            assert 3 == query_patch.call_count
+
+    @pytest.mark.asyncio
+    async def test_category_cache_missing_category_not_cached(self, reset_singleton):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(storage_client_mock, 'query_tbl_with_payload', return_value={'rows': []}) as query_patch:
+            assert await c_mgr.get_category_all_items('catname') is None
+            assert await c_mgr.get_category_item('catname', 'item_name') is None
+        assert 2 == query_patch.call_count
+        assert 0 == c_mgr.get_cache_stats()['categories']
+
+    @pytest.mark.asyncio
+    async def test_category_cache_invalidated_on_set_and_create(self, reset_singleton):
+        category_name = 'catname'
+        category_val = {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a', 'value': 'b'}}
+        storage_client_mock = MagicMock(spec=StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                          return_value={'rows': [{'value': category_val}]}) as query_patch:
+            await c_mgr.get_category_all_items(category_name)
+        async def read_value_val(category_name, item_name):
+            return category_val[item_name]['value']
+
+        with patch.object(AuditLogger, 'information', side_effect=lambda *args: self._none()):
+            with patch.object(ConfigurationManager, '_read_value_val', side_effect=read_value_val):
+                with patch.object(storage_client_mock, 'update_tbl', return_value={'response': 'updated'}) as update_patch:
+                    await c_mgr.set_category_item_value_entry(category_name, 'item_name', 'c')
+                    update_patch.assert_called_once()
+                    assert 0 == c_mgr.get_cache_stats()['categories']
+
+                    # new item is merged against storage and cached
+                    category_val['item_name']['value'] = 'c'
+                    with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                                      return_value={'rows': [{'value': copy.deepcopy(category_val)}]}):
+                        await c_mgr.create_category(category_name, {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a'},
+                                                                    'item2': {'description': 'desc', 'type': 'string', 'default': 'x'}})
+                    assert 2 == update_patch.call_count
+                    assert {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a', 'value': 'c'},
+                            'item2': {'description': 'desc', 'type': 'string', 'default': 'x', 'value': 'x'}} == await c_mgr.get_category_all_items(category_name)
+        query_patch.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_category_cache_writes_read_storage(self, reset_singleton):
+        """Writes compare with and merge against storage, not a cached category that another process has since changed"""
+        category_name = 'catname'
+        category_val = {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a', 'value': 'b'}}
+        storage_client_mock = MagicMock(spec=StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                          return_value={'rows': [{'value': copy.deepcopy(category_val)}]}):
+            assert 'b' == await c_mgr.get_category_item_value_entry(category_name, 'item_name')
+
+        # another process sets the value and adds an item
+        category_val['item_name']['value'] = 'c'
+        category_val['item2'] = {'description': 'desc', 'type': 'string', 'default': 'x', 'value': 'y'}
+
+        async def read_value_val(category_name, item_name):
+            return category_val[item_name]['value']
+
+        with patch.object(storage_client_mock, 'update_tbl') as update_patch:
+            with patch.object(ConfigurationManager, '_read_value_val', side_effect=read_value_val):
+                await c_mgr.set_category_item_value_entry(category_name, 'item_name', 'c')
+            with patch.object(storage_client_mock, 'query_tbl_with_payload',
+                              return_value={'rows': [{'value': copy.deepcopy(category_val)}]}):
+                await c_mgr.create_category(category_name, {'item_name': {'description': 'desc', 'type': 'string', 'default': 'a'},
+                                                            'item2': {'description': 'desc', 'type': 'string', 'default': 'x'}})
+        update_patch.assert_not_called()
+        assert category_val == await c_mgr.get_category_all_items(category_name)
+
+    @staticmethod
+    async def _none():
+        return None
+
+    @staticmethod
+    async def _async_return(value):
+        return value
 
     @pytest.mark.asyncio
     async def test__create_new_category_good(self, reset_singleton):
@@ -33,10 +33,20 @@ class TestJQFilter:
     ])
     def test_transform(self, input_filter_string, input_reading_block, expected_return):
         jqfilter_instance = JQFilter()
-        with patch.object(pyjq, "all", return_value=expected_return) as mock_pyjq:
-            ret = jqfilter_instance.transform(input_filter_string, input_reading_block)
+        with patch.object(pyjq, "compile") as mock_pyjq:
+            mock_pyjq.return_value.all.return_value = expected_return
+            ret = jqfilter_instance.transform(input_reading_block, input_filter_string)
             assert ret == expected_return
-        mock_pyjq.assert_called_once_with(input_reading_block, input_filter_string)
+        mock_pyjq.assert_called_once_with(input_filter_string)
+        mock_pyjq.return_value.all.assert_called_once_with(input_reading_block)
+
+    def test_transform_compiles_once(self):
+        jqfilter_instance = JQFilter()
+        with patch.object(pyjq, "compile", wraps=pyjq.compile) as mock_pyjq:
+            for i in range(3):
+                assert [[{"a": i}]] == jqfilter_instance.transform([{"a": i, "b": True}], "[.[] | {a}]")
+            assert [[True]] == jqfilter_instance.transform([{"a": 1, "b": True}], "[.[] | .b]")
+        assert 2 == mock_pyjq.call_count
 
     @pytest.mark.parametrize("input_filter_string, input_reading_block, expected_error, expected_log", [
         (".", '{"a" 1}', TypeError, 'Invalid JSON passed, exception %s'),
@@ -44,9 +54,14 @@ class TestJQFilter:
     ])
     def test_transform_exceptions(self, input_filter_string, input_reading_block, expected_error, expected_log):
         jqfilter_instance = JQFilter()
-        with patch.object(pyjq, "all", side_effect=expected_error) as mock_pyjq:
+        with patch.object(pyjq, "compile") as mock_pyjq:
+            # Compilation errors are raised by compile, invalid JSON by all
+            if expected_error is ValueError:
+                mock_pyjq.side_effect = expected_error
+            else:
+                mock_pyjq.return_value.all.side_effect = expected_error
             with patch.object(jqfilter_instance._logger, "error") as log:
                 with pytest.raises(expected_error):
-                    jqfilter_instance.transform(input_filter_string, input_reading_block)
-        mock_pyjq.assert_called_once_with(input_reading_block, input_filter_string)
+                    jqfilter_instance.transform(input_reading_block, input_filter_string)
+        mock_pyjq.assert_called_once_with(input_filter_string)
         log.assert_called_once_with(expected_log, '')
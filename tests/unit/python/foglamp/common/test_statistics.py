@@ -5,6 +5,7 @@
 # FOGLAMP_END
 
 from unittest.mock import MagicMock, patch
+import json
 import pytest
 import asyncio
 
@@ -144,3 +145,78 @@ class TestStatistics:
                 with patch.object(_logger, 'exception') as logger_exception:
                     await s.add_update(stat_dict)
             logger_exception.assert_called_once_with(*msg)
+
+    async def test_update_bulk(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = Statistics(storage_client_mock)
+        s._registered_keys = {'READINGS', 'SINUSOID', 'RANDOM', 'TEMPERATURE', 'DISCARDED'}
+        payload = '{"where": {"column": "key", "condition": "=", "value": "READINGS", ' \
+                  '"or": {"column": "key", "condition": "=", "value": "SINUSOID"}}, ' \
+                  '"expressions": [{"column": "value", "operator": "+", "value": 2}]}'
+        payload2 = '{"where": {"column": "key", "condition": "=", "value": "RANDOM"}, ' \
+                   '"expressions": [{"column": "value", "operator": "+", "value": 1}]}'
+        with patch.object(s._storage, 'update_tbl', return_value={"response": "updated", "rows_affected": 2}) as stat_update:
+            await s.update_bulk({'READINGS': 2, 'SINUSOID': 2, 'RANDOM': 1, 'DISCARDED': 0})
+        assert 2 == stat_update.call_count
+        stat_update.assert_any_call('statistics', payload)
+        stat_update.assert_any_call('statistics', payload2)
+
+    async def test_update_bulk_registers_keys(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = Statistics(storage_client_mock)
+        s._registered_keys = {'READINGS'}
+        payload = '{"previous_value": 0, "value": 3, "key": "SINUSOID", "description": "Readings of SINUSOID"}'
+        with patch.object(s._storage, 'update_tbl', return_value={"response": "updated", "rows_affected": 1}) as stat_update:
+            with patch.object(s._storage, 'insert_into_tbl') as stat_insert:
+                await s.update_bulk({'READINGS': 3, 'SINUSOID': 3}, 'Readings of {}')
+        stat_insert.assert_called_once()
+        args, kwargs = stat_insert.call_args
+        assert 'statistics' == args[0]
+        assert json.loads(payload) == json.loads(args[1])
+        stat_update.assert_called_once()
+        assert 'SINUSOID' in s._registered_keys
+
+        # Registered keys are only updated
+        with patch.object(s._storage, 'update_tbl', return_value={"response": "updated", "rows_affected": 2}) as stat_update:
+            with patch.object(s._storage, 'insert_into_tbl') as stat_insert:
+                await s.update_bulk({'READINGS': 3, 'SINUSOID': 3}, 'Readings of {}')
+        stat_insert.assert_not_called()
+        stat_update.assert_called_once()
+
+    async def test_update_bulk_key_not_in_storage(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = Statistics(storage_client_mock)
+        s._registered_keys = {'READINGS', 'SINUSOID'}
+        with patch.object(s._storage, 'update_tbl', return_value={"response": "updated", "rows_affected": 1}):
+            with patch.object(s._storage, 'query_tbl_with_payload', return_value={'rows': [{'key': 'READINGS'}]}):
+                with patch.object(_logger, 'exception') as logger_exception:
+                    with pytest.raises(KeyError):
+                        await s.update_bulk({'READINGS': 1, 'SINUSOID': 1})
+        logger_exception.assert_called_once_with('Statistics keys %s have not been registered', ['READINGS', 'SINUSOID'])
+
+    async def test_update_bulk_many_keys(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = Statistics(storage_client_mock)
+        keys = ['ASSET{}'.format(i) for i in range(250)]
+        s._registered_keys = set(keys)
+        with patch.object(s._storage, 'update_tbl', return_value={"response": "updated", "rows_affected": 100}) as stat_update:
+            await s.update_bulk({key: 5 for key in keys})
+        assert 3 == stat_update.call_count
+        for args, kwargs in stat_update.call_args_list:
+            assert 5 == json.loads(args[1])['expressions'][0]['value']
+
+    async def test_update_bulk_partial_write(self):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        s = Statistics(storage_client_mock)
+        keys = ['ASSET{}'.format(i) for i in range(150)]
+        s._registered_keys = set(keys)
+        stats_dict = {key: 5 for key in keys}
+        stats_dict['NEW'] = 2
+        with patch.object(s._storage, 'insert_into_tbl'):
+            with patch.object(s._storage, 'update_tbl', side_effect=[{"response": "updated", "rows_affected": 100},
+                                                                     RuntimeError]):
+                with patch.object(_logger, 'exception'):
+                    with pytest.raises(RuntimeError):
+                        await s.update_bulk(stats_dict, 'Readings of {}')
+        # The inserted key and the first chunk were written, the second chunk was not
+        assert {key: 5 for key in keys[100:]} == stats_dict
@@ -98,6 +98,43 @@ class TestPluginsNorthCommon(object):
 
         assert plugin_common.evaluate_type(value) == expected
 
+    @pytest.mark.parametrize("values", [
+        ["10", "-10", "010", "+10", " 10", "1_0", "9007199254740993", "10.5", "up"],
+        ["180.2", "180.", "-1.0", "1e3", "nan", "10", "tock"],
+        ["up", "tock", "nan", "10", "-180.2", ""],
+        [10, -10, 2 ** 53 + 1, 10.0, 180.2, "10", True],
+    ])
+    def test_type_converter(self, values):
+        """ tests that TypeConverter converts values as convert_to_type, whatever the type remembered """
+
+        type_converter = plugin_common.TypeConverter()
+
+        for previous in values:
+            for value in values:
+                type_converter.convert_reading("asset", {"x": previous})
+                converted = type_converter.convert_reading("asset", {"x": value})["x"]
+                expected = plugin_common.convert_to_type(value)
+
+                assert type(expected) is type(converted)
+                assert str(expected) == str(converted)
+
+    def test_type_converter_remembers_types(self):
+        """ tests that the type is evaluated once per asset and field while it does not change """
+
+        type_converter = plugin_common.TypeConverter()
+
+        for value in range(10):
+            reading = type_converter.convert_reading("asset_1", {"x": str(value), "y": "up", "z": "1.5"})
+            assert {"x": value, "y": "up", "z": 1.5} == reading
+
+        assert 3 == type_converter.evaluated
+        assert 27 == type_converter.converted
+
+        # Another asset, then a change of type
+        type_converter.convert_reading("asset_2", {"x": "1"})
+        assert {"x": 2.5} == type_converter.convert_reading("asset_1", {"x": "2.5"})
+        assert 5 == type_converter.evaluated
+
     @pytest.mark.parametrize("value, expected", [
         (
             # Case 1
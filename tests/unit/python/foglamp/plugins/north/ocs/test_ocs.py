@@ -65,6 +65,9 @@ class TestOCS:
                 "OMFMaxRetry": {"value": "100"},
                 "OMFRetrySleepTime": {"value": "100"},
                 "OMFHttpTimeout": {"value": "100"},
+                "OMFTypesBatchSize": {"value": "10"},
+                "OMFTypesMaxWorkers": {"value": "2"},
+                "OMFCompression": {"value": "False"},
                 "StaticData": {
                     "value": json.dumps(
                         {
@@ -274,6 +277,30 @@ class TestOCS:
 
                         assert mocked_deleted_omf_types_already_created.called
 
+    def test_plugin_send_reuses_plugin_object(self):
+        """Tests that the same plugin object sends all the blocks of a plugin handle """
+
+        ocs._logger = MagicMock()
+        ocs._config_omf_types = {"type-id": {"value": "0001"}}
+        data = MagicMock()
+        other_data = MagicMock()
+
+        with patch.object(ocs.OCSNorthPlugin, 'transform_in_memory_data', return_value=(True, 1, 1)):
+            with patch.object(ocs.OCSNorthPlugin, 'create_omf_objects'):
+                with patch.object(ocs.OCSNorthPlugin, 'send_in_memory_data_to_picromf'):
+                    ocs.plugin_send(data, [], 1)
+                    ocs_north = ocs._ocs_north
+                    ocs.plugin_send(data, [], 1)
+                    assert ocs_north is ocs._ocs_north
+
+                    ocs.plugin_send(other_data, [], 1)
+                    assert ocs_north is not ocs._ocs_north
+                    assert other_data is ocs._ocs_north_handle
+
+        ocs.plugin_shutdown([])
+        assert ocs._ocs_north is None
+        assert ocs._ocs_north_handle is None
+
     def test_plugin_shutdown(self):
 
         ocs._logger = MagicMock()
@@ -439,12 +466,12 @@ class TestOCSNorthPlugin:
 
         ]
     )
-    def test_create_omf_type_automatic(self,
-                                       p_test_data,
-                                       p_type_id,
-                                       p_static_data,
-                                       expected_typename,
-                                       expected_omf_type):
+    def test_generate_omf_type_automatic(self,
+                                         p_test_data,
+                                         p_type_id,
+                                         p_static_data,
+                                         expected_typename,
+                                         expected_omf_type):
         """ Tests the generation of the OMF messages starting from Asset name and data
             using Automatic OMF Type Mapping"""
 
@@ -467,13 +494,7 @@ class TestOCSNorthPlugin:
 
         ocs_north._logger = MagicMock(spec=logging)
 
-        with patch.object(ocs_north, 'send_in_memory_data_to_picromf', return_value=True) \
-                as mocked_send_in_memory_data_to_picromf:
-
-            typename, omf_type = ocs_north._create_omf_type_automatic(p_test_data)
+        typename, omf_type = ocs_north._generate_omf_type_automatic(p_test_data)
 
         assert typename == expected_typename
         assert omf_type == expected_omf_type
-
-        assert mocked_send_in_memory_data_to_picromf.called
-        mocked_send_in_memory_data_to_picromf.assert_any_call("Type", expected_omf_type[expected_typename])
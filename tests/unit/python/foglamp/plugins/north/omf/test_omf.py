@@ -12,6 +12,7 @@ __version__ = "${VERSION}"
 
 import pytest
 import json
+import gzip
 import time
 import sys
 import requests
@@ -23,6 +24,7 @@ from foglamp.plugins.north.omf import omf
 import foglamp.tasks.north.sending_process as module_sp
 
 from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.plugins.north.common.exceptions import URLFetchError
 
 
 # noinspection PyPep8Naming
@@ -65,6 +67,9 @@ class TestOMF:
                 "OMFMaxRetry": {"value": "100"},
                 "OMFRetrySleepTime": {"value": "100"},
                 "OMFHttpTimeout": {"value": "100"},
+                "OMFTypesBatchSize": {"value": "10"},
+                "OMFTypesMaxWorkers": {"value": "2"},
+                "OMFCompression": {"value": "true"},
                 "StaticData": {
                     "value": json.dumps(
                         {
@@ -90,6 +95,9 @@ class TestOMF:
         assert config['OMFMaxRetry'] == 100
         assert config['OMFRetrySleepTime'] == 100
         assert config['OMFHttpTimeout'] == 100
+        assert config['OMFTypesBatchSize'] == 10
+        assert config['OMFTypesMaxWorkers'] == 2
+        assert config['OMFCompression'] is True
 
         # Check conversion from String to Dict
         assert isinstance(config['StaticData'], dict)
@@ -229,6 +237,53 @@ class TestOMF:
         omf._logger = MagicMock()
         omf.plugin_reconfigure()
 
+    def test_plugin_send_reuses_plugin_object(self):
+        """Tests that the same plugin object sends all the blocks of a plugin handle """
+
+        omf._logger = MagicMock()
+        omf._config_omf_types = {"type-id": {"value": "0001"}}
+        data = MagicMock()
+        other_data = MagicMock()
+
+        with patch.object(omf.OmfNorthPlugin, 'transform_in_memory_data', return_value=(True, 1, 1)):
+            with patch.object(omf.OmfNorthPlugin, 'create_omf_objects'):
+                with patch.object(omf.OmfNorthPlugin, 'send_in_memory_data_to_picromf'):
+                    omf.plugin_send(data, [], 1)
+                    omf_north = omf._omf_north
+                    omf.plugin_send(data, [], 1)
+                    assert omf_north is omf._omf_north
+
+                    omf.plugin_send(other_data, [], 1)
+                    assert omf_north is not omf._omf_north
+                    assert other_data is omf._omf_north_handle
+
+        omf.plugin_shutdown([])
+        assert omf._omf_north is None
+        assert omf._omf_north_handle is None
+
+    def test_plugin_shutdown_closes_session(self):
+        """ Tests that the HTTP session is shared by the plugin instances until the plugin is shut down """
+
+        omf._logger = MagicMock()
+        session = omf._http_session()
+        assert session is omf.OmfNorthPlugin([], {}, {}, MagicMock())._session
+
+        with patch.object(session, 'close') as patched_close:
+            omf.plugin_shutdown([])
+
+        assert patched_close.called
+        assert omf._http_session() is not session
+
+    @pytest.mark.parametrize("pool_maxsize, expected", [(1, 10), (20, 20)])
+    def test_http_session_pool_size(self, pool_maxsize, expected):
+        """ Tests that the session keeps a connection for each of the threads creating the OMF types """
+
+        omf._close_http_session()
+        session = omf._http_session(pool_maxsize)
+        assert expected == session.get_adapter('http://test_URL')._pool_maxsize
+        assert expected == session.get_adapter('https://test_URL')._pool_maxsize
+        omf._close_http_session()
+
 
 class TestOmfNorthPlugin:
     """Unit tests related to OmfNorthPlugin, methods used internally to the plugin"""
@@ -316,7 +371,7 @@ class TestOmfNorthPlugin:
                                             }
                                         ],
                                         "0001",
-                                        # Transformed
+                                        # Transformed - grouped by container
                                         [
                                             {
                                                 "containerid": "0001measurement_test_asset_code",
@@ -324,12 +379,7 @@ class TestOmfNorthPlugin:
                                                     {
                                                         "Time": "2018-04-20T09:38:50.163164Z",
                                                         "pressure": 957.2
-                                                    }
-                                                ]
-                                            },
-                                            {
-                                                "containerid": "0001measurement_test_asset_code",
-                                                "values": [
+                                                    },
                                                     {
                                                         "Time": "2018-04-20T09:38:50.163164Z",
                                                         "y": 34,
@@ -340,6 +390,55 @@ class TestOmfNorthPlugin:
                                             },
                                         ],
                                         True, 20, 2
+                                ),
+
+                                # Case 4 - 2 assets, interleaved rows, a row having a bad timestamp
+                                (
+                                        # Origin
+                                        [
+                                            {
+                                                "id": 30,
+                                                "asset_code": "asset_1",
+                                                "reading": {"x": 1},
+                                                "user_ts": '2018-04-20 09:38:50.100000+00'
+                                            },
+                                            {
+                                                "id": 31,
+                                                "asset_code": "asset_2",
+                                                "reading": {"x": 2},
+                                                "user_ts": '2018-04-20T09:38:50.200000Z'
+                                            },
+                                            {
+                                                "id": 32,
+                                                "asset_code": "asset_1",
+                                                "reading": {"x": 3},
+                                                "user_ts": '2018-04-20 09:38:50.3+00'
+                                            },
+                                            {
+                                                "id": 33,
+                                                "asset_code": "asset_3",
+                                                "reading": {"x": 4},
+                                                "user_ts": 'bad'
+                                            }
+                                        ],
+                                        "0001",
+                                        # Transformed
+                                        [
+                                            {
+                                                "containerid": "0001measurement_asset_1",
+                                                "values": [
+                                                    {"Time": "2018-04-20T09:38:50.100000Z", "x": 1},
+                                                    {"Time": "2018-04-20T09:38:50.300000Z", "x": 3}
+                                                ]
+                                            },
+                                            {
+                                                "containerid": "0001measurement_asset_2",
+                                                "values": [
+                                                    {"Time": "2018-04-20T09:38:50.200000Z", "x": 2}
+                                                ]
+                                            }
+                                        ],
+                                        True, 32, 3
                                 )
 
         ])
@@ -371,118 +470,6 @@ class TestOmfNorthPlugin:
         assert new_position == expected_new_position
         assert num_sent == expected_num_sent
 
-    @pytest.mark.parametrize(
-        "p_data_origin, "
-        "p_stream_id, "
-        "expected_data_to_send, ",
-        [
-                # Case 1 - Two integer values
-                (
-                    # Origin
-                    {
-                        "id": 10,
-                        "asset_code": "test_asset_code_1",
-                        "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
-                        "reading": {"humidity": 11, "temperature": 38},
-                        "user_ts": '2018-04-20 09:38:50.163164+00'
-                    },
-
-                    # p_stream_id
-                    "0001measurement_""test_asset_code_1",
-
-                    # Expected transformation
-                    [
-                        {
-                            "containerid": "0001measurement_""test_asset_code_1",
-                            "values": [
-                                {
-                                    "Time": "2018-04-20T09:38:50.163164Z",
-                                    "humidity": 11,
-                                    "temperature": 38
-                                }
-                            ]
-                        }
-                    ]
-                ),
-                # Case 2 - String
-                (
-                    # Origin
-                    {
-                        "id": 11,
-                        "asset_code": "test_asset_code_2",
-                        "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
-                        "reading": {"tick": "tock"},
-                        "user_ts": '2018-04-20 09:38:50.163164+00'
-                    },
-
-                    # p_stream_id
-                    "0001measurement_""test_asset_code_2",
-
-                    # Expected transformation
-                    [
-                        {
-                            "containerid": "0001measurement_""test_asset_code_2",
-                            "values": [
-                                {
-                                    "Time": "2018-04-20T09:38:50.163164Z",
-                                    "tick": "tock"
-                                }
-                            ]
-                        }
-                    ]
-                ),
-
-                # Case 3 - Number 957.2
-                (
-                    # Origin
-                    {
-                        "id": 12,
-                        "asset_code": "test_asset_code_3",
-                        "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
-                        "reading": {"pressure": 957.2},
-                        "user_ts": '2018-04-20 09:38:50.163164+00'
-                    },
-
-                    # p_stream_id
-                    "0001measurement_""test_asset_code_3",
-
-                    # Expected transformation
-                    [
-
-                        {
-                            "containerid": "0001measurement_""test_asset_code_3",
-                            "values": [
-                                {
-                                    "Time": "2018-04-20T09:38:50.163164Z",
-                                    "pressure": 957.2
-                                }
-                            ]
-                        }
-                    ]
-                )
-
-        ]
-    )
-    def test_transform_in_memory_row(
-                                        self,
-                                        p_data_origin,
-                                        p_stream_id,
-                                        expected_data_to_send
-    ):
-        """Tests the in memory transformations of a single row - _transform_in_memory_row"""
-
-        sending_process_instance = []
-        config = []
-        config_omf_types = []
-        logger = MagicMock()
-        generated_data_to_send = []
-
-        omf_north = omf.OmfNorthPlugin(sending_process_instance, config, config_omf_types, logger)
-
-        omf_north._transform_in_memory_row(generated_data_to_send, p_data_origin, p_stream_id)
-
-        assert generated_data_to_send == expected_data_to_send
-
     @pytest.mark.parametrize(
         "p_creation_type, "
         "p_data_origin, "
@@ -560,19 +547,26 @@ class TestOmfNorthPlugin:
 
         omf_north._config_omf_types = {"type-id": {"value": type_id}}
         omf_north._config_omf_types = p_omf_objects_configuration_based
+        omf_north._config = {"OMFTypesBatchSize": 50, "OMFTypesMaxWorkers": 4}
 
-        with patch.object(omf_north, '_retrieve_omf_types_already_created', return_value=p_asset_codes_already_created):
+        omf_type = ("test_typename", {"test_typename": [{"id": "static"}, {"id": "dynamic"}]})
 
-            with patch.object(omf_north, '_create_omf_objects_configuration_based') \
+        with patch.object(omf_north, '_omf_types_already_created', return_value=set(p_asset_codes_already_created)):
+
+            with patch.object(omf_north, '_generate_omf_type_configuration_based', return_value=omf_type) \
                     as patched_create_omf_objects_configuration_based:
 
-                with patch.object(omf_north, '_create_omf_objects_automatic') \
+                with patch.object(omf_north, '_generate_omf_type_automatic', return_value=omf_type) \
                         as patched_create_omf_objects_automatic:
 
-                    with patch.object(omf_north, '_flag_created_omf_type') \
-                            as patched_flag_created_omf_type:
+                    with patch.object(omf_north, '_generate_omf_object_links', return_value=([], [], [])):
+
+                        with patch.object(omf_north, 'send_in_memory_data_to_picromf') as patched_send_to_picromf:
+
+                            with patch.object(omf_north, '_flag_created_omf_type') \
+                                    as patched_flag_created_omf_type:
 
-                        omf_north.create_omf_objects(p_data_origin, config_category_name, type_id)
+                                omf_north.create_omf_objects(p_data_origin, config_category_name, type_id)
 
         if p_creation_type == "automatic":
 
@@ -589,6 +583,90 @@ class TestOmfNorthPlugin:
         else:
             raise Exception("ERROR : creation type not defined !")
 
+        patched_send_to_picromf.assert_any_call("Type", [{"id": "static"}, {"id": "dynamic"}])
+
+    def test_create_omf_objects_batches(self):
+        """ Tests that new assets are created in batches, one OMF message of each kind per batch,
+            and that assets already created are skipped """
+
+        sending_process_instance = MagicMock()
+        logger = MagicMock()
+
+        config_category_name = "SEND_PR"
+        type_id = "0001"
+
+        omf_north = omf.OmfNorthPlugin(sending_process_instance, {}, {}, logger)
+        omf_north._config_omf_types = {"type-id": {"value": type_id}}
+        omf_north._config = {"StaticData": {"Location": "Palo Alto"}, "OMFTypesBatchSize": 2, "OMFTypesMaxWorkers": 2}
+
+        raw_data = [{"id": row_id,
+                     "asset_code": "asset_{}".format(row_id % 6),
+                     "reading": {"value": row_id},
+                     "user_ts": '2018-04-20 09:38:50.163164+00'} for row_id in range(20)]
+
+        with patch.object(omf_north, '_omf_types_already_created', return_value={"asset_0"}):
+            with patch.object(omf_north, 'send_in_memory_data_to_picromf') as patched_send_to_picromf:
+                with patch.object(omf_north, '_flag_created_omf_type') as patched_flag_created_omf_type:
+                    omf_north.create_omf_objects(raw_data, config_category_name, type_id)
+
+        # 5 new assets in 3 batches, 4 messages per batch
+        assert 12 == patched_send_to_picromf.call_count
+        types = [c[0][1] for c in patched_send_to_picromf.call_args_list if c[0][0] == "Type"]
+        assert [4, 4, 2] == sorted((len(t) for t in types), reverse=True)
+        containers = [c[0][1] for c in patched_send_to_picromf.call_args_list if c[0][0] == "Container"]
+        assert {"0001measurement_asset_{}".format(i) for i in range(1, 6)} == \
+            {container["id"] for batch in containers for container in batch}
+
+        assert {"asset_{}".format(i) for i in range(1, 6)} == \
+            {c[0][2] for c in patched_flag_created_omf_type.call_args_list}
+
+    def test_create_omf_objects_batch_error(self):
+        """ Tests that a failed batch is not flagged as created and its error is raised """
+
+        omf_north = omf.OmfNorthPlugin(MagicMock(), {}, {}, MagicMock())
+        omf_north._config_omf_types = {"type-id": {"value": "0001"}}
+        omf_north._config = {"StaticData": {}, "OMFTypesBatchSize": 1, "OMFTypesMaxWorkers": 2}
+
+        raw_data = [{"id": 1, "asset_code": "good", "reading": {"value": 1}},
+                    {"id": 2, "asset_code": "bad", "reading": {"value": 1}}]
+
+        def send_in_memory_data_to_picromf(message_type, omf_data):
+            if message_type == "Type" and omf_data[0]["id"] == "0001_bad_typename_sensor":
+                raise URLFetchError("error")
+
+        with patch.object(omf_north, '_omf_types_already_created', return_value=set()):
+            with patch.object(omf_north, 'send_in_memory_data_to_picromf', side_effect=send_in_memory_data_to_picromf):
+                with patch.object(omf_north, '_flag_created_omf_type') as patched_flag_created_omf_type:
+                    with pytest.raises(URLFetchError):
+                        omf_north.create_omf_objects(raw_data, "SEND_PR", "0001")
+
+        patched_flag_created_omf_type.assert_called_once_with("SEND_PR", "0001", "good")
+
+    def test_omf_types_already_created_cache(self):
+        """ Tests that the OMF types already created are retrieved from the Storage layer once,
+            then kept updated in memory """
+
+        omf_north = omf.OmfNorthPlugin(MagicMock(), {}, {}, MagicMock())
+        omf_north._sending_process_instance._storage = MagicMock(spec=StorageClient)
+
+        with patch.dict(omf._omf_types_created, clear=True):
+            with patch.object(omf_north, '_retrieve_omf_types_already_created',
+                              return_value=["asset_code_1"]) as patched_retrieve:
+                assert {"asset_code_1"} == omf_north._omf_types_already_created("SEND_PR", "0001")
+
+                omf_north._flag_created_omf_type("SEND_PR", "0001", "asset_code_2")
+                assert {"asset_code_1", "asset_code_2"} == omf_north._omf_types_already_created("SEND_PR", "0001")
+                assert 1 == patched_retrieve.call_count
+
+                # Another plugin instance of the same process shares the cache
+                other = omf.OmfNorthPlugin(omf_north._sending_process_instance, {}, {}, MagicMock())
+                assert {"asset_code_1", "asset_code_2"} == other._omf_types_already_created("SEND_PR", "0001")
+                assert 1 == patched_retrieve.call_count
+
+                omf_north.deleted_omf_types_already_created("SEND_PR", "0001")
+                omf_north._omf_types_already_created("SEND_PR", "0001")
+                assert 2 == patched_retrieve.call_count
+
     @pytest.mark.parametrize(
         "p_test_data, "
         "p_type_id, "
@@ -725,12 +803,12 @@ class TestOmfNorthPlugin:
 
         ]
     )
-    def test_create_omf_type_automatic(self,
-                                       p_test_data,
-                                       p_type_id,
-                                       p_static_data,
-                                       expected_typename,
-                                       expected_omf_type):
+    def test_generate_omf_type_automatic(self,
+                                         p_test_data,
+                                         p_type_id,
+                                         p_static_data,
+                                         expected_typename,
+                                         expected_omf_type):
         """ Tests the generation of the OMF messages starting from Asset name and data
             using Automatic OMF Type Mapping"""
 
@@ -745,16 +823,11 @@ class TestOmfNorthPlugin:
         omf_north._config_omf_types = {"type-id": {"value": type_id}}
         omf_north._config = {"StaticData": p_static_data}
 
-        with patch.object(omf_north, 'send_in_memory_data_to_picromf', return_value=True) \
-                as patched_send_in_memory_data_to_picromf:
-
-            typename, omf_type = omf_north._create_omf_type_automatic(p_test_data)
+        typename, omf_type = omf_north._generate_omf_type_automatic(p_test_data)
 
         assert typename == expected_typename
         assert omf_type == expected_omf_type
 
-        assert patched_send_in_memory_data_to_picromf.called
-
     @pytest.mark.parametrize(
         "p_test_data ",
         [
@@ -787,6 +860,7 @@ class TestOmfNorthPlugin:
         omf_north._config["URL"] = "dummy_URL"
         omf_north._config["OMFRetrySleepTime"] = 1
         omf_north._config["OMFHttpTimeout"] = 1
+        omf_north._config["OMFCompression"] = False
 
         # Good Case
         omf_north._config["OMFMaxRetry"] = 1
@@ -798,7 +872,7 @@ class TestOmfNorthPlugin:
         with patch.object(omf_north._logger, 'warning', return_value=True) \
                 as patched_logger:
 
-            with patch.object(requests, 'post', return_value=response_ok) \
+            with patch.object(omf_north._session, 'post', return_value=response_ok) \
                     as patched_requests:
 
                 omf_north.send_in_memory_data_to_picromf("Type", p_test_data)
@@ -844,6 +918,7 @@ class TestOmfNorthPlugin:
         omf_north._config["URL"] = "dummy_URL"
         omf_north._config["OMFRetrySleepTime"] = 1
         omf_north._config["OMFHttpTimeout"] = 1
+        omf_north._config["OMFCompression"] = False
 
         # Bad Case
         omf_north._config["OMFMaxRetry"] = 3
@@ -857,7 +932,7 @@ class TestOmfNorthPlugin:
 
             with patch.object(omf_north._logger, 'warning', return_value=True) as patched_logger:
 
-                with patch.object(requests, 'post', return_value=response_ok) as patched_requests:
+                with patch.object(omf_north._session, 'post', return_value=response_ok) as patched_requests:
 
                     # Tests the raising of the exception
                     with pytest.raises(Exception):
@@ -939,6 +1014,7 @@ class TestOmfNorthPlugin:
         omf_north._config["OMFRetrySleepTime"] = 1
         omf_north._config["OMFHttpTimeout"] = test_omf_http_timeout
         omf_north._config["OMFMaxRetry"] = 1
+        omf_north._config["OMFCompression"] = False
 
         response_ok = Response()
         response_ok.status_code = 200
@@ -949,7 +1025,7 @@ class TestOmfNorthPlugin:
 
             with patch.object(omf_north._logger, 'warning', return_value=True) as patched_logger:
 
-                with patch.object(requests, 'post', return_value=response_ok) as patched_requests:
+                with patch.object(omf_north._session, 'post', return_value=response_ok) as patched_requests:
 
                     # To ignore messages sent to the stderr
                     sys.stderr = to_dev_null()
@@ -1061,7 +1137,7 @@ class TestOmfNorthPlugin:
 
         ]
     )
-    def test_create_omf_object_links(
+    def test_generate_omf_object_links(
                                         self,
                                         p_asset,
                                         p_type_id,
@@ -1084,16 +1160,12 @@ class TestOmfNorthPlugin:
         omf_north._config_omf_types = {"type-id": {"value": type_id}}
         omf_north._config = {"StaticData": p_static_data}
 
-        with patch.object(omf_north, 'send_in_memory_data_to_picromf', return_value=True) \
-                as patched_send_to_picromf:
-
-            omf_north._create_omf_object_links(p_asset["asset_code"], p_typename, p_omf_type)
+        containers, static_data, link_data = \
+            omf_north._generate_omf_object_links(p_asset["asset_code"], p_typename, p_omf_type)
 
-        assert patched_send_to_picromf.call_count == 3
-
-        patched_send_to_picromf.assert_any_call("Container", expected_container)
-        patched_send_to_picromf.assert_any_call("Data", expected_static_data)
-        patched_send_to_picromf.assert_any_call("Data", expected_link_data)
+        assert containers == expected_container
+        assert static_data == expected_static_data
+        assert link_data == expected_link_data
 
     @pytest.mark.parametrize(
         "p_configuration_key, "
@@ -1166,6 +1238,22 @@ class TestOmfNorthPlugin:
 
         assert retrieved_rows == expected_data
 
+    def test_generated_ids_memoized(self):
+        """Tests that measurement ids and typenames are generated once per asset code """
+
+        omf_north = omf.OmfNorthPlugin([], {}, {}, MagicMock())
+        omf_north._config_omf_types = {"type-id": {"value": "0001"}}
+
+        assert "0001measurement_asset1" == omf_north._generate_omf_measurement("asset 1")
+        assert "asset1_typename" == omf_north._generate_omf_typename_automatic("asset 1")
+
+        # Memoized values are returned even if the type-id changes
+        omf_north._config_omf_types = {"type-id": {"value": "0002"}}
+        assert "0001measurement_asset1" == omf_north._generate_omf_measurement("asset 1")
+        assert "0002measurement_asset2" == omf_north._generate_omf_measurement("asset2")
+        assert {"asset 1", "asset2"} == set(omf_north._measurement_ids)
+        assert {"asset 1"} == set(omf_north._typenames)
+
     @pytest.mark.parametrize(
         "p_asset_code, "
         "expected_asset_code, ",
@@ -1343,7 +1431,7 @@ class TestOmfNorthPlugin:
             )
         ]
     )
-    def test_create_omf_type_configuration_based(
+    def test_generate_omf_type_configuration_based(
             self,
             p_type_id,
             p_asset_code_omf_type,
@@ -1361,15 +1449,12 @@ class TestOmfNorthPlugin:
 
         omf_north._config_omf_types = {"type-id": {"value": p_type_id}}
 
-        with patch.object(omf_north, 'send_in_memory_data_to_picromf', return_value=True) as patched_send_to_picromf:
-            generated_typename, \
-                generated_omf_type = omf_north._create_omf_type_configuration_based(p_asset_code_omf_type)
+        generated_typename, \
+            generated_omf_type = omf_north._generate_omf_type_configuration_based(p_asset_code_omf_type)
 
         assert generated_typename == expected_typename
         assert generated_omf_type == expected_omf_type
 
-        patched_send_to_picromf.assert_any_call("Type", expected_omf_type[expected_typename])
-
     @pytest.mark.parametrize(
         "p_key, "
         "p_value, "
@@ -1437,3 +1522,106 @@ class TestOmfNorthPlugin:
                 omf._validate_configuration_omf_type(data)
 
             assert omf._logger.error.called
+
+    @pytest.mark.parametrize("p_compression", [False, True])
+    def test_send_in_memory_data_to_picromf_compression(self, p_compression):
+        """ Tests the gzip compression of the OMF messages and the message counters """
+
+        class Response:
+            status_code = 204
+            text = ""
+
+        omf_north = omf.OmfNorthPlugin([], {}, {}, MagicMock())
+        omf_north._config = {"producerToken": "test_producerToken",
+                             "URL": "test_URL",
+                             "OMFRetrySleepTime": 1,
+                             "OMFHttpTimeout": 1,
+                             "OMFMaxRetry": 1,
+                             "OMFCompression": p_compression}
+
+        omf_data = [{"containerid": "0001measurement_pressure",
+                     "values": [{"Time": "2018-04-20T09:38:50.163164Z", "pressure": 921.6}] * 50}]
+        str_data = json.dumps(omf_data)
+
+        with patch.dict(omf._message_stats, clear=True):
+            with patch.object(omf_north._session, 'post', return_value=Response()) as patched_post:
+                omf_north.send_in_memory_data_to_picromf("Data", omf_data)
+                omf_north.send_in_memory_data_to_picromf("Data", omf_data)
+
+            stats = dict(omf._message_stats["Data"])
+
+        headers = patched_post.call_args[1]["headers"]
+        data = patched_post.call_args[1]["data"]
+        if p_compression:
+            assert "gzip" == headers["compression"]
+            assert str_data == gzip.decompress(data).decode()
+            assert len(data) < len(str_data)
+        else:
+            assert "compression" not in headers
+            assert str_data == data
+
+        assert 2 == stats["messages"]
+        assert 2 * len(str_data) == stats["bytes"]
+        assert 2 * len(data) == stats["bytes_sent"]
+
+    def test_send_in_memory_data_to_picromf_stats_retry(self):
+        """ The bytes of an OMF message are counted encoded, and its time includes the retries """
+
+        class Response:
+            status_code = 204
+            text = ""
+
+        omf_north = omf.OmfNorthPlugin([], {}, {}, MagicMock())
+        omf_north._config = {"producerToken": "test_producerToken",
+                             "URL": "test_URL",
+                             "OMFRetrySleepTime": 1,
+                             "OMFHttpTimeout": 1,
+                             "OMFMaxRetry": 2,
+                             "OMFCompression": False}
+
+        omf_data = [{"containerid": "0001measurement_pressure",
+                     "values": [{"Time": "2018-04-20T09:38:50.163164Z", "pressure": 921.6}]}]
+        now = [1000.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        with patch.dict(omf._message_stats, clear=True):
+            with patch.object(omf_north._session, 'post', side_effect=[Exception("timeout"), Response()]):
+                with patch.object(omf.time, 'time', side_effect=lambda: now[0]):
+                    with patch.object(omf.time, 'sleep', side_effect=sleep):
+                        omf_north.send_in_memory_data_to_picromf("Data", omf_data)
+
+            stats = dict(omf._message_stats["Data"])
+
+        assert 1 == stats["messages"]
+        assert len(json.dumps(omf_data).encode()) == stats["bytes"]
+        assert stats["bytes"] == stats["bytes_sent"]
+        assert 1000 == stats["milliseconds"]
+
+    def test_transform_in_memory_data_groups_by_container(self):
+        """ The values of the rows of an asset are grouped into one container entry, in their original order """
+
+        omf_north = omf.OmfNorthPlugin([], {}, {}, MagicMock())
+        omf_north._config_omf_types = {"type-id": {"value": "0001"}}
+
+        raw_data = [{"id": row_id,
+                     "asset_code": "asset_{}".format(row_id % 10),
+                     "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
+                     "reading": {"humidity": row_id, "temperature": 38.5},
+                     "user_ts": "2018-04-20 09:38:50.163164+00"} for row_id in range(500)]
+        # One container entry per row, as the rows are transformed one by one
+        rows_to_send = [{"containerid": omf_north._generate_omf_measurement(row["asset_code"]),
+                         "values": [omf_north._transform_in_memory_value(row, row["asset_code"])]}
+                        for row in raw_data]
+
+        data_to_send = []
+        is_data_available, new_position, num_sent = omf_north.transform_in_memory_data(data_to_send, raw_data)
+
+        assert 10 == len(data_to_send)
+        for item in data_to_send:
+            assert item["values"] == [value for row in rows_to_send if row["containerid"] == item["containerid"]
+                                      for value in row["values"]]
+        assert is_data_available is True
+        assert 500 == num_sent
+        assert 499 == new_position
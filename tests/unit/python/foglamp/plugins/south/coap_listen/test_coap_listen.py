@@ -22,6 +22,15 @@ __license__ = "Apache 2.0"
 __version__ = "${VERSION}"
 
 
+async def add_readings(*args, **kwargs):
+    pass
+
+
+def reading(i):
+    return {"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "sensor{}".format(i % 10),
+            "key": None, "readings": {"velocity": i}}
+
+
 _NEW_CONFIG = {
     'plugin': {
         'description': 'Python module name of the plugin to load',
@@ -299,3 +308,52 @@ class TestCoapSouthIngest(object):
                 assert 1 == ingest_discarded.call_count
                 assert 1 == is_ingest_available.call_count
                 assert 1 == log_exception.call_count
+
+    @pytest.mark.asyncio
+    async def test_render_post_batch_ok(self, loop):
+        readings = [reading(i) for i in range(3)]
+        readings[1] = {"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "sensor1", "key": None,
+                       "sensor_values": {"velocity": 1}}
+        with patch.object(Ingest, 'increment_discarded_readings') as ingest_discarded:
+            with patch.object(Ingest, 'add_readings') as ingest_add_readings:
+                with patch.object(Ingest, 'add_readings_batch', side_effect=add_readings) as ingest_add_batch:
+                    with patch.object(Ingest, 'is_available', return_value=True):
+                        request = message.Message(payload=cbor2.dumps(readings), code=numbers.codes.Code.POST)
+                        r = await CoAPIngest.render_post(request)
+                        assert numbers.codes.Code.VALID == r.code
+        assert 0 == ingest_discarded.call_count
+        assert 0 == ingest_add_readings.call_count
+        ingest_add_batch.assert_called_once()
+        assert [{"velocity": 0}, {"velocity": 1}, {"velocity": 2}] == \
+            [r['readings'] for r in ingest_add_batch.call_args[0][0]]
+
+    @pytest.mark.asyncio
+    async def test_render_post_batch_invalid(self, loop):
+        with patch.object(coap_listen._LOGGER, "exception") as log_exception:
+            with patch.object(Ingest, 'increment_discarded_readings') as ingest_discarded:
+                with patch.object(Ingest, 'add_readings_batch', side_effect=TypeError('each reading must be a dictionary')):
+                    with patch.object(Ingest, 'is_available', return_value=True):
+                        request = message.Message(payload=cbor2.dumps([reading(0), 5]), code=numbers.codes.Code.POST)
+                        with pytest.raises(aiocoap.error.BadRequest):
+                            await CoAPIngest.render_post(request)
+            # Ingest counts the readings of a batch it rejects
+            assert 0 == ingest_discarded.call_count
+            assert 1 == log_exception.call_count
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("size", [10, 100, 1000])
+    async def test_render_post_batch_sizes(self, loop, size):
+        """Each message of a batch of readings is handed to Ingest in a single call"""
+        total = 2000
+        payloads = [cbor2.dumps([reading(i) for i in range(j, j + size)]) for j in range(0, total, size)]
+        with patch.object(Ingest, 'add_readings') as ingest_add_readings:
+            with patch.object(Ingest, 'add_readings_batch', side_effect=add_readings) as ingest_add_batch:
+                with patch.object(Ingest, 'is_available', return_value=True):
+                    for payload in payloads:
+                        request = message.Message(payload=payload, code=numbers.codes.Code.POST)
+                        r = await CoAPIngest.render_post(request)
+                        assert numbers.codes.Code.VALID == r.code
+        assert 0 == ingest_add_readings.call_count
+        assert total // size == ingest_add_batch.call_count
+        assert list(range(total)) == [r['readings']['velocity'] for c in ingest_add_batch.call_args_list
+                                      for r in c[0][0]]
@@ -50,6 +50,10 @@ _NEW_CONFIG = {
 }
 
 
+async def add_readings_batch(readings):
+    pass
+
+
 def mock_request(data, loop):
     payload = StreamReader(loop=loop)
     payload.feed_data(data.encode())
@@ -330,6 +334,35 @@ class TestHttpSouthIngest(object):
             assert 1 == ingest_add_readings.call_count
             assert 1 == ingest_is_available.call_count
 
+    @pytest.mark.asyncio
+    async def test_render_post_readings_list_ok(self, loop):
+        data = """[{
+            "timestamp": "2017-01-02T01:02:03.23232Z-05:00",
+            "asset": "sensor1",
+            "key": "80a43623-ebe5-40d6-8d80-3f892da9b3b4",
+            "readings": {"velocity": "500"}
+        }, {
+            "timestamp": "2017-01-02T01:02:04.23232Z-05:00",
+            "asset": "sensor1",
+            "key": "80a43623-ebe5-40d6-8d80-3f892da9b3b5",
+            "readings": {"velocity": "501"}
+        }]"""
+        with patch.object(Ingest, 'increment_discarded_readings', return_value=True) as ingest_discarded:
+            with patch.object(Ingest, 'add_readings_batch', return_value=asyncio.sleep(.1)) as ingest_add_batch:
+                with patch.object(Ingest, 'add_readings') as ingest_add_readings:
+                    with patch.object(Ingest, 'is_available', return_value=True) as ingest_is_available:
+                        request = mock_request(data, loop)
+                        r = await HttpSouthIngest.render_post(request)
+                        retval = json.loads(r.body.decode())
+                        # Assert the POST request response
+                        assert 200 == r.status
+                        assert 'success' == retval['result']
+            assert 0 == ingest_discarded.call_count
+            assert 0 == ingest_add_readings.call_count
+            assert 1 == ingest_add_batch.call_count
+            assert 2 == len(ingest_add_batch.call_args[0][0])
+            assert 1 == ingest_is_available.call_count
+
     @pytest.mark.asyncio
     async def test_render_post_payload_not_dict(self, loop):
         data = "blah"
@@ -407,3 +440,90 @@ class TestHttpSouthIngest(object):
                 assert str(ex).endswith("readings must be a dictionary")
             assert 1 == ingest_discarded.call_count
             assert 1 == ingest_is_available.call_count
+
+    @pytest.mark.asyncio
+    async def test_render_post_stream_ok(self, loop):
+        data = '{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+               '"readings": {"velocity": "500"}}\n' \
+               '\n' \
+               'blah\n' \
+               '{"timestamp": "2017-01-02T01:02:04.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+               '"sensor_values": {"velocity": "501"}}\r\n' \
+               '{"timestamp": "2017-01-02T01:02:05.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+               '"readings": 502}\n' \
+               '{"timestamp": "2017-01-02T01:02:06.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+               '"readings": {"velocity": "503"}}'
+        with patch.object(Ingest, 'increment_discarded_readings') as ingest_discarded:
+            with patch.object(Ingest, 'add_readings_batch', side_effect=add_readings_batch) as ingest_add_batch:
+                with patch.object(Ingest, 'is_available', return_value=True):
+                    with patch.object(http_south._LOGGER, 'warning') as log_warning:
+                        request = mock_request(data, loop)
+                        r = await HttpSouthIngest.render_post_stream(request)
+                        retval = json.loads(r.body.decode())
+        assert 200 == r.status
+        assert {'result': 'success', 'readings': 3, 'discarded': 2} == retval
+        assert 2 == ingest_discarded.call_count
+        # The last reading, which has no newline, is added once the payload ends
+        assert 2 == ingest_add_batch.call_count
+        batches = [c[0][0] for c in ingest_add_batch.call_args_list]
+        assert [[{"velocity": "500"}, {"velocity": "501"}], [{"velocity": "503"}]] == \
+            [[r['readings'] for r in batch] for batch in batches]
+        log_warning.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_render_post_stream_incremental(self, loop):
+        reading = '{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+                  '"readings": {"velocity": "500"}}\n'
+        payload = StreamReader(loop=loop)
+        request = make_mocked_request('POST', '/sensor-reading/stream', protocol=mock.Mock(), payload=payload,
+                                      app=mock.Mock())
+        batches = []
+
+        async def add_readings_batch(batch):
+            batches.append(len(batch))
+
+        with patch.object(Ingest, 'add_readings_batch', side_effect=add_readings_batch):
+            with patch.object(Ingest, 'is_available', return_value=True):
+                with patch.object(http_south, '_STREAM_BATCH_SIZE', 2):
+                    task = asyncio.ensure_future(HttpSouthIngest.render_post_stream(request))
+                    # A reading split across chunks
+                    payload.feed_data((reading * 2 + reading[:20]).encode())
+                    await asyncio.sleep(.01)
+                    assert [2] == batches
+                    payload.feed_data((reading[20:] + reading * 4).encode())
+                    await asyncio.sleep(.01)
+                    assert [2, 2, 2, 1] == batches
+                    payload.feed_eof()
+                    r = await task
+        assert {'result': 'success', 'readings': 7, 'discarded': 0} == json.loads(r.body.decode())
+
+    @pytest.mark.asyncio
+    async def test_render_post_stream_waits_for_ingest(self, loop):
+        data = '{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "sensor1", "key": null, ' \
+               '"readings": {"velocity": "500"}}'
+        with patch.object(http_south, '_BUSY_WAIT_SECONDS', .01):
+            with patch.object(Ingest, 'add_readings_batch', side_effect=add_readings_batch):
+                with patch.object(Ingest, 'is_available', side_effect=[False, False, True, True]) as ingest_is_available:
+                    request = mock_request(data, loop)
+                    r = await HttpSouthIngest.render_post_stream(request)
+                    assert {'result': 'success', 'readings': 1, 'discarded': 0} == json.loads(r.body.decode())
+                    assert 4 == ingest_is_available.call_count
+                    # The body is not read while Ingest has no room
+                    assert request.content.at_eof()
+
+            with patch.object(http_south, '_BUSY_TIMEOUT_SECONDS', .05):
+                with patch.object(Ingest, 'is_available', return_value=False):
+                    request = mock_request(data, loop)
+                    with pytest.raises(aiohttp.web_exceptions.HTTPServiceUnavailable):
+                        await HttpSouthIngest.render_post_stream(request)
+                    assert not request.content.at_eof()
+
+    @pytest.mark.asyncio
+    async def test_render_post_stream_line_too_long(self, loop):
+        with patch.object(http_south, '_STREAM_MAX_LINE_BYTES', 10):
+            with patch.object(Ingest, 'is_available', return_value=True):
+                with patch.object(http_south._LOGGER, 'exception'):
+                    request = mock_request('{"asset": "sensor1"', loop)
+                    with pytest.raises(aiohttp.web_exceptions.HTTPBadRequest) as ex:
+                        await HttpSouthIngest.render_post_stream(request)
+        assert 'A reading is longer than 10 bytes' == ex.value.reason
@@ -85,7 +85,7 @@ class TestFoglampMicroservice:
         with patch.object(asyncio, 'get_event_loop', return_value=loop):
             with patch.object(SilentArgParse, 'silent_arg_parse', side_effect=['corehost', 0, 'sname']):
                 with patch.object(MicroserviceManagementClient, '__init__', return_value=None) as mmc_patch:
-                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value=None):
+                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value={'value': _DEFAULT_CONFIG}):
                         with patch.object(MicroserviceManagementClient, 'get_configuration_category', return_value=_DEFAULT_CONFIG):
                             with patch.object(ReadingsStorageClient, '__init__', return_value=None) as rsc_patch:
                                 with patch.object(StorageClient, '__init__', return_value=None) as sc_patch:
@@ -127,7 +127,7 @@ class TestFoglampMicroservice:
         with patch.object(asyncio, 'get_event_loop', return_value=loop):
             with patch.object(SilentArgParse, 'silent_arg_parse', side_effect=['corehost', 0, 'sname']):
                 with patch.object(MicroserviceManagementClient, '__init__', return_value=None) as mmc_patch:
-                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value=None):
+                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value={'value': _DEFAULT_CONFIG}):
                         with patch.object(MicroserviceManagementClient, 'get_configuration_category', return_value=_DEFAULT_CONFIG):
                             with patch.object(ReadingsStorageClient, '__init__', return_value=None) as rsc_patch:
                                 with patch.object(StorageClient, '__init__', return_value=None) as sc_patch:
@@ -153,7 +153,7 @@ class TestFoglampMicroservice:
         with patch.object(asyncio, 'get_event_loop', return_value=loop):
             with patch.object(SilentArgParse, 'silent_arg_parse', side_effect=['corehost', 0, 'sname']):
                 with patch.object(MicroserviceManagementClient, '__init__', return_value=None) as mmc_patch:
-                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value=None):
+                    with patch.object(MicroserviceManagementClient, 'create_configuration_category', return_value={'value': _DEFAULT_CONFIG}):
                         with patch.object(MicroserviceManagementClient, 'get_configuration_category', return_value=_DEFAULT_CONFIG):
                             with patch.object(ReadingsStorageClient, '__init__', return_value=None) as rsc_patch:
                                 with patch.object(StorageClient, '__init__', return_value=None) as sc_patch:
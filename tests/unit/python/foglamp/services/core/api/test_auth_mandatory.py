@@ -27,6 +27,11 @@ NORMAL_USER_HEADER = {'content-type': 'application/json', 'Authorization': 'norm
 @pytest.allure.story("api", "auth-mandatory")
 class TestAuthMandatory:
 
+    @pytest.fixture(autouse=True)
+    def clear_token_cache(self):
+        # tokens are shared between tests, each test expects its token to be validated
+        User.Objects._tokens.clear()
+
     @pytest.fixture
     def client(self, loop, test_server, test_client):
         app = web.Application(loop=loop,  middlewares=[middleware.auth_middleware])
@@ -6,6 +6,7 @@
 
 
 import json
+import time
 from unittest.mock import MagicMock, patch
 from aiohttp import web
 from aiohttp.web_urldispatcher import PlainResource, DynamicResource
@@ -26,21 +27,24 @@ URLS = ['foglamp/asset',
         '/foglamp/asset/fogbench%2fhumidity/temperature/summary',
         '/foglamp/asset/fogbench%2fhumidity/temperature/series']
 
-PAYLOADS = ['{"aggregate": {"column": "*", "alias": "count", "operation": "count"}, "group": "asset_code"}',
-            '{"return": ["reading", {"format": "YYYY-MM-DD HH24:MI:SS.MS", "column": "user_ts", "alias": "timestamp"}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "limit": 20, "sort": {"column": "timestamp", "direction": "desc"}}',
+# The asset counts of foglamp/asset are tested on their own, as they are refreshed incrementally
+PAYLOADS = ['{"return": ["reading", {"format": "YYYY-MM-DD HH24:MI:SS.MS", "column": "user_ts", "alias": "timestamp"}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "limit": 20, "sort": {"column": "timestamp", "direction": "desc"}}',
             '{"return": [{"format": "YYYY-MM-DD HH24:MI:SS.MS", "column": "user_ts", "alias": "timestamp"}, {"json": {"properties": "temperature", "column": "reading"}, "alias": "temperature"}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "limit": 20, "sort": {"column": "timestamp", "direction": "desc"}}',
             '{"aggregate": [{"operation": "min", "alias": "min", "json": {"properties": "temperature", "column": "reading"}}, {"operation": "max", "alias": "max", "json": {"properties": "temperature", "column": "reading"}}, {"operation": "avg", "alias": "average", "json": {"properties": "temperature", "column": "reading"}}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}}',
             '{"aggregate": [{"operation": "min", "alias": "min", "json": {"properties": "temperature", "column": "reading"}}, {"operation": "max", "alias": "max", "json": {"properties": "temperature", "column": "reading"}}, {"operation": "avg", "alias": "average", "json": {"properties": "temperature", "column": "reading"}}], "where": {"column": "asset_code", "condition": "=", "value": "fogbench/humidity"}, "group": {"format": "YYYY-MM-DD HH24:MI:SS", "column": "user_ts", "alias": "timestamp"}, "limit": 20, "sort": {"column": "timestamp", "direction": "desc"}}'
             ]
-RESULTS = [{'rows': [{'count': 10, 'asset_code': 'TI sensorTag/luxometer'}], 'count': 1},
-           {'rows': [{'reading': {'temperature': 26, 'humidity': 93}, 'timestamp': '2018-02-16 15:08:51.026'}], 'count': 1},
+RESULTS = [{'rows': [{'reading': {'temperature': 26, 'humidity': 93}, 'timestamp': '2018-02-16 15:08:51.026'}], 'count': 1},
            {'rows': [{'temperature': 26, 'timestamp': '2018-02-16 15:08:51.026'}], 'count': 1},
            {'rows': [{'max': '9', 'min': '9', 'average': '9'}], 'count': 1},
            {'rows': [{'average': '26', 'timestamp': '2018-02-16 15:08:51', 'max': '26', 'min': '26'}], 'count': 1}
            ]
 
-FIXTURE_1 = [(url, payload, result) for url, payload, result in zip(URLS, PAYLOADS, RESULTS)]
-FIXTURE_2 = [(url, 400, payload) for url, payload in zip(URLS, PAYLOADS)]
+FIXTURE_1 = [(url, payload, result) for url, payload, result in zip(URLS[1:], PAYLOADS, RESULTS)]
+FIXTURE_2 = [(url, 400, payload) for url, payload in zip(URLS[1:], PAYLOADS)]
+
+PURGED_PAYLOAD = '{"return": ["value"], "where": {"column": "key", "condition": "=", "value": "PURGED"}}'
+COUNTS_PAYLOAD = '{"aggregate": [{"operation": "count", "column": "*", "alias": "count"}, ' \
+                 '{"operation": "max", "column": "id", "alias": "last_id"}], "group": "asset_code"}'
 
 
 @pytest.allure.feature("unit")
@@ -48,6 +52,11 @@ FIXTURE_2 = [(url, 400, payload) for url, payload in zip(URLS, PAYLOADS)]
 class TestBrowserAssets:
     """Browser Assets"""
 
+    @pytest.fixture(autouse=True)
+    def clear_caches(self):
+        browser._asset_counts.update(counts=None, last_id=0, purged=None, refreshed_at=0, recounted_at=0)
+        browser._query_cache.clear()
+
     @pytest.fixture
     async def app(self):
         app = web.Application()
@@ -101,9 +110,6 @@ class TestBrowserAssets:
                 json_response = json.loads(r)
                 if str(request_url).endswith("summary"):
                     assert {'temperature': result['rows'][0]} == json_response
-                elif str(request_url) == 'foglamp/asset':
-                    result['rows'][0]['assetCode'] = result['rows'][0].pop('asset_code')
-                    assert result['rows'] == json_response
                 else:
                     assert result['rows'] == json_response
             # Now we want to check - query_table_patch.assert_called_once_with('readings', payload)
@@ -211,3 +217,93 @@ class TestBrowserAssets:
             args, kwargs = query_table_patch.call_args
             assert json.loads(payload) == json.loads(args[1])
             query_table_patch.assert_called_once_with('readings', args[1])
+
+    async def test_asset_counts(self, client):
+        storage_client_mock = MagicMock(StorageClient)
+        results = [{'rows': [{'value': 0}], 'count': 1},
+                   {'rows': [{'count': 10, 'last_id': 12, 'asset_code': 'TI sensorTag/luxometer'},
+                             {'count': 2, 'last_id': 5, 'asset_code': 'fogbench/humidity'}], 'count': 2}]
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', side_effect=results) as query_table_patch:
+                resp = await client.get('foglamp/asset')
+                assert 200 == resp.status
+                json_response = json.loads(await resp.text())
+                assert [{'count': 10, 'assetCode': 'TI sensorTag/luxometer'},
+                        {'count': 2, 'assetCode': 'fogbench/humidity'}] == \
+                    sorted(json_response, key=lambda r: -r['count'])
+
+                # Served from memory
+                resp = await client.get('foglamp/asset')
+                assert 200 == resp.status
+        assert 2 == query_table_patch.call_count
+        calls = query_table_patch.call_args_list
+        assert 'statistics' == calls[0][0][0]
+        assert json.loads(PURGED_PAYLOAD) == json.loads(calls[0][0][1])
+        assert 'readings' == calls[1][0][0]
+        assert json.loads(COUNTS_PAYLOAD) == json.loads(calls[1][0][1])
+        assert 12 == browser._asset_counts['last_id']
+
+    async def test_asset_counts_incremental(self, client):
+        storage_client_mock = MagicMock(StorageClient)
+        browser._asset_counts.update(counts={'fogbench/humidity': 2}, last_id=5, purged=0, recounted_at=time.time())
+        results = [{'rows': [{'value': 0}], 'count': 1},
+                   {'rows': [{'count': 3, 'last_id': 9, 'asset_code': 'fogbench/humidity'},
+                             {'count': 1, 'last_id': 8, 'asset_code': 'fogbench/pressure'}], 'count': 2}]
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', side_effect=results) as query_table_patch:
+                resp = await client.get('foglamp/asset')
+                assert 200 == resp.status
+                json_response = json.loads(await resp.text())
+        assert [{'count': 5, 'assetCode': 'fogbench/humidity'}, {'count': 1, 'assetCode': 'fogbench/pressure'}] == \
+            sorted(json_response, key=lambda r: -r['count'])
+        # Only the readings added since the last refresh are counted
+        payload = json.loads(query_table_patch.call_args[0][1])
+        assert {"column": "id", "condition": ">", "value": 5} == payload['where']
+        assert 9 == browser._asset_counts['last_id']
+
+    async def test_asset_counts_after_purge(self, client):
+        storage_client_mock = MagicMock(StorageClient)
+        browser._asset_counts.update(counts={'fogbench/humidity': 2}, last_id=5, purged=0, recounted_at=time.time())
+        results = [{'rows': [{'value': 2}], 'count': 1},
+                   {'rows': [{'count': 1, 'last_id': 9, 'asset_code': 'fogbench/pressure'}], 'count': 1}]
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', side_effect=results) as query_table_patch:
+                resp = await client.get('foglamp/asset')
+                assert 200 == resp.status
+                json_response = json.loads(await resp.text())
+        # All readings are counted again
+        assert [{'count': 1, 'assetCode': 'fogbench/pressure'}] == json_response
+        assert json.loads(COUNTS_PAYLOAD) == json.loads(query_table_patch.call_args[0][1])
+        assert 2 == browser._asset_counts['purged']
+
+    async def test_asset_counts_bad_request(self, client):
+        storage_client_mock = MagicMock(StorageClient)
+        result = {'message': 'ERROR: something went wrong', 'retryable': False, 'entryPoint': 'retrieve'}
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', return_value=result):
+                resp = await client.get('foglamp/asset')
+                assert 400 == resp.status
+                assert result['message'] == resp.reason
+        assert browser._asset_counts['counts'] is None
+
+    async def test_summary_cached(self, client):
+        storage_client_mock = MagicMock(StorageClient)
+        result = {'rows': [{'max': '9', 'min': '9', 'average': '9'}], 'count': 1}
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(storage_client_mock, 'query_tbl_with_payload', return_value=result) as query_table_patch:
+                for _ in range(2):
+                    resp = await client.get('/foglamp/asset/fogbench%2fhumidity/temperature/summary')
+                    assert 200 == resp.status
+                    assert {'temperature': result['rows'][0]} == json.loads(await resp.text())
+                assert 1 == query_table_patch.call_count
+
+                # Another query is not served from the cache
+                resp = await client.get('/foglamp/asset/fogbench%2fhumidity/temperature/summary?hours=1')
+                assert 200 == resp.status
+                assert 2 == query_table_patch.call_count
+
+                # Nor is an expired entry
+                with patch.object(browser.time, 'time', return_value=time.time() + 60):
+                    resp = await client.get('/foglamp/asset/fogbench%2fhumidity/temperature/summary')
+                    assert 200 == resp.status
+                assert 3 == query_table_patch.call_count
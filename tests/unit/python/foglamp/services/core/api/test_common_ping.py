@@ -25,6 +25,7 @@ from foglamp.services.core import routes
 from foglamp.services.core import connect
 from foglamp.common.web import middleware
 from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 from foglamp.common.configuration_manager import ConfigurationManager
 
 
@@ -458,3 +459,22 @@ async def test_shutdown_http(test_server, test_client, loop):
     assert "FogLAMP shutdown has been scheduled. Wait for few seconds for process cleanup." == content_dict["message"]
 
 
+@pytest.allure.feature("unit")
+@pytest.allure.story("api", "common")
+async def test_get_storage_connection_stats(test_server, test_client, loop):
+    app = web.Application()
+    # fill route table
+    routes.setup(app)
+
+    server = await test_server(app)
+    server.start_server(loop=loop)
+
+    client = await test_client(server)
+    result = {"0.0.0.0:8080": {"connections_opened": 2, "connections_reused": 10, "connections_evicted": 1,
+                               "idle_connections": 1}}
+    with patch.object(HTTPConnectionPool, 'stats_all', return_value=result) as patch_stats_all:
+        resp = await client.get('/foglamp/cache/storage')
+        assert 200 == resp.status
+        content = await resp.text()
+        assert result == json.loads(content)
+    patch_stats_all.assert_called_once_with()
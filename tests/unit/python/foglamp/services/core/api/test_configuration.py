@@ -413,6 +413,18 @@ class TestConfiguration:
                 # update_tbl_patch.assert_called_once_with('configuration', payload)
             patch_get_all_items.assert_called_once_with(category_name)
 
+    async def test_get_category_cache_stats(self, client):
+        result = {"categories": 2, "hits": 10, "misses": 2, "ttl_seconds": 60}
+        storage_client_mock = MagicMock(StorageClient)
+        c_mgr = ConfigurationManager(storage_client_mock)
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            with patch.object(c_mgr, 'get_cache_stats', return_value=result) as patch_get_cache_stats:
+                resp = await client.get('/foglamp/cache/category')
+                assert 200 == resp.status
+                r = await resp.text()
+                assert result == json.loads(r)
+            patch_get_cache_stats.assert_called_once_with()
+
     async def test_unknown_exception_for_add_config_item(self, client):
         data = {"default": "d", "description": "Test description", "type": "boolean"}
         resp = await client.post('/foglamp/category/{}/{}'.format("blah", "blah"), data=json.dumps(data))
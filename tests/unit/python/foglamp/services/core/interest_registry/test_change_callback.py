@@ -30,9 +30,11 @@ class TestChangeCallback:
         # executed before each test
         InterestRegistrySingleton._shared_state = {}
         del ServiceRegistry._registry[:]
+        cb._notified_categories.clear()
         yield
         InterestRegistrySingleton._shared_state = {}
         del ServiceRegistry._registry[:]
+        cb._notified_categories.clear()
 
     @pytest.mark.asyncio
     async def test_run_good(self, reset_state):
@@ -246,3 +248,82 @@ class TestChangeCallback:
         cm_get_patch.assert_called_once_with('catname1')
         exception_patch.assert_called_once_with('Unable to notify microservice with uuid %s due to exception: %s', s_id_1, '')
         post_patch.assert_has_calls([call('http://saddress1:1/foglamp/change', data='{"category": "catname1", "items": null}', headers={'content-type': 'application/json'})])
+
+    def test_change_payload(self, reset_state):
+        item_a = {"description": "a", "type": "string", "default": "1", "value": "1"}
+        item_b = {"description": "b", "type": "string", "default": "2", "value": "2"}
+        item_b_changed = {"description": "b", "type": "string", "default": "2", "value": "3"}
+
+        # nothing delivered yet, all items
+        assert {"category": "catname1", "items": {"a": item_a, "b": item_b}} == \
+            cb._change_payload('catname1', {"a": item_a, "b": item_b}, None)
+        # only the changed item
+        assert {"category": "catname1", "items": {"b": item_b_changed}, "removed": [], "delta": True} == \
+            cb._change_payload('catname1', {"a": item_a, "b": item_b_changed}, {"a": item_a, "b": item_b})
+        # removed item
+        assert {"category": "catname1", "items": {}, "removed": ["a"], "delta": True} == \
+            cb._change_payload('catname1', {"b": item_b_changed}, {"a": item_a, "b": item_b_changed})
+        # missing category
+        assert {"category": "catname1", "items": None} == cb._change_payload('catname1', None, {"a": item_a})
+
+    @pytest.mark.asyncio
+    async def test_run_delta_per_microservice(self, reset_state):
+        storage_client_mock = MagicMock(spec=StorageClient)
+        cfg_mgr = ConfigurationManager(storage_client_mock)
+
+        s_id_1 = ServiceRegistry.register(
+            'sname1', 'Southbound', 'saddress1', 1, 1, 'http')
+        s_id_2 = ServiceRegistry.register(
+            'sname2', 'Southbound', 'saddress2', 2, 2, 'http')
+        i_reg = InterestRegistry(cfg_mgr)
+        i_reg.register(s_id_1, 'catname1')
+        i_reg.register(s_id_2, 'catname1')
+        item_a = {"description": "a", "type": "string", "default": "1", "value": "1"}
+        item_a_changed = {"description": "a", "type": "string", "default": "1", "value": "2"}
+        item_b = {"description": "b", "type": "string", "default": "2", "value": "2"}
+
+        async def async_mock(return_value):
+            return return_value
+
+        class AsyncSessionContextManagerMock:
+            def __init__(self, status):
+                self._status = status
+
+            async def __aenter__(self):
+                client_response_mock = MagicMock(spec=aiohttp.ClientResponse)
+                client_response_mock.text.side_effect = [async_mock(None)]
+                client_response_mock.status = self._status
+                return client_response_mock
+
+            async def __aexit__(self, *args):
+                return None
+
+        async def notify(category_value, service_2_status):
+            async def get_category_all_items(category_name):
+                return category_value
+
+            def post(url, data, headers):
+                return AsyncSessionContextManagerMock(service_2_status if 'saddress2' in url else 200)
+
+            with patch.object(ConfigurationManager, 'get_category_all_items', side_effect=get_category_all_items):
+                with patch.object(aiohttp.ClientSession, 'post', side_effect=post) as post_patch:
+                    with patch.object(cb._LOGGER, 'error'):
+                        await cb.run('catname1')
+            return {url: json.loads(kwargs['data']) for (url,), kwargs in post_patch.call_args_list}
+
+        # the second microservice fails to apply the first notification
+        sent = await notify({"a": item_a, "b": item_b}, 500)
+        assert {"category": "catname1", "items": {"a": item_a, "b": item_b}} == sent['http://saddress1:1/foglamp/change']
+        assert {"category": "catname1", "items": {"a": item_a, "b": item_b}} == sent['http://saddress2:2/foglamp/change']
+
+        # so it is sent all items again, while the first one is sent the change only
+        sent = await notify({"a": item_a_changed, "b": item_b}, 200)
+        assert {"category": "catname1", "items": {"a": item_a_changed}, "removed": [], "delta": True} == \
+            sent['http://saddress1:1/foglamp/change']
+        assert {"category": "catname1", "items": {"a": item_a_changed, "b": item_b}} == \
+            sent['http://saddress2:2/foglamp/change']
+
+        # once delivered, both are sent the change only
+        sent = await notify({"a": item_a, "b": item_b}, 200)
+        for url in ('http://saddress1:1/foglamp/change', 'http://saddress2:2/foglamp/change'):
+            assert {"category": "catname1", "items": {"a": item_a}, "removed": [], "delta": True} == sent[url]
@@ -8,6 +8,7 @@ from foglamp.services.core.interest_registry.interest_registry import InterestRe
 from foglamp.services.core.interest_registry.interest_registry import InterestRegistrySingleton
 from foglamp.services.core.interest_registry.interest_record import InterestRecord
 from foglamp.services.core.interest_registry import exceptions as interest_registry_exceptions
+import foglamp.services.core.interest_registry.change_callback as cb
 
 __author__ = "Ashwin Gopalakrishnan"
 __copyright__ = "Copyright (c) 2017 OSIsoft, LLC"
@@ -135,6 +136,18 @@ class TestInterestRegistry:
         assert ret_val == id_1_2
         assert len(i_reg._registered_interests) is 0
 
+    def test_unregister_forgets_notified_category(self, reset_singleton):
+        configuration_manager_mock = MagicMock(spec=ConfigurationManager)
+        i_reg = InterestRegistry(configuration_manager_mock)
+        id_1_1 = i_reg.register('muuid1', 'catname1')
+        i_reg.register('muuid2', 'catname1')
+        cb._notified_categories[('catname1', 'muuid1')] = {}
+        cb._notified_categories[('catname1', 'muuid2')] = {}
+
+        i_reg.unregister(id_1_1)
+        assert {('catname1', 'muuid2'): {}} == cb._notified_categories
+        cb._notified_categories.clear()
+
     def test_get(self, reset_singleton):
         configuration_manager_mock = MagicMock(spec=ConfigurationManager)
         i_reg = InterestRegistry(configuration_manager_mock)
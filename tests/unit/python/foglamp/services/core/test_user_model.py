@@ -12,6 +12,7 @@ import pytest
 from foglamp.services.core import connect
 from foglamp.common.storage_client.storage_client import StorageClient
 from foglamp.common.storage_client.exceptions import StorageServerError
+from foglamp.services.core import user_model
 from foglamp.services.core.user_model import User
 from foglamp.common.configuration_manager import ConfigurationManager
 
@@ -439,6 +440,74 @@ class TestUserModel:
     def test_token_expiration(self):
         pass
 
+    def test_authenticate_caches_token(self):
+        user = {'id': '2', 'uname': 'user', 'role_id': '2'}
+        User.Objects._tokens.clear()
+        with patch.object(User.Objects, 'validate_token', return_value='2') as patch_validate_token:
+            with patch.object(User.Objects, 'refresh_token_expiry') as patch_refresh_token:
+                with patch.object(User.Objects, 'get', return_value=user) as patch_user_get:
+                    for _ in range(3):
+                        assert user == User.Objects.authenticate('eyz')
+        patch_validate_token.assert_called_once_with('eyz')
+        patch_refresh_token.assert_called_once_with('eyz')
+        patch_user_get.assert_called_once_with(uid='2')
+
+    def test_authenticate_revalidates_after_ttl(self):
+        user = {'id': '2', 'uname': 'user', 'role_id': '2'}
+        User.Objects._tokens.clear()
+        with patch.object(User.Objects, 'validate_token', return_value='2') as patch_validate_token:
+            with patch.object(User.Objects, 'refresh_token_expiry') as patch_refresh_token:
+                with patch.object(User.Objects, 'get', return_value=user):
+                    with patch('foglamp.services.core.user_model.time.monotonic', return_value=1000):
+                        User.Objects.authenticate('eyz')
+                    # validated again, expiry refresh is not yet due
+                    with patch('foglamp.services.core.user_model.time.monotonic',
+                               return_value=1001 + user_model.TOKEN_CACHE_TTL_SECONDS):
+                        User.Objects.authenticate('eyz')
+                    assert 2 == patch_validate_token.call_count
+                    assert 1 == patch_refresh_token.call_count
+                    # expiry refresh is due, token is still cached
+                    with patch('foglamp.services.core.user_model.time.monotonic',
+                               return_value=1000 + user_model.TOKEN_REFRESH_INTERVAL_SECONDS):
+                        User.Objects.authenticate('eyz')
+                    assert 2 == patch_validate_token.call_count
+                    assert 2 == patch_refresh_token.call_count
+
+    def test_authenticate_invalid_token_is_not_cached(self):
+        User.Objects._tokens.clear()
+        with patch.object(User.Objects, 'validate_token', side_effect=User.InvalidToken) as patch_validate_token:
+            for _ in range(2):
+                with pytest.raises(User.InvalidToken):
+                    User.Objects.authenticate('blah')
+        assert 2 == patch_validate_token.call_count
+        assert 'blah' not in User.Objects._tokens
+
+    def test_authenticate_token_cache_is_bounded(self):
+        User.Objects._tokens.clear()
+        with patch.object(user_model, 'TOKEN_CACHE_MAX_SIZE', 2):
+            with patch.object(User.Objects, 'validate_token', return_value='2'):
+                with patch.object(User.Objects, 'refresh_token_expiry'):
+                    with patch.object(User.Objects, 'get', return_value={'id': '2'}):
+                        for token in ['t1', 't2', 't1', 't3']:
+                            User.Objects.authenticate(token)
+        assert ['t1', 't3'] == list(User.Objects._tokens)
+
+    def test_token_cache_invalidation(self):
+        storage_client_mock = MagicMock(StorageClient)
+        User.Objects._tokens.clear()
+        with patch.object(User.Objects, 'validate_token', side_effect=['2', '2', '3']):
+            with patch.object(User.Objects, 'refresh_token_expiry'):
+                with patch.object(User.Objects, 'get', side_effect=[{'id': 2}, {'id': 2}, {'id': 3}]):
+                    for token in ['t1', 't2', 't3']:
+                        User.Objects.authenticate(token)
+        with patch.object(connect, 'get_storage', return_value=storage_client_mock):
+            User.Objects.delete_token('t1')
+            assert ['t2', 't3'] == list(User.Objects._tokens)
+            User.Objects.delete_user_tokens('2')
+            assert ['t3'] == list(User.Objects._tokens)
+            User.Objects.delete_all_user_tokens()
+            assert 0 == len(User.Objects._tokens)
+
     def test_delete_token(self):
         expected = {'response': 'deleted', 'rows_affected': 1}
         payload = '{"where": {"column": "token", "condition": "=", "value": "eyz"}}'
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/batch_tuner.py """
+
+from unittest.mock import patch
+
+import pytest
+
+from foglamp.services.south.batch_tuner import BatchTuner, _MIN_TIMEOUT_SECONDS, _TUNE_EVERY
+
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def record(tuner, count, batch_size, latency, insert, start=1000.0, interval=0.1):
+    changed = False
+    for i in range(count):
+        with patch('foglamp.services.south.batch_tuner.time.time', return_value=start + i * interval):
+            changed = tuner.record(batch_size, latency, insert)
+    return changed
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "batch_tuner")
+class TestBatchTuner:
+
+    def test_initial_values(self):
+        tuner = BatchTuner(0.5, 100, 1)
+        assert 100 == tuner.batch_size
+        assert 0.5 == tuner.timeout_seconds
+        assert tuner.p99_latency_seconds is None
+
+    def test_tunes_every_few_inserts(self):
+        tuner = BatchTuner(1, 100, 1)
+        assert record(tuner, _TUNE_EVERY - 1, 10, 0.2, 0.01) is False
+        assert tuner.p99_latency_seconds is None
+        assert record(tuner, 1, 10, 0.2, 0.01, start=2000.0) is True
+        assert 0.2 == tuner.p99_latency_seconds
+
+    def test_timeout_halved_when_target_missed(self):
+        tuner = BatchTuner(0.5, 100, 1)
+        record(tuner, _TUNE_EVERY, 10, 2.0, 0.1)
+        assert 0.25 == tuner.timeout_seconds
+
+        for _ in range(20):
+            record(tuner, _TUNE_EVERY, 10, 2.0, 0.1)
+        assert _MIN_TIMEOUT_SECONDS == tuner.timeout_seconds
+
+    def test_timeout_bounded_by_latency_budget(self):
+        # Inserts take 0.3s of the 0.5s target
+        tuner = BatchTuner(0.5, 100, 1)
+        record(tuner, _TUNE_EVERY, 10, 0.4, 0.3)
+        assert 0.2 == pytest.approx(tuner.timeout_seconds)
+
+    def test_batch_size_follows_arrival_rate(self):
+        # 10 readings every 0.1s is 100 readings/s; 0.5s of them is 50
+        tuner = BatchTuner(1, 100, 0.5)
+        record(tuner, _TUNE_EVERY, 10, 0.3, 0.01)
+        assert 100 == pytest.approx(tuner.arrival_rate)
+        assert 50 == tuner.batch_size
+
+        # Never above the configured batch size
+        tuner = BatchTuner(1, 20, 0.5)
+        record(tuner, _TUNE_EVERY, 10, 0.3, 0.01)
+        assert 20 == tuner.batch_size
+
+    def test_stats(self):
+        tuner = BatchTuner(0.5, 100, 1)
+        record(tuner, _TUNE_EVERY, 10, 2.0, 0.1)
+        stats = tuner.stats()
+        assert 500 == stats["target_p99_latency_ms"]
+        assert 250 == stats["flush_timeout_ms"]
+        assert 2000 == stats["p99_latency_ms"]
+        assert 100 == stats["p99_insert_ms"]
+        assert 1 == len(stats["history"])
+        assert {"batch_size", "flush_timeout_ms", "p99_latency_ms", "arrival_rate", "time"} == \
+               set(stats["history"][0].keys())
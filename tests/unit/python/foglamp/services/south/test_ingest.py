@@ -8,10 +8,12 @@
 
 """
 import copy
+import tracemalloc
 import pytest
 from unittest.mock import MagicMock
 from foglamp.services.south.ingest import *
 from foglamp.services.south import ingest
+from foglamp.common.storage_client.storage_client import ReadingsStorageClient
 from foglamp.common.microservice_management_client.microservice_management_client import MicroserviceManagementClient
 
 
@@ -48,19 +50,14 @@ class TestIngest:
         Ingest._readings_stats = 0  # type: int
         Ingest._discarded_readings_stats = 0  # type: int
         Ingest._sensor_stats = {}  # type: dict
+        Ingest._asset_keys = {}
         Ingest._write_statistics_task = None  # type: asyncio.Task
         Ingest._write_statistics_sleep_task = None  # type: asyncio.Task
         Ingest._stop = False
         Ingest._started = False
-        Ingest._readings_lists = None  # type: List
-        Ingest._current_readings_list_index = 0
+        Ingest._readings_queue = None  # type: ReadingsQueue
         Ingest._insert_readings_tasks = None  # type: List[asyncio.Task]
-        Ingest._readings_list_batch_size_reached = None  # type: List[asyncio.Event]
-        Ingest._readings_list_not_empty = None  # type: List[asyncio.Event]
-        Ingest._readings_lists_not_full = None  # type: asyncio.Event
-        Ingest._insert_readings_wait_tasks = None  # type: List[asyncio.Task]
         Ingest._last_insert_time = 0  # type: int
-        Ingest._readings_list_size = 0  # type: int
         Ingest._write_statistics_frequency_seconds = 5
         Ingest._readings_buffer_size = 500
         Ingest._max_concurrent_readings_inserts = 5
@@ -68,6 +65,18 @@ class TestIngest:
         Ingest._readings_insert_batch_timeout_seconds = 1
         Ingest._max_readings_insert_batch_connection_idle_seconds = 60
         Ingest._max_readings_insert_batch_reconnect_wait_seconds = 10
+        Ingest._adaptive_readings_insert_batching = True
+        Ingest._readings_insert_target_latency_ms = 1000
+        Ingest._batch_tuner = None
+        Ingest._spill_enabled = False
+        Ingest._spill_max_size_mb = 100
+        Ingest._spill_journal = None
+        Ingest._spill_journal_not_empty = None
+        Ingest._drain_spill_journal_task = None
+        Ingest._drain_spill_journal_wait_task = None
+        Ingest._spilled_readings_stats = 0
+        Ingest._drained_readings_stats = 0
+        Ingest._spill_drain_rate = 0.0
         Ingest.category = 'South'
         Ingest.default_config = {
             "write_statistics_frequency_seconds": {
@@ -110,6 +119,29 @@ class TestIngest:
                 "type": "integer",
                 "default": str(Ingest._max_readings_insert_batch_reconnect_wait_seconds)
             },
+            "adaptive_readings_insert_batching": {
+                "description": "Whether the batch size and timeout are tuned, up to their configured "
+                               "values, to meet the target readings insert latency",
+                "type": "boolean",
+                "default": str(Ingest._adaptive_readings_insert_batching)
+            },
+            "readings_insert_target_latency_ms": {
+                "description": "The 99th percentile of milliseconds from a reading being received "
+                               "until it is inserted into storage to aim for when adaptive batching is enabled",
+                "type": "integer",
+                "default": str(Ingest._readings_insert_target_latency_ms)
+            },
+            "spill_enabled": {
+                "description": "Whether readings are written to a disk journal when the readings "
+                               "buffer is full or inserts fail, and inserted when storage recovers",
+                "type": "boolean",
+                "default": str(Ingest._spill_enabled)
+            },
+            "spill_max_size_mb": {
+                "description": "The maximum size of the spill journal in megabytes",
+                "type": "integer",
+                "default": str(Ingest._spill_max_size_mb)
+            },
         }
 
     @pytest.mark.asyncio
@@ -118,7 +150,7 @@ class TestIngest:
         Ingest.storage = MagicMock(spec=StorageClient)
         Ingest.readings_storage = MagicMock(spec=ReadingsStorageClient)
         mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
-        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value={"value": get_cat(Ingest.default_config)})
         get_cfg = mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=get_cat(Ingest.default_config))
         Ingest._parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
 
@@ -127,7 +159,7 @@ class TestIngest:
 
         # THEN
         assert 1 == create_cfg.call_count
-        assert 1 == get_cfg.call_count
+        assert 0 == get_cfg.call_count
         new_config = get_cat(Ingest.default_config)
         assert Ingest._write_statistics_frequency_seconds == \
                int(new_config['write_statistics_frequency_seconds']['value'])
@@ -141,7 +173,12 @@ class TestIngest:
                int(new_config['max_readings_insert_batch_connection_idle_seconds']['value'])
         assert Ingest._max_readings_insert_batch_reconnect_wait_seconds == \
                int(new_config['max_readings_insert_batch_reconnect_wait_seconds']['value'])
-        
+        assert Ingest._adaptive_readings_insert_batching is True
+        assert Ingest._readings_insert_target_latency_ms == \
+               int(new_config['readings_insert_target_latency_ms']['value'])
+        assert Ingest._spill_enabled is False
+        assert Ingest._spill_max_size_mb == int(new_config['spill_max_size_mb']['value'])
+
     @pytest.mark.asyncio
     async def test_start(self, mocker):
         # GIVEN
@@ -149,7 +186,7 @@ class TestIngest:
         mocker.patch.object(ReadingsStorageClient, "__init__", return_value=None)
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
-        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value={"value": get_cat(Ingest.default_config)})
         get_cfg = mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=get_cat(Ingest.default_config))
         parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
@@ -160,17 +197,17 @@ class TestIngest:
 
         # THEN
         assert 1 == create_cfg.call_count
-        assert 1 == get_cfg.call_count
+        assert 0 == get_cfg.call_count
         assert Ingest._stop is False
         assert Ingest._started is True
-        assert Ingest._readings_list_size == int(Ingest._readings_buffer_size / (
-            Ingest._max_concurrent_readings_inserts))
+        assert Ingest._readings_buffer_size == Ingest._readings_queue.maxsize
         assert Ingest._last_insert_time is 0
         assert Ingest._max_concurrent_readings_inserts == len(Ingest._insert_readings_tasks)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._insert_readings_wait_tasks)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_list_batch_size_reached)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_list_not_empty)
-        assert Ingest._max_concurrent_readings_inserts == len(Ingest._readings_lists)
+        assert isinstance(Ingest.readings_storage, ReadingsStorageClientAsync)
+        assert Ingest._max_concurrent_readings_inserts == Ingest.readings_storage._pool_size
+        assert isinstance(Ingest._batch_tuner, BatchTuner)
+        assert Ingest._readings_insert_batch_size == Ingest._batch_tuner.batch_size
+        assert Ingest._readings_insert_batch_timeout_seconds == Ingest._batch_tuner.timeout_seconds
         assert 0 == log_warning.call_count
 
     @pytest.mark.asyncio
@@ -180,7 +217,7 @@ class TestIngest:
         mocker.patch.object(ReadingsStorageClient, "__init__", return_value=None)
         log_exception = mocker.patch.object(ingest._LOGGER, "exception")
         mocker.patch.object(MicroserviceManagementClient, "__init__", return_value=None)
-        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value=None)
+        create_cfg = mocker.patch.object(MicroserviceManagementClient, "create_configuration_category", return_value={"value": get_cat(Ingest.default_config)})
         get_cfg = mocker.patch.object(MicroserviceManagementClient, "get_configuration_category", return_value=get_cat(Ingest.default_config))
         parent_service = MagicMock(_core_microservice_management_client=MicroserviceManagementClient())
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
@@ -193,15 +230,11 @@ class TestIngest:
 
         # THEN
         assert 1 == create_cfg.call_count
-        assert 1 == get_cfg.call_count
+        assert 0 == get_cfg.call_count
         assert Ingest._stop is True
         assert Ingest._started is False
-        assert Ingest._insert_readings_wait_tasks is None
         assert Ingest._insert_readings_tasks is None
-        assert Ingest._readings_lists is None
-        assert Ingest._readings_list_batch_size_reached is None
-        assert Ingest._readings_list_not_empty is None
-        assert Ingest._readings_lists_not_full is None
+        assert Ingest._readings_queue is None
         assert 0 == log_exception.call_count
 
     @pytest.mark.asyncio
@@ -227,12 +260,9 @@ class TestIngest:
     async def test_is_available_at_start(self, mocker):
         # GIVEN
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        # Insert one task and leave room for more
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_queue = ReadingsQueue(2)
+        # Insert one reading and leave room for more
+        Ingest._readings_queue.put_nowait(['{}'])
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
@@ -248,11 +278,8 @@ class TestIngest:
     async def test_is_available_at_stop(self, mocker):
         # GIVEN
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_queue = ReadingsQueue(2)
+        Ingest._readings_queue.put_nowait(['{}'])
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         Ingest._stop = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
@@ -266,16 +293,12 @@ class TestIngest:
         assert 0 == log_warning.call_count
 
     @pytest.mark.asyncio
-    async def test_is_available_when_all_lists_full(self, mocker):
+    async def test_is_available_when_buffer_full(self, mocker):
         # GIVEN
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        # Insert two tasks
-        Ingest._readings_lists[0].append(mock_coro())
-        Ingest._readings_lists[0].append(mock_coro())
+        Ingest._readings_queue = ReadingsQueue(2)
+        # Insert two readings
+        Ingest._readings_queue.put_nowait(['{}', '{}'])
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
@@ -304,16 +327,11 @@ class TestIngest:
                 }
         }
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_queue = ReadingsQueue(2)
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
         assert 'PUMP1' not in list(Ingest._sensor_stats.keys())
 
         # WHEN
@@ -323,8 +341,12 @@ class TestIngest:
                                   readings=data['readings'])
 
         # THEN
-        assert 1 == len(Ingest._readings_lists[0])
+        assert 1 == len(Ingest._readings_queue)
         assert 1 == Ingest._sensor_stats['PUMP1']
+        assert {"asset_code": data['asset'],
+                "read_key": str(data['key']),
+                "reading": data['readings'],
+                "user_ts": data['timestamp']} == json.loads(Ingest._readings_queue._items[0])
 
     @pytest.mark.asyncio
     async def test_add_readings_if_stop(self, mocker):
@@ -342,17 +364,12 @@ class TestIngest:
                 }
         }
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_queue = ReadingsQueue(2)
         Ingest._stop = True
         log_warning = mocker.patch.object(ingest._LOGGER, "warning")
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
 
         # WHEN
         await Ingest.add_readings(asset=data['asset'],
@@ -361,7 +378,7 @@ class TestIngest:
                                   readings=data['readings'])
 
         # THEN
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
         assert 1 == log_warning.call_count
         log_warning.assert_called_with('The South server is stopping')
 
@@ -381,16 +398,11 @@ class TestIngest:
                 }
         }
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_queue = ReadingsQueue(2)
         Ingest._started = False
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
 
         # WHEN
         with pytest.raises(RuntimeError):
@@ -400,7 +412,7 @@ class TestIngest:
                                       readings=data['readings'])
 
         # THEN
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
 
     @pytest.mark.asyncio
     async def test_add_readings_incorrect_data_values(self, mocker):
@@ -418,16 +430,11 @@ class TestIngest:
                 }
         }
         Ingest._max_concurrent_readings_inserts = 1
-        Ingest._readings_list_size = 2
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
+        Ingest._readings_queue = ReadingsQueue(2)
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
 
         # WHEN
         # Check for asset None
@@ -464,11 +471,18 @@ class TestIngest:
                                       timestamp=data['timestamp'],
                                       key=data['key'],
                                       readings=123)
+
+        # Check for readings that can not be encoded as JSON
+        with pytest.raises(TypeError):
+            await Ingest.add_readings(asset=data['asset'],
+                                      timestamp=data['timestamp'],
+                                      key=data['key'],
+                                      readings={"velocity": object()})
         # THEN
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
 
     @pytest.mark.asyncio
-    async def test_add_readings_when_one_list_becomes_full(self, mocker):
+    async def test_add_readings_when_buffer_becomes_full(self, mocker):
         # GIVEN
         data = {
                 "timestamp": "2017-01-02T01:02:03.23232Z-05:00",
@@ -482,23 +496,11 @@ class TestIngest:
                     }
                 }
         }
-        Ingest._max_concurrent_readings_inserts = 2
-        Ingest._readings_list_size = 1
-        Ingest._readings_insert_batch_size = 1
-        Ingest._current_readings_list_index = 0
-        Ingest._readings_lists = []
-        Ingest._readings_lists.append([])
-        Ingest._readings_lists.append([])
-        Ingest._readings_list_not_empty = []
-        Ingest._readings_list_not_empty.append(asyncio.Event())
-        Ingest._readings_list_not_empty.append(asyncio.Event())
-        Ingest._readings_list_batch_size_reached = []
-        Ingest._readings_list_batch_size_reached.append(asyncio.Event())
-        Ingest._readings_list_batch_size_reached.append(asyncio.Event())
+        Ingest._readings_queue = ReadingsQueue(1)
         Ingest._started = True
         mocker.patch.object(Ingest, "_write_statistics", return_value=mock_coro())
         mocker.patch.object(Ingest, "_insert_readings", return_value=mock_coro())
-        assert 0 == len(Ingest._readings_lists[0])
+        assert 0 == len(Ingest._readings_queue)
         assert 'PUMP1' not in list(Ingest._sensor_stats.keys())
 
         # WHEN
@@ -506,13 +508,267 @@ class TestIngest:
                                   timestamp=data['timestamp'],
                                   key=data['key'],
                                   readings=data['readings'])
-        # First reading_list is full, so now add to second list
-        await Ingest.add_readings(asset=data['asset'],
-                                  timestamp=data['timestamp'],
-                                  key=data['key'],
-                                  readings=data['readings'])
+        # The buffer is full, so the next reading waits for room
+        waiter = asyncio.ensure_future(Ingest.add_readings(asset=data['asset'],
+                                                           timestamp=data['timestamp'],
+                                                           key=data['key'],
+                                                           readings=data['readings']))
+        await asyncio.sleep(0.1)
+        assert not waiter.done()
+        batch, age = await Ingest._readings_queue.get_batch(1, 1)
+        Ingest._readings_queue.release(len(batch))
+        await waiter
 
         # THEN
-        assert 1 == len(Ingest._readings_lists[0])
-        assert 1 == len(Ingest._readings_lists[1])
+        assert 1 == len(batch)
+        assert 1 == len(Ingest._readings_queue)
         assert 2 == Ingest._sensor_stats['PUMP1']
+
+    @pytest.mark.asyncio
+    async def test_add_readings_caches_asset_keys(self, mocker):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_queue = ReadingsQueue(10)
+        Ingest._readings_insert_batch_size = 10
+        Ingest._started = True
+
+        # WHEN
+        for asset in ['pump1', 'Pump1', 'pump1']:
+            await Ingest.add_readings(asset=asset, timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                      key=uuid.uuid4(), readings={"velocity": 500})
+
+        # THEN
+        assert {'pump1': ('PUMP1', '"pump1"'), 'Pump1': ('PUMP1', '"Pump1"')} == Ingest._asset_keys
+        assert {'PUMP1': 3} == Ingest._sensor_stats
+        assert ['Pump1', 'pump1', 'pump1'] == sorted(json.loads(r)['asset_code'] for r in Ingest._readings_queue._items)
+
+    @pytest.mark.asyncio
+    async def test_buffered_reading_memory(self, mocker):
+        """ A reading buffered as one JSON encoded string takes less memory than as a dict """
+        # GIVEN
+        count = 1000
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_queue = ReadingsQueue(count)
+        Ingest._readings_insert_batch_size = count
+        Ingest._started = True
+        timestamp = '2017-01-02T01:02:03.23232Z-05:00'
+
+        def new_reading():
+            return {"velocity": "500", "temperature": {"value": "32", "unit": "kelvin"}}
+
+        # WHEN
+        tracemalloc.start()
+        buffer = [{'asset_code': 'pump1', 'read_key': str(uuid.uuid4()), 'reading': new_reading(),
+                   'user_ts': timestamp} for _ in range(count)]
+        dict_bytes = tracemalloc.get_traced_memory()[0] / count
+        tracemalloc.stop()
+        del buffer
+
+        tracemalloc.start()
+        for _ in range(count):
+            await Ingest.add_readings(asset='pump1', timestamp=timestamp, key=uuid.uuid4(), readings=new_reading())
+        encoded_bytes = tracemalloc.get_traced_memory()[0] / count
+        tracemalloc.stop()
+
+        # THEN
+        assert count == len(Ingest._readings_queue)
+        assert encoded_bytes < dict_bytes
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_all_ok(self, mocker):
+        # GIVEN
+        readings = [{"timestamp": "2017-01-02T01:02:03.23232Z-05:00",
+                     "asset": "pump{}".format(i % 2),
+                     "key": str(uuid.uuid4()),
+                     "readings": {"velocity": i}} for i in range(5)]
+        Ingest._readings_queue = ReadingsQueue(3)
+        Ingest._started = True
+
+        # WHEN
+        # Three readings fit; the rest wait for room
+        task = asyncio.ensure_future(Ingest.add_readings_batch(readings))
+        await asyncio.sleep(0.1)
+        assert 3 == len(Ingest._readings_queue)
+        assert not task.done()
+        first, age = await Ingest._readings_queue.get_batch(3, 1)
+        Ingest._readings_queue.release(len(first))
+        await task
+        second, age = await Ingest._readings_queue.get_batch(3, 0)
+
+        # THEN
+        assert 2 == len(second)
+        assert {'PUMP0': 3, 'PUMP1': 2} == Ingest._sensor_stats
+        assert [r['readings']['velocity'] for r in readings] == \
+               [json.loads(r)['reading']['velocity'] for r in first + second]
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_incorrect_data_values(self, mocker):
+        # GIVEN
+        readings = [{"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "pump1", "readings": {"velocity": 1}},
+                    {"timestamp": "2017-01-02T01:02:03.23232Z-05:00", "asset": "pump1", "readings": 500}]
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_queue = ReadingsQueue(10)
+        Ingest._started = True
+
+        # WHEN
+        with pytest.raises(TypeError):
+            await Ingest.add_readings_batch(readings)
+        with pytest.raises(KeyError):
+            await Ingest.add_readings_batch([{"asset": "pump1"}])
+        with pytest.raises(TypeError):
+            await Ingest.add_readings_batch("pump1")
+
+        # THEN
+        assert 0 == len(Ingest._readings_queue)
+        assert 4 == Ingest._discarded_readings_stats
+        assert {} == Ingest._sensor_stats
+
+    @pytest.mark.asyncio
+    async def test_add_readings_batch_not_started(self, mocker):
+        Ingest._started = False
+        with pytest.raises(RuntimeError):
+            await Ingest.add_readings_batch([])
+
+    @pytest.mark.asyncio
+    async def test_is_available_when_buffer_full_and_spilling(self, mocker, tmpdir):
+        # GIVEN
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_queue = ReadingsQueue(1)
+        Ingest._readings_queue.put_nowait(['{}'])
+        Ingest._spill_journal = SpillJournal(str(tmpdir.join('south.spill')), 4096)
+        log_warning = mocker.patch.object(ingest._LOGGER, "warning")
+
+        # WHEN
+        retval = Ingest.is_available()
+        Ingest._spill_journal.close()
+
+        # THEN
+        assert retval is True
+        assert 0 == log_warning.call_count
+
+    @pytest.mark.asyncio
+    async def test_add_readings_spills_when_buffer_full(self, mocker, tmpdir):
+        # GIVEN
+        readings = [{"timestamp": "2017-01-02T01:02:03.23232Z-05:00",
+                     "asset": "pump1",
+                     "key": str(uuid.uuid4()),
+                     "readings": {"velocity": i}} for i in range(4)]
+        Ingest._max_concurrent_readings_inserts = 1
+        Ingest._readings_queue = ReadingsQueue(2)
+        Ingest._readings_insert_batch_size = 2
+        Ingest._spill_journal = SpillJournal(str(tmpdir.join('south.spill')), 4096)
+        Ingest._spill_journal_not_empty = asyncio.Event()
+        Ingest._started = True
+
+        # WHEN
+        await Ingest.add_readings_batch(readings[:3])
+        await Ingest.add_readings(**readings[3])
+
+        # THEN
+        assert 2 == len(Ingest._readings_queue)
+        assert 2 == len(Ingest._spill_journal)
+        assert 2 == Ingest._spilled_readings_stats
+        assert Ingest._spill_journal_not_empty.is_set()
+        assert {'PUMP1': 4} == Ingest._sensor_stats
+        assert [2, 3] == [json.loads(r)['reading']['velocity'] for r in Ingest._spill_journal.peek(10)]
+        Ingest._spill_journal.close()
+
+    @pytest.mark.asyncio
+    async def test_drain_spill_journal(self, mocker, tmpdir):
+        # GIVEN
+        Ingest._readings_insert_batch_size = 2
+        Ingest._spill_journal = SpillJournal(str(tmpdir.join('south.spill')), 4096)
+        Ingest._spill_journal_not_empty = asyncio.Event()
+        Ingest.readings_storage = MagicMock(spec=ReadingsStorageClientAsync)
+        Ingest._spill(['{"a": 1}', '{"a": 2}', '{"a": 3}'])
+
+        # WHEN
+        task = asyncio.ensure_future(Ingest._drain_spill_journal())
+        await asyncio.sleep(0.1)
+        Ingest._stop = True
+        Ingest._drain_spill_journal_wait_task.cancel()
+        await task
+
+        # THEN
+        assert 0 == len(Ingest._spill_journal)
+        assert 3 == Ingest._drained_readings_stats
+        assert 3 == Ingest._readings_stats
+        assert [(['{"a": 1}', '{"a": 2}'],), (['{"a": 3}'],)] == \
+               [c[0] for c in Ingest.readings_storage.append_encoded.call_args_list]
+        Ingest.readings_storage.batches_sent = 2
+        Ingest.readings_storage.bytes_sent = 60
+        Ingest.readings_storage.last_batch_bytes = 25
+        batching = Ingest.get_batching()
+        assert {"batches_sent": 2, "bytes_sent": 60, "last_batch_bytes": 25} == batching["storage"]
+        spill = batching["spill"]
+        assert spill["enabled"] is True
+        assert 0 == spill["pending_readings"]
+        assert 3 == spill["spilled_readings"]
+        assert 3 == spill["drained_readings"]
+        assert spill["drain_rate"] > 0
+        Ingest._spill_journal.close()
+
+    @pytest.mark.asyncio
+    async def test_tune_batching(self, mocker):
+        # GIVEN
+        Ingest._batch_tuner = BatchTuner(0.5, 100, 1)
+        log_info = mocker.patch.object(ingest._LOGGER, "info")
+
+        # WHEN
+        for _ in range(10):
+            Ingest._tune_batching(10, 2.0, 0.1)
+
+        # THEN
+        assert Ingest._readings_insert_batch_size == Ingest._batch_tuner.batch_size
+        assert 0.25 == Ingest._readings_insert_batch_timeout_seconds
+        assert 1 == log_info.call_count
+        batching = Ingest.get_batching()
+        assert batching["adaptive"] is True
+        assert 250 == batching["flush_timeout_ms"]
+        assert 1 == len(batching["history"])
+
+    def test_get_batching_not_adaptive(self):
+        Ingest._readings_insert_batch_size = 100
+        Ingest._readings_insert_batch_timeout_seconds = 1
+        assert {"adaptive": False, "batch_size": 100, "flush_timeout_ms": 1000,
+                "spill": {"enabled": False, "pending_readings": 0, "free_bytes": 0, "spilled_readings": 0,
+                          "drained_readings": 0, "drain_rate": 0.0},
+                "storage": {"batches_sent": 0, "bytes_sent": 0, "last_batch_bytes": 0}} == Ingest.get_batching()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("inserters", [1, 5, 20])
+    async def test_insert_readings_inserters(self, mocker, inserters):
+        """ Every reading passed to add_readings is inserted once, in batches of at most the batch size,
+        whatever the number of insert tasks sharing the readings queue
+        """
+        # GIVEN
+        count = 20000
+        Ingest._readings_queue = ReadingsQueue(1000)
+        Ingest._readings_insert_batch_size = 100
+        Ingest._readings_insert_batch_timeout_seconds = 0.01
+        Ingest._started = True
+
+        batches = []
+
+        async def append_encoded(readings):
+            batches.append(readings)
+            await asyncio.sleep(0.001)
+
+        Ingest.readings_storage = MagicMock()
+        Ingest.readings_storage.append_encoded = append_encoded
+        reading = {"velocity": "500", "temperature": {"value": "32", "unit": "kelvin"}}
+
+        # WHEN
+        tasks = [asyncio.ensure_future(Ingest._insert_readings(i)) for i in range(inserters)]
+        for _ in range(count):
+            await Ingest.add_readings(asset='pump1', timestamp='2017-01-02T01:02:03.23232Z-05:00',
+                                      key=uuid.uuid4(), readings=reading)
+        Ingest._stop = True
+        Ingest._readings_queue.close()
+        await asyncio.gather(*tasks)
+
+        # THEN
+        assert count == Ingest._readings_stats
+        assert count == sum(len(batch) for batch in batches)
+        assert max(len(batch) for batch in batches) <= 100
+        assert 0 == len(Ingest._readings_queue)
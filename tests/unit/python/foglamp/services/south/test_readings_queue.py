@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/readings_queue.py """
+
+import asyncio
+
+import pytest
+
+from foglamp.services.south.readings_queue import ReadingsQueue
+
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+def all_tasks():
+    # asyncio.Task.all_tasks was removed in Python 3.9
+    return getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "readings_queue")
+class TestReadingsQueue:
+
+    def test_put_nowait_is_bounded(self):
+        queue = ReadingsQueue(3)
+        assert 2 == queue.put_nowait(['a', 'b'])
+        assert 1 == queue.put_nowait(['c', 'd'])
+        assert queue.full()
+        assert 0 == queue.put_nowait(['e'])
+        assert 3 == len(queue)
+
+    @pytest.mark.asyncio
+    async def test_get_batch_when_batch_size_reached(self):
+        queue = ReadingsQueue(10)
+        getter = asyncio.ensure_future(queue.get_batch(3, 10))
+        queue.put_nowait(['a', 'b'])
+        await asyncio.sleep(0.05)
+        assert not getter.done()
+
+        queue.put_nowait(['c', 'd'])
+        batch, age = await asyncio.wait_for(getter, 1)
+        assert ['a', 'b', 'c'] == batch
+        assert 0 <= age < 1
+        assert ['d'] == list(queue._items)
+
+    @pytest.mark.asyncio
+    async def test_get_batch_on_timeout(self):
+        queue = ReadingsQueue(10)
+        queue.put_nowait(['a'])
+        batch, age = await asyncio.wait_for(queue.get_batch(3, 0.05), 1)
+        assert ['a'] == batch
+        assert age >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_taken_readings_count_until_released(self):
+        queue = ReadingsQueue(2)
+        queue.put_nowait(['a', 'b'])
+        batch, _ = await queue.get_batch(2, 0)
+        assert 0 == len(queue)
+        assert queue.full()
+
+        putter = asyncio.ensure_future(queue.put('c'))
+        await asyncio.sleep(0.05)
+        assert not putter.done()
+
+        queue.release(len(batch))
+        assert await asyncio.wait_for(putter, 1) is True
+        assert ['c'] == list(queue._items)
+
+    @pytest.mark.asyncio
+    async def test_put_many_waits_for_room(self):
+        queue = ReadingsQueue(2)
+        putter = asyncio.ensure_future(queue.put_many(['a', 'b', 'c', 'd', 'e']))
+        taken = []
+        while len(taken) < 5:
+            batch, _ = await asyncio.wait_for(queue.get_batch(2, 0), 1)
+            taken.extend(batch)
+            queue.release(len(batch))
+        assert 5 == await putter
+        assert ['a', 'b', 'c', 'd', 'e'] == taken
+
+    @pytest.mark.asyncio
+    async def test_many_consumers(self):
+        queue = ReadingsQueue(100)
+        getters = [asyncio.ensure_future(queue.get_batch(2, 10)) for _ in range(3)]
+        await asyncio.sleep(0)
+        queue.put_nowait(['a', 'b', 'c', 'd', 'e', 'f'])
+        batches = await asyncio.wait_for(asyncio.gather(*getters), 1)
+        assert ['a', 'b', 'c', 'd', 'e', 'f'] == sorted(r for batch, _ in batches for r in batch)
+        assert not queue._getters
+
+    @pytest.mark.asyncio
+    async def test_close(self):
+        queue = ReadingsQueue(1)
+        getter = asyncio.ensure_future(queue.get_batch(5, 10))
+        queue.put_nowait(['a'])
+        putter = asyncio.ensure_future(queue.put('b'))
+        await asyncio.sleep(0.05)
+
+        queue.close()
+
+        # What is left is flushed without waiting for the batch size
+        batch, _ = await asyncio.wait_for(getter, 1)
+        assert ['a'] == batch
+        assert await asyncio.wait_for(putter, 1) is False
+        assert ([], 0) == await queue.get_batch(5, 10)
+        assert 0 == queue.put_nowait(['c'])
+
+    @pytest.mark.asyncio
+    async def test_waiting_creates_no_tasks(self):
+        queue = ReadingsQueue(10)
+        getter = asyncio.ensure_future(queue.get_batch(3, 10))
+        await asyncio.sleep(0)
+        tasks = len(all_tasks()())
+        for r in ['a', 'b']:
+            queue.put_nowait([r])
+            await asyncio.sleep(0)
+            assert tasks == len(all_tasks()())
+        queue.put_nowait(['c'])
+        assert ['a', 'b', 'c'] == (await getter)[0]
@@ -6,12 +6,16 @@
 
 import asyncio
 import copy
+import json
 import pytest
 import sys
+import threading
+import time
 from unittest.mock import MagicMock, Mock, call
 from foglamp.services.south import server as South
 from foglamp.services.south.server import Server
 from foglamp.common.storage_client.storage_client import StorageClient
+from foglamp.common.storage_client.connection_pool import HTTPConnectionPool
 from foglamp.services.common.microservice import FoglampMicroservice
 from foglamp.services.south.ingest import Ingest
 
@@ -107,7 +111,7 @@ class TestServicesSouthServer:
         south_server._storage = MagicMock(spec=StorageClient)
 
         attrs = {
-                    'create_configuration_category.return_value': None,
+                    'create_configuration_category.return_value': {'value': cat_get()},
                     'get_configuration_category.return_value': cat_get(),
                     'register_interest.return_value': {'id': 1234, 'message': 'all ok'}
         }
@@ -303,6 +307,165 @@ class TestServicesSouthServer:
                  call('Max retries exhausted in starting South plugin: test'), call('Failed to poll for plugin test, retry count: 2')]
         log_exception.assert_has_calls(calls, any_order=True)
 
+    @pytest.mark.asyncio
+    async def test__exec_plugin_poll_in_executor(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        log_warning = mocker.patch.object(South._LOGGER, "warning")
+        poll_threads = []
+
+        def plugin_poll(handle):
+            if poll_threads:
+                raise RuntimeError
+            poll_threads.append(threading.get_ident())
+            # Blocks for four poll intervals
+            time.sleep(.2)
+            return {}
+
+        south_server._plugin = MagicMock()
+        south_server._plugin.plugin_poll.side_effect = plugin_poll
+        south_server._plugin_handles = [{'pollInterval': {'value': '50'}}]
+        South._MAX_RETRY_POLL = 1
+        South._TIME_TO_WAIT_BEFORE_RETRY = .01
+
+        # WHEN
+        task = asyncio.ensure_future(south_server._exec_plugin_poll())
+        ticks = 0
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(.01)
+
+        # THEN
+        # The event loop kept running while the plugin was polled in another thread
+        assert threading.get_ident() != poll_threads[0]
+        assert ticks > 10
+        stats = south_server.get_poll_stats()
+        assert 1 == stats["polls"]
+        assert 1 == stats["overruns"]
+        assert stats["skipped_polls"] >= 3
+        assert stats["p99_poll_ms"] >= 200
+        log_warning.assert_called_once()
+        south_server._poll_executor.shutdown()
+
+    def test_device_configs(self, mocker):
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        south_server._plugin_info = {'mode': 'poll'}
+        config = {'address': {'value': 'A'}, 'pollInterval': {'value': '500'},
+                  'devices': {'value': '[{"address": "B"}, {"address": "C", "pollInterval": 100}]'},
+                  'pollWorkers': {'value': '2'}}
+
+        configs = south_server._device_configs(config)
+
+        assert [config['address']['value'] for config in configs] == ['A', 'B', 'C']
+        assert [config['pollInterval']['value'] for config in configs] == ['500', '500', '100']
+        assert 2 == south_server._poll_workers
+
+        # Only poll plugins poll more than one device
+        south_server._plugin_info = {'mode': 'async'}
+        assert [config] == south_server._device_configs(config)
+
+        south_server._plugin_info = {'mode': 'poll'}
+        with pytest.raises(KeyError):
+            south_server._device_configs(dict(config, devices={'value': [{"port": 1}]}))
+
+    @pytest.mark.asyncio
+    async def test__exec_plugin_poll_devices(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        add_readings = mocker.patch.object(Ingest, 'add_readings', side_effect=lambda **kwargs: false_coro())
+        polling = set()
+        overlapped = []
+
+        def plugin_poll(handle):
+            if handle['polls'] == 2:
+                raise RuntimeError
+            handle['polls'] += 1
+            polling.add(handle['address'])
+            time.sleep(.05)
+            overlapped.append(len(polling))
+            polling.discard(handle['address'])
+            return {'asset': handle['address'], 'timestamp': '2018-01-01 00:00:00', 'key': None, 'readings': {}}
+
+        def plugin_init(config):
+            return {'address': config['address']['value'], 'pollInterval': {'value': '10'}, 'polls': 0}
+
+        south_server._plugin = MagicMock()
+        south_server._plugin.plugin_poll.side_effect = plugin_poll
+        south_server._plugin.plugin_init.side_effect = plugin_init
+        south_server._plugin_info = {'mode': 'poll'}
+        config = {'address': {'value': 'A'}, 'devices': {'value': '[{"address": "B"}, {"address": "C"}]'},
+                  'pollWorkers': {'value': '2'}}
+        South._MAX_RETRY_POLL = 1
+        South._TIME_TO_WAIT_BEFORE_RETRY = .01
+
+        # WHEN
+        await south_server._init_devices(south_server._device_configs(config))
+        await south_server._exec_plugin_poll()
+
+        # THEN
+        assert ['A', 'B', 'C'] == [handle['address'] for handle in south_server._plugin_handles]
+        assert south_server._plugin_handles[0] is south_server._plugin_handle
+        assert 6 == add_readings.call_count
+        # Two devices at most were polled at the same time
+        assert 2 == max(overlapped)
+        stats = south_server.get_poll_stats()
+        assert 6 == stats["polls"]
+        assert 3 == stats["devices"]
+        assert 2 == stats["poll_workers"]
+        log_exception.assert_has_calls([call('Max retries exhausted in starting South plugin: test device {}'.format(i))
+                                        for i in range(3)], any_order=True)
+        south_server._poll_executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_reconfigure_devices(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        reconfigure_threads = set()
+
+        def plugin_reconfigure(handle, config):
+            reconfigure_threads.add(threading.get_ident())
+            return {'address': handle['address'], 'restart': 'no'}
+
+        south_server._plugin = MagicMock()
+        south_server._plugin.plugin_reconfigure.side_effect = plugin_reconfigure
+        south_server._plugin.plugin_init.side_effect = lambda config: {'address': config['address']['value']}
+        south_server._plugin_info = {'mode': 'poll'}
+        south_server._plugin_handles = [{'address': 'A'}, {'address': 'B'}]
+        configs = [{'address': {'value': 'A'}}, {'address': {'value': 'B'}}]
+
+        # WHEN the devices are unchanged, THEN they are reconfigured, off the event loop, in device order
+        assert await south_server._reconfigure_devices(configs) is False
+        assert 2 == south_server._plugin.plugin_reconfigure.call_count
+        assert threading.get_ident() not in reconfigure_threads
+        assert ['A', 'B'] == [handle['address'] for handle in south_server._plugin_handles]
+        south_server._plugin.plugin_shutdown.assert_not_called()
+
+        # WHEN a device is added, THEN every device is started over
+        south_server._plugin_handles = [{'address': 'A'}, {'address': 'B'}]
+        assert await south_server._reconfigure_devices(configs + [{'address': {'value': 'C'}}]) is True
+        south_server._plugin.plugin_shutdown.assert_has_calls([call({'address': 'A'}), call({'address': 'B'})])
+        assert [{'address': 'A'}, {'address': 'B'}, {'address': 'C'}] == south_server._plugin_handles
+
+    @pytest.mark.asyncio
+    async def test_get_poll(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+
+        # WHEN
+        resp = await south_server.get_poll(request=None)
+
+        # THEN
+        assert 200 == resp.status
+        assert {"polls": 0, "overruns": 0, "skipped_polls": 0, "devices": 0, "poll_workers": 1, "last_poll_ms": None,
+                "p50_poll_ms": None, "p99_poll_ms": None, "max_poll_ms": None} == json.loads(resp.text)
+
+        south_server._poll_stats = {"polls": 3, "overruns": 1, "skipped_polls": 2}
+        south_server._poll_latencies = [.01, .3, .02]
+        south_server._plugin_handles = [{}]
+        resp = await south_server.get_poll(request=None)
+        assert {"polls": 3, "overruns": 1, "skipped_polls": 2, "devices": 1, "poll_workers": 1, "last_poll_ms": 20.0,
+                "p50_poll_ms": 20.0, "p99_poll_ms": 300.0, "max_poll_ms": 300.0} == json.loads(resp.text)
+
     @pytest.mark.asyncio
     async def test_run(self, mocker):
         """Not fit for Unit test"""
@@ -313,6 +476,7 @@ class TestServicesSouthServer:
         # GIVEN
         cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
         ingest_stop = mocker.patch.object(Ingest, 'stop', return_value=mock_coro())
+        close_all = mocker.patch.object(HTTPConnectionPool, 'close_all')
         mock_plugin = MagicMock()
         attrs = copy.deepcopy(plugin_attrs)
         attrs['plugin_info.return_value']['mode'] = 'async'
@@ -333,6 +497,7 @@ class TestServicesSouthServer:
                  call('Stopping South service event loop, for plugin test.')]
         log_info.assert_has_calls(calls, any_order=True)
         assert 0 == log_exception.call_count
+        close_all.assert_called_once_with()
 
     @pytest.mark.asyncio
     async def test__stop_plugin_stop_error(self, loop, mocker):
@@ -416,6 +581,79 @@ class TestServicesSouthServer:
                  call('Started South Plugin: test')]
         log_info.assert_has_calls(calls, any_order=True)
 
+    @pytest.mark.asyncio
+    async def test_change_waits_for_poll(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        add_readings = mocker.patch.object(Ingest, 'add_readings', side_effect=lambda **kwargs: false_coro())
+        polling = threading.Event()
+        events = []
+
+        def plugin_poll(handle):
+            polling.set()
+            time.sleep(.2)
+            events.append('poll')
+            return {'asset': 'test', 'timestamp': '2018-01-01 00:00:00', 'key': None, 'readings': {}}
+
+        def plugin_reconfigure(handle, config):
+            events.append('reconfigure')
+            return {'pollInterval': {'value': '1000'}, 'restart': 'no'}
+
+        south_server._plugin = MagicMock()
+        south_server._plugin.plugin_poll.side_effect = plugin_poll
+        south_server._plugin.plugin_reconfigure.side_effect = plugin_reconfigure
+        south_server._plugin_info = {'mode': 'poll'}
+        south_server._plugin_handles = [{'pollInterval': {'value': '1000'}}]
+        south_server._task_main = asyncio.ensure_future(south_server._exec_plugin_poll())
+        while not polling.is_set():
+            await asyncio.sleep(.01)
+
+        # WHEN
+        await south_server.change(request=None)
+
+        # THEN the device is reconfigured only once the poll under way has returned, and its readings are dropped
+        assert ['poll', 'reconfigure'] == events
+        add_readings.assert_not_called()
+        assert {'pollInterval': {'value': '1000'}, 'restart': 'no'} == south_server._plugin_handle
+        # Polling resumed with the new handle
+        assert not south_server._task_main.done()
+        await south_server._stop_polling()
+
+    @pytest.mark.asyncio
+    async def test_changed_config(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        south_server._config = {'plugin': {'value': 'test'}, 'pollInterval': {'value': '1000'}, 'port': {'value': '5683'}}
+
+        def change_request(payload):
+            async def payload_json():
+                return payload
+            return MagicMock(body_exists=True, json=payload_json)
+
+        # WHEN
+        new_config = await south_server._changed_config(change_request(
+            {'category': 'test', 'items': {'pollInterval': {'value': '500'}}, 'removed': ['port'], 'delta': True}))
+
+        # THEN
+        assert {'plugin': {'value': 'test'}, 'pollInterval': {'value': '500'}} == new_config
+        assert new_config == south_server._config
+
+        # WHEN
+        new_config = await south_server._changed_config(change_request(
+            {'category': 'test', 'items': {'plugin': {'value': 'test'}}}))
+
+        # THEN
+        assert {'plugin': {'value': 'test'}} == new_config
+        assert 0 == south_server._core_microservice_management_client.get_configuration_category.call_count
+
+        # WHEN the notification does not carry the category
+        new_config = await south_server._changed_config(None)
+
+        # THEN
+        assert cat_get() == new_config
+        south_server._core_microservice_management_client.get_configuration_category.assert_called_once_with(
+            category_name='test')
+
     @pytest.mark.asyncio
     async def test_change_error(self, loop, mocker):
         # GIVEN
@@ -444,3 +682,25 @@ class TestServicesSouthServer:
         calls = [call('Data retreival error in plugin test during reconfigure')]
         log_exception.assert_has_calls(calls, any_order=True)
 
+
+    @pytest.mark.asyncio
+    async def test_get_ingest_batching(self, loop, mocker):
+        # GIVEN
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        batching = {"adaptive": False, "batch_size": 100, "flush_timeout_ms": 1000}
+        mocker.patch.object(Ingest, 'get_batching', return_value=batching)
+
+        # WHEN
+        resp = await south_server.get_ingest_batching(request=None)
+
+        # THEN
+        assert 200 == resp.status
+        assert batching == json.loads(resp.text)
+
+    def test_add_microservice_management_routes(self, mocker):
+        cat_get, south_server, ingest_start, log_exception, log_info = self.south_fixture(mocker)
+        app = MagicMock()
+        south_server._add_microservice_management_routes(app)
+        app.router.add_route.assert_has_calls([call('GET', '/foglamp/south/ingest/batching',
+                                                    south_server.get_ingest_batching),
+                                               call('GET', '/foglamp/south/poll', south_server.get_poll)])
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# FOGLAMP_BEGIN
+# See: http://foglamp.readthedocs.io/
+# FOGLAMP_END
+
+""" Test services/south/spill_journal.py """
+
+import pytest
+
+from foglamp.services.south.spill_journal import SpillJournal, _HEADER
+
+__copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
+__license__ = "Apache 2.0"
+__version__ = "${VERSION}"
+
+
+@pytest.allure.feature("unit")
+@pytest.allure.story("services", "south", "spill_journal")
+class TestSpillJournal:
+
+    def test_append_peek_commit(self, tmpdir):
+        journal = SpillJournal(str(tmpdir.join('south.spill')), 4096)
+        assert 0 == len(journal)
+
+        assert 3 == journal.append(['{"a": 1}', '{"a": 2}', '{"a": 3}'])
+        assert 3 == len(journal)
+
+        assert ['{"a": 1}', '{"a": 2}'] == journal.peek(2)
+        # Peeking does not consume
+        assert ['{"a": 1}', '{"a": 2}'] == journal.peek(2)
+        journal.commit()
+        assert 1 == len(journal)
+
+        assert ['{"a": 3}'] == journal.peek(10)
+        journal.commit()
+        assert 0 == len(journal)
+        # Offsets return to the start once empty
+        assert 4096 - _HEADER.size == journal.free_bytes
+        journal.close()
+
+    def test_reopen_keeps_pending_readings(self, tmpdir):
+        path = str(tmpdir.join('south.spill'))
+        journal = SpillJournal(path, 4096)
+        journal.append(['{"a": 1}', '{"a": 2}'])
+        journal.peek(1)
+        journal.commit()
+        journal.close()
+
+        journal = SpillJournal(path, 4096)
+        assert 1 == len(journal)
+        assert ['{"a": 2}'] == journal.peek(10)
+        journal.close()
+
+    def test_append_when_full(self, tmpdir):
+        journal = SpillJournal(str(tmpdir.join('south.spill')), _HEADER.size + 20)
+        assert 2 == journal.append(['{"a": 1}', '{"a": 2}', '{"a": 3}'])
+        assert 2 == journal.free_bytes
+        assert 0 == journal.append(['{"a": 4}'])
+        assert ['{"a": 1}', '{"a": 2}'] == journal.peek(10)
+        journal.close()
+
+    def test_corrupt_header_is_reset(self, tmpdir):
+        path = tmpdir.join('south.spill')
+        path.write_binary(_HEADER.pack(100, 50, 7))
+
+        journal = SpillJournal(str(path), 4096)
+        assert 0 == len(journal)
+        assert [] == journal.peek(10)
+        journal.close()
+
+    def test_commit_compacts(self, tmpdir):
+        path = str(tmpdir.join('south.spill'))
+        journal = SpillJournal(path, _HEADER.size + 100)
+        # 9 bytes each
+        readings = ['{{"a": {}}}'.format(i) for i in range(10)]
+        assert 10 == journal.append(readings)
+        assert 10 == journal.free_bytes
+
+        # Less than half of the journal consumed
+        journal.peek(3)
+        journal.commit()
+        assert 10 == journal.free_bytes
+
+        # More than half consumed, the pending readings move to the start
+        journal.peek(3)
+        journal.commit()
+        assert 100 - 4 * 9 == journal.free_bytes
+        assert 2 == journal.append(['{"b": 1}', '{"b": 2}'])
+        assert readings[6:] + ['{"b": 1}', '{"b": 2}'] == journal.peek(10)
+        journal.close()
+
+        journal = SpillJournal(path, _HEADER.size + 100)
+        assert 6 == len(journal)
+        assert readings[6:] + ['{"b": 1}', '{"b": 2}'] == journal.peek(10)
+        journal.close()
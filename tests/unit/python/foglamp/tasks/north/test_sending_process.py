@@ -5,13 +5,17 @@
 # FOGLAMP_END
 
 import asyncio
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
 from foglamp.common.storage_client.storage_client import ReadingsStorageClient, StorageClient
 from foglamp.tasks.north.sending_process import SendingProcess
 import foglamp.tasks.north.sending_process as sp_module
+import foglamp.plugins.north.common.common as plugin_common
 from foglamp.common.audit_logger import AuditLogger
+from foglamp.common import jqfilter
+from foglamp.common.statistics import Statistics
 
 __author__ = "Stefano Simonelli"
 __copyright__ = "Copyright (c) 2018 OSIsoft, LLC"
@@ -81,6 +85,8 @@ class TestSendingProcess:
 
         # Configures properly the SendingProcess
         sp._config_from_manager = {"applyFilter": {"value": "False"}}
+        # Updates the Storage Layer after every block
+        sp._config['checkpointMaxRows'] = 0
         sp._plugin = MagicMock()
         mockStorageClient = MagicMock(spec=StorageClient)
         sp._audit = AuditLogger(mockStorageClient)
@@ -283,3 +289,262 @@ class TestSendingProcess:
             assert data_transformed[0]['asset_code'] == "test_asset_code"
             assert data_transformed[0]['reading'] == {"value": 20}
             assert data_transformed[0]['user_ts'] == "16/04/2018 16:32+00"
+
+    @staticmethod
+    def _pipelined_sending_process(event_loop, last_row_id, block_size=3, pipeline_depth=1):
+        """Returns a SendingProcess whose source holds the rows 1..last_row_id"""
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+
+        sp._config_from_manager = {"applyFilter": {"value": "False"}}
+        sp._config['duration'] = 60
+        sp._config['sleepInterval'] = 0
+        sp._config['pipelineDepth'] = pipeline_depth
+        sp._plugin = MagicMock()
+
+        def load_data_into_memory(position):
+            return [{"id": row_id} for row_id in range(position + 1, min(position + block_size, last_row_id) + 1)]
+
+        sp._load_data_into_memory = MagicMock(side_effect=load_data_into_memory)
+        return sp
+
+    def test_send_data_pipelined(self, event_loop):
+        """Tests that prefetched blocks follow each other and the position is updated in order"""
+
+        sp = self._pipelined_sending_process(event_loop, last_row_id=8)
+        sp._plugin.plugin_send.side_effect = lambda handle, data, stream_id: (True, data[-1]['id'], len(data))
+
+        def stop(seconds):
+            SendingProcess._stop_execution = True
+
+        try:
+            with patch.object(sp, '_last_object_id_read', return_value=0) as mocked_last_object_id_read:
+                with patch.object(sp, '_data_block_sent', wraps=sp._data_block_sent) as mocked_data_block_sent:
+                    with patch.object(sp, '_checkpoint'):
+                        with patch.object(sp_module.time, 'sleep', side_effect=stop):
+                            sp.send_data(STREAM_ID)
+        finally:
+            SendingProcess._stop_execution = False
+
+        mocked_last_object_id_read.assert_called_once_with(STREAM_ID)
+        assert [[1, 2, 3], [4, 5, 6], [7, 8]] == [[row["id"] for row in c[0][1]]
+                                                   for c in sp._plugin.plugin_send.call_args_list]
+        assert [((3, 3, STREAM_ID),), ((6, 3, STREAM_ID),), ((8, 2, STREAM_ID),)] == \
+            mocked_data_block_sent.call_args_list
+        # The empty block after the last one is fetched ahead, then discarded before sleeping
+        assert 0 == sp._load_data_into_memory.call_args_list[0][0][0]
+        assert 8 == sp._load_data_into_memory.call_args_list[-1][0][0]
+
+    def test_send_data_pipelined_partial_send(self, event_loop):
+        """Tests that blocks prefetched after a partially sent block are fetched again from the reached position"""
+
+        sp = self._pipelined_sending_process(event_loop, last_row_id=6)
+        sent = []
+
+        def plugin_send(handle, data, stream_id):
+            # Sends only the first two rows of the first block
+            data = data[:2] if not sent else data
+            sent.append([row["id"] for row in data])
+            return True, data[-1]['id'], len(data)
+
+        sp._plugin.plugin_send.side_effect = plugin_send
+
+        def stop(seconds):
+            SendingProcess._stop_execution = True
+
+        try:
+            with patch.object(sp, '_last_object_id_read', return_value=0):
+                with patch.object(sp, '_data_block_sent', wraps=sp._data_block_sent) as mocked_data_block_sent:
+                    with patch.object(sp, '_checkpoint'):
+                        with patch.object(sp_module.time, 'sleep', side_effect=stop):
+                            sp.send_data(STREAM_ID)
+        finally:
+            SendingProcess._stop_execution = False
+
+        assert [[1, 2], [3, 4, 5], [6]] == sent
+        assert [2, 5, 6] == [c[0][0] for c in mocked_data_block_sent.call_args_list]
+
+    def test_send_data_pipelined_error(self, event_loop):
+        """Tests that after a failure the blocks are prepared again from the reached position"""
+
+        sp = self._pipelined_sending_process(event_loop, last_row_id=3)
+        sp._plugin.plugin_send.side_effect = Exception("send failed")
+        sleeps = []
+
+        def stop(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 2:
+                SendingProcess._stop_execution = True
+
+        try:
+            with patch.object(sp, '_last_object_id_read', return_value=0) as mocked_last_object_id_read:
+                with patch.object(sp, '_data_block_sent') as mocked_data_block_sent:
+                    with patch.object(sp, '_checkpoint'):
+                        with patch.object(sp_module.time, 'sleep', side_effect=stop):
+                            with patch.object(SendingProcess._logger, 'error') as mocked_error:
+                                sp.send_data(STREAM_ID)
+        finally:
+            SendingProcess._stop_execution = False
+
+        mocked_last_object_id_read.assert_called_once_with(STREAM_ID)
+        assert 2 == [c[0][0] for c in sp._load_data_into_memory.call_args_list].count(0)
+        assert 2 == mocked_error.call_count
+        assert not mocked_data_block_sent.called
+
+    def test_checkpoint_coalesced(self, event_loop):
+        """Tests that position, statistics and audit are updated once per checkpointMaxRows rows"""
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+        sp._config['checkpointMaxRows'] = 10
+        sp._config['checkpointInterval'] = 60
+        sp._audit = MagicMock(spec=AuditLogger)
+
+        async def mock_information(*args):
+            pass
+
+        sp._audit.information.side_effect = mock_information
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            with patch.object(sp, '_last_object_id_read', return_value=5) as mocked_last_object_id_read:
+                with patch.object(sp, '_last_object_id_update') as mocked_last_object_id_update:
+                    with patch.object(sp, '_update_statistics') as mocked_update_statistics:
+                        assert 5 == sp._reached_position(STREAM_ID)
+                        sp._data_block_sent(9, 4, STREAM_ID)
+                        assert 9 == sp._reached_position(STREAM_ID)
+                        assert not mocked_last_object_id_update.called
+                        assert not mocked_update_statistics.called
+
+                        sp._data_block_sent(15, 6, STREAM_ID)
+                        mocked_last_object_id_update.assert_called_once_with(15, STREAM_ID)
+                        mocked_update_statistics.assert_called_once_with(10, STREAM_ID)
+                        sp._audit.information.assert_called_once_with(sp._AUDIT_CODE, {"sentRows": 10})
+
+                        # Nothing sent since the last checkpoint
+                        sp._checkpoint(STREAM_ID)
+                        assert 1 == mocked_last_object_id_update.call_count
+                        assert 1 == mocked_update_statistics.call_count
+
+                        sp._data_block_sent(17, 2, STREAM_ID)
+                        sp._checkpoint(STREAM_ID)
+                        mocked_last_object_id_update.assert_called_with(17, STREAM_ID)
+                        mocked_update_statistics.assert_called_with(2, STREAM_ID)
+
+        mocked_last_object_id_read.assert_called_once_with(STREAM_ID)
+
+    def test_update_statistics_unregistered_stream(self, event_loop):
+        """Tests that the statistics key of a stream that has none yet is registered with the rows sent"""
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+        sp._storage = MagicMock(spec=StorageClient)
+        sp._storage.query_tbl_with_payload.return_value = {'rows': [{'key': 'SENT_1'}]}
+
+        with patch.object(Statistics, '_shared_state', {}):
+            sp._update_statistics(7, 12)
+
+        sp._storage.update_tbl.assert_not_called()
+        sp._storage.insert_into_tbl.assert_called_once()
+        args, kwargs = sp._storage.insert_into_tbl.call_args
+        assert 'statistics' == args[0]
+        assert {"key": "SENT_12", "description": "The number of readings sent for stream 12", "value": 7,
+                "previous_value": 0} == json.loads(args[1])
+
+    def test_checkpoint_at_end_of_send_data(self, event_loop):
+        """Tests that rows sent since the last checkpoint are recorded when the sending process stops"""
+
+        sp = self._pipelined_sending_process(event_loop, last_row_id=8, pipeline_depth=0)
+        sp._config['checkpointMaxRows'] = 1000
+        sp._plugin.plugin_send.side_effect = lambda handle, data, stream_id: (True, data[-1]['id'], len(data))
+        sp._audit = MagicMock(spec=AuditLogger)
+
+        async def mock_information(*args):
+            pass
+
+        sp._audit.information.side_effect = mock_information
+
+        def stop(seconds):
+            SendingProcess._stop_execution = True
+
+        try:
+            with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+                with patch.object(sp, '_last_object_id_read', return_value=0):
+                    with patch.object(sp, '_last_object_id_update') as mocked_last_object_id_update:
+                        with patch.object(sp, '_update_statistics') as mocked_update_statistics:
+                            with patch.object(sp_module.time, 'sleep', side_effect=stop):
+                                sp.send_data(STREAM_ID)
+        finally:
+            SendingProcess._stop_execution = False
+
+        assert 3 == sp._plugin.plugin_send.call_count
+        mocked_last_object_id_update.assert_called_once_with(8, STREAM_ID)
+        mocked_update_statistics.assert_called_once_with(8, STREAM_ID)
+        sp._audit.information.assert_called_once_with(sp._AUDIT_CODE, {"sentRows": 8})
+
+    @pytest.mark.parametrize("p_block_size", [100, 500])
+    def test_transform_in_memory_data_readings_types(self, p_block_size, event_loop):
+        """The values of readings of 20 fields are converted, by the types remembered for the fields of every
+        asset, as convert_to_type converts them one by one"""
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+
+        def reading(row_id):
+            values = {}
+            for field in range(20):
+                kind = field % 4
+                if kind == 0:
+                    values["integer_{}".format(field)] = str(row_id + field)
+                elif kind == 1:
+                    values["number_{}".format(field)] = str(row_id / 7 + field)
+                elif kind == 2:
+                    values["string_{}".format(field)] = "state_{}".format(row_id % 3)
+                else:
+                    values["value_{}".format(field)] = row_id * 0.5
+            return values
+
+        def raw_data():
+            return [{"id": row_id,
+                     "asset_code": "asset_{}".format(row_id % 5),
+                     "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
+                     "reading": reading(row_id),
+                     "user_ts": "2018-04-20 09:38:50.163164"} for row_id in range(p_block_size)]
+
+        blocks = [raw_data() for _ in range(max(1, 5000 // p_block_size))]
+        expected = [[{key: plugin_common.convert_to_type(value) for key, value in row["reading"].items()}
+                     for row in block] for block in blocks]
+
+        converted = [sp._transform_in_memory_data_readings(block) for block in blocks]
+
+        assert expected == [[row["reading"] for row in block] for block in converted]
+        assert 100 == sp._type_converter.evaluated
+
+    @pytest.mark.parametrize("p_apply_filter", ["False", "True"])
+    def test_apply_filter_reuses_program(self, p_apply_filter, event_loop):
+        """The filter rule is compiled once and its program used for every block"""
+
+        with patch.object(asyncio, 'get_event_loop', return_value=event_loop):
+            sp = SendingProcess()
+
+        sp._config_from_manager = {"applyFilter": {"value": p_apply_filter},
+                                   "filterRule": {"value": "[.[] | select(.reading.humidity > 10)]"}}
+
+        def data_block():
+            return [{"id": row_id,
+                     "asset_code": "asset_{}".format(row_id % 5),
+                     "read_key": "ef6e1368-4182-11e8-842f-0ed5f89f718b",
+                     "reading": {"humidity": row_id % 20, "temperature": 38.5, "alarm": row_id % 2 == 0},
+                     "user_ts": "2018-04-20 09:38:50.163164+00"} for row_id in range(500)]
+
+        blocks = [data_block() for _ in range(20)]
+
+        with patch.object(jqfilter.pyjq, 'compile', wraps=jqfilter.pyjq.compile) as patched_compile:
+            filtered = [sp._apply_filter(block) for block in blocks]
+
+        if p_apply_filter == "True":
+            assert [[row for row in block if row["reading"]["humidity"] > 10] for block in blocks] == filtered
+            patched_compile.assert_called_once_with("[.[] | select(.reading.humidity > 10)]")
+        else:
+            assert blocks == filtered
+            patched_compile.assert_not_called()
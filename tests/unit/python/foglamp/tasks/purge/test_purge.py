@@ -51,12 +51,12 @@ class TestPurge:
         mockStorageClient = MagicMock(spec=StorageClient)
         mockAuditLogger = AuditLogger(mockStorageClient)
         with patch.object(FoglampProcess, '__init__'):
-            with patch.object(Statistics, 'update', return_value=mock_s_update()) as mock_stats_update:
+            with patch.object(Statistics, 'update_bulk', return_value=mock_s_update()) as mock_stats_update:
                 with patch.object(mockAuditLogger, "__init__", return_value=None):
                     p = Purge(loop=event_loop)
                     p._storage = mockStorageClient
                     p.write_statistics(1, 2)
-                    mock_stats_update.assert_has_calls([call('PURGED', 1), call('UNSNPURGED', 2)])
+                    mock_stats_update.assert_called_once_with({'PURGED': 1, 'UNSNPURGED': 2})
 
     def test_set_configuration(self, event_loop):
         """Test that purge's set_configuration returns configuration item with key 'PURGE_READ' """